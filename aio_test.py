@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Tests of the asyncio interface. They use async/await syntax, so they
+live apart from test.py, which imports them on Python 3.6+.
+"""
+
+import json
+import asyncio
+import unittest
+
+from unittest.mock import MagicMock as MM, patch
+
+from artifactory import aio
+
+
+class AsyncArtifactoryPathTest(unittest.TestCase):
+    """ Test the asyncio interface """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.requests = []
+        self.responses = {}
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def _request(self, method, url, params=None, headers=None, data=None, **kwargs):
+        self.requests.append((method, url, params, headers))
+        future = self.loop.create_future()
+        future.set_result(self.responses[(method, url)])
+        return future
+
+    def test_paths(self):
+        P = aio.AsyncArtifactoryPath
+        p = P("http://b/artifactory/c/d", auth=('user', 'pass'), verify=False)
+
+        for child in [p / 'e', p.joinpath('e'), p.parent, p.with_name('x'),
+                      p.relative_to("http://b/artifactory/c")]:
+            self.assertEqual(child.auth, ('user', 'pass'))
+            self.assertFalse(child.verify)
+
+        self.assertEqual(str(p / 'e'), "http://b/artifactory/c/d/e")
+        self.assertEqual(p.drive, "http://b/artifactory")
+
+    def test_stat_iterdir(self):
+        p = aio.AsyncArtifactoryPath("http://b/artifactory/c/d")
+        self.responses[('GET', "http://b/artifactory/api/storage/c/d")] = (json.dumps({
+            "repo": "c", "path": "/d",
+            "created": "2014-02-24T21:20:59.999+04:00",
+            "lastModified": "2014-02-24T21:20:36.000+04:00",
+            "children": [{"uri": "/e", "folder": True},
+                         {"uri": "/f.txt", "folder": False}]}), 200)
+        self.responses[('GET', "http://b/artifactory/api/storage/c/d/x")] = (
+            '{"errors": [{"status": 404, "message": "Unable to find item"}]}', 404)
+
+        async def run():
+            stat = await p.stat()
+            children = [child async for child in p.iterdir()]
+            scanned = await p.scandir()
+            return stat, children, scanned, await (p / 'x').exists()
+
+        with patch.object(aio._AsyncArtifactoryAccessor, 'request',
+                          MM(side_effect=self._request)):
+            stat, children, scanned, exists = self.run_async(run())
+
+        self.assertTrue(stat.is_dir)
+        self.assertEqual(stat.children, ['e', 'f.txt'])
+        self.assertEqual([str(c) for c in children],
+                         ["http://b/artifactory/c/d/e", "http://b/artifactory/c/d/f.txt"])
+        self.assertEqual([is_dir for _, is_dir in scanned], [True, False])
+        self.assertFalse(exists)
+
+    def test_deploy_copy_move(self):
+        src = aio.AsyncArtifactoryPath("http://b/artifactory/c/d")
+        dst = aio.AsyncArtifactoryPath("http://b/artifactory/e/d")
+
+        self.responses[('PUT', "http://b/artifactory/c/d")] = ('Created', 201)
+        self.responses[('POST', "http://b/artifactory/api/copy/c/d")] = ('{}', 200)
+        self.responses[('POST', "http://b/artifactory/api/move/c/d")] = ('{}', 200)
+        self.responses[('PUT', "http://b/artifactory/api/storage/c/d")] = ('', 204)
+
+        async def run():
+            await src.deploy(b'data', sha1='abc')
+            await src.copy(dst)
+            await src.move(dst)
+            await src.set_properties({'a': 'b'}, recursive=False)
+
+        with patch.object(aio._AsyncArtifactoryAccessor, 'request',
+                          MM(side_effect=self._request)):
+            self.run_async(run())
+
+        self.assertEqual(self.requests, [
+            ('PUT', "http://b/artifactory/c/d", None,
+             {'X-Checksum-Sha1': 'abc', 'X-Checksum-Deploy': 'true'}),
+            ('POST', "http://b/artifactory/api/copy/c/d",
+             {'to': '/e/d', 'suppressLayouts': 0}, None),
+            ('POST', "http://b/artifactory/api/move/c/d", {'to': '/e/d'}, None),
+            ('PUT', "http://b/artifactory/api/storage/c/d",
+             {'properties': 'a=b', 'recursive': '0'}, None)])
+
+        other = aio.AsyncArtifactoryPath("http://x/artifactory/e/d")
+        self.assertRaises(NotImplementedError, self.run_async, src.move(other))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,7 +32,10 @@ __all__ = copy(exceptions.__all__)
 from .exceptions import *
 from .utils import export
 from .paths import ArtifactoryPath, PureArtifactoryPath
+from .aql import AQLQuery
 from .config import Config
+from .metrics import Metrics
 
 export(ArtifactoryPath)
 export(PureArtifactoryPath)
+export(AQLQuery)
@@ -0,0 +1,631 @@
+"""
+asyncio interface to Artifactory
+
+AsyncArtifactoryPath has the same path semantics as ArtifactoryPath,
+but its methods that talk to the server are coroutines, which run on
+the event loop instead of blocking it. Requires Python 3.6+ and aiohttp:
+
+    pip install artifactory[async]
+"""
+import ssl
+import json
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .paths import (PureArtifactoryPath, _AccessorMixin, _ContextPath, _DriveContext,
+                    stat_from_json)
+from .utils import export
+
+
+class _AsyncArtifactoryAccessor(_AccessorMixin):
+    """
+    Implements operations with Artifactory REST API on top of aiohttp.
+    URLs, parameters and error handling are shared with
+    _ArtifactoryAccessor through _AccessorMixin.
+
+    Requests to the same Artifactory instance (drive) from the same event
+    loop share an aiohttp.ClientSession. Its connection limits are taken
+    from the 'async_limit' (total) and 'async_limit_per_host' settings of
+    the Config entry of the drive.
+    """
+    _sessions = {}
+    _ssl_contexts = {}
+
+    def session(self, url):
+        """
+        Returns the shared aiohttp.ClientSession of the running event loop
+        for the Artifactory instance that url belongs to
+        """
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for asyncio support")
+
+        drive = PureArtifactoryPath._flavour.splitroot(url)[0]
+        key = (asyncio.get_event_loop(), drive)
+
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            cfg_entry = self.get_config(drive)
+            connector = aiohttp.TCPConnector(
+                limit=int(cfg_entry['async_limit']),
+                limit_per_host=int(cfg_entry['async_limit_per_host']),
+                force_close=not cfg_entry['keep_alive'])
+            # shared by paths with different credentials, so it keeps no cookies
+            session = self._sessions[key] = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+
+        return session
+
+    @classmethod
+    async def close_sessions(cls):
+        """
+        Closes the sessions of the running event loop. New sessions will
+        be created on demand by subsequent requests.
+        """
+        loop = asyncio.get_event_loop()
+
+        for key in [key for key in cls._sessions if key[0] is loop]:
+            await cls._sessions.pop(key).close()
+
+    def ssl_context(self, verify, cert):
+        """
+        Translates the 'verify' and 'cert' arguments of requests to
+        the 'ssl' argument of aiohttp
+        """
+        if not cert:
+            if verify is True:
+                return None
+            if verify is False:
+                return False
+
+        key = (verify, tuple(cert) if isinstance(cert, (list, tuple)) else cert)
+
+        if key not in self._ssl_contexts:
+            context = ssl.create_default_context(
+                cafile=verify if isinstance(verify, str) else None)
+
+            if verify is False:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+
+            if isinstance(cert, (list, tuple)):
+                context.load_cert_chain(*cert)
+            elif cert:
+                context.load_cert_chain(cert)
+
+            self._ssl_contexts[key] = context
+
+        return self._ssl_contexts[key]
+
+    def _request_kwargs(self, params, headers, data, auth, verify, cert):
+        if auth is not None and not isinstance(auth, aiohttp.BasicAuth):
+            auth = aiohttp.BasicAuth(*auth)
+
+        return dict(params=params, headers=headers, data=data, auth=auth,
+                    ssl=self.ssl_context(verify, cert))
+
+    async def request(self, method, url, params=None, headers=None, data=None,
+                      auth=None, verify=True, cert=None):
+        """
+        Perform a request to url with optional authentication
+        Returns the response text and status code
+        """
+        session = self.session(url)
+        kwargs = self._request_kwargs(params, headers, data, auth, verify, cert)
+
+        async with session.request(method, url, **kwargs) as res:
+            return await res.text(), res.status
+
+    async def request_stream(self, method, url, params=None, headers=None, data=None,
+                             auth=None, verify=True, cert=None):
+        """
+        Perform a request to url with optional authentication
+        Returns the aiohttp.ClientResponse, whose body hasn't been read
+        yet, and the status code. The response has to be released.
+        """
+        session = self.session(url)
+        kwargs = self._request_kwargs(params, headers, data, auth, verify, cert)
+
+        res = await session.request(method, url, **kwargs)
+        return res, res.status
+
+    async def get_stat_json(self, pathobj):
+        """
+        Request remote file/directory status info
+        Returns a json object as specified by Artifactory REST API
+        """
+        url = self.storage_url(pathobj)
+
+        text, code = await self.request('GET', url, auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+        self._check_item_response(text, code, url)
+
+        return json.loads(text)
+
+    async def stat(self, pathobj):
+        """
+        Request remote file/directory status info
+        Returns an object of class ArtifactoryFileStat
+        """
+        return stat_from_json(await self.get_stat_json(pathobj))
+
+    async def list_children(self, pathobj):
+        """
+        Returns a list of (name, is_dir) tuples for the immediate
+        sub-directories and files in path
+        """
+        jsn = await self.get_stat_json(pathobj)
+
+        if 'size' in jsn:
+            raise OSError(20, "Not a directory: %s" % str(pathobj))
+
+        return [(child['uri'][1:], bool(child.get('folder', False)))
+                for child in jsn.get('children', [])]
+
+    async def mkdir(self, pathobj):
+        """
+        Creates remote directory
+        Note that this operation is not recursive
+        """
+        if not pathobj.drive or not pathobj.root:
+            raise RuntimeError("Full path required: '%s'" % str(pathobj))
+
+        if await pathobj.exists():
+            raise OSError(17, "File exists: '%s'" % str(pathobj))
+
+        text, code = await self.request('PUT', str(pathobj) + '/', auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        if not code == 201:
+            raise RuntimeError("%s %d" % (text, code))
+
+    async def rmdir(self, pathobj):
+        """
+        Removes a directory
+        """
+        stat = await self.stat(pathobj)
+
+        if not stat.is_dir:
+            raise OSError(20, "Not a directory: '%s'" % str(pathobj))
+
+        text, code = await self.request('DELETE', str(pathobj) + '/', auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        if code not in [200, 202, 204]:
+            raise RuntimeError("Failed to delete directory: '%s'" % text)
+
+    async def unlink(self, pathobj):
+        """
+        Removes a file
+        """
+        stat = await self.stat(pathobj)
+
+        if stat.is_dir:
+            raise OSError(1, "Operation not permitted: '%s'" % str(pathobj))
+
+        text, code = await self.request('DELETE', str(pathobj), auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        if code not in [200, 202, 204]:
+            raise RuntimeError("Failed to delete file: %d '%s'" % (code, text))
+
+    async def touch(self, pathobj):
+        """
+        Create an empty file
+        """
+        if not pathobj.drive or not pathobj.root:
+            raise RuntimeError('Full path required')
+
+        if await pathobj.exists():
+            return
+
+        text, code = await self.request('PUT', str(pathobj), auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        if not code == 201:
+            raise RuntimeError("%s %d" % (text, code))
+
+    async def open(self, pathobj):
+        """
+        Opens the remote file and returns the aiohttp.ClientResponse
+        """
+        res, code = await self.request_stream('GET', str(pathobj), auth=pathobj.auth,
+                                              verify=pathobj.verify, cert=pathobj.cert)
+
+        if not code == 200:
+            res.release()
+            raise RuntimeError("%d" % code)
+
+        return res
+
+    async def deploy_by_checksum(self, pathobj, md5=None, sha1=None, sha256=None, sha512=None,
+                                 parameters=None):
+        """
+        Deploys an artifact by checksum only, without sending its contents.
+        Returns True on success and False if the server doesn't have
+        the contents.
+        """
+        if not sha1 and not sha256:
+            return False
+
+        url, headers = self._deploy_request(pathobj, md5, sha1, sha256, sha512, parameters)
+        headers['X-Checksum-Deploy'] = 'true'
+
+        text, code = await self.request('PUT', url, headers=headers, auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        if code == 404:
+            return False
+        if code not in [200, 201]:
+            raise RuntimeError("%s" % text)
+
+        return True
+
+    async def deploy(self, pathobj, data, md5=None, sha1=None, sha256=None, sha512=None,
+                     parameters=None, checksum_deploy=True):
+        """
+        Uploads data, which can be bytes, a file object or an async
+        iterable of bytes, such as an AsyncArtifactoryStream
+        """
+        if checksum_deploy and await self.deploy_by_checksum(pathobj, md5, sha1, sha256,
+                                                             sha512, parameters):
+            return
+
+        url, headers = self._deploy_request(pathobj, md5, sha1, sha256, sha512, parameters)
+
+        text, code = await self.request('PUT', url, headers=headers, data=data,
+                                        auth=pathobj.auth, verify=pathobj.verify,
+                                        cert=pathobj.cert)
+
+        if code not in [200, 201]:
+            raise RuntimeError("%s" % text)
+
+    async def copy(self, src, dst, suppress_layouts=False):
+        """
+        Copy artifact from src to dst
+        """
+        url = self.api_url(src, 'copy')
+        params = self._copy_params(dst, suppress_layouts)
+
+        text, code = await self.request('POST', url, params=params, auth=src.auth,
+                                        verify=src.verify, cert=src.cert)
+
+        if code not in [200, 201]:
+            raise RuntimeError("%s" % text)
+
+    async def move(self, src, dst):
+        """
+        Move artifact from src to dst
+        """
+        url = self.api_url(src, 'move')
+        params = self._copy_params(dst)
+
+        text, code = await self.request('POST', url, params=params, auth=src.auth,
+                                        verify=src.verify, cert=src.cert)
+
+        if code not in [200, 201]:
+            raise RuntimeError("%s" % text)
+
+    async def get_properties(self, pathobj):
+        """
+        Get artifact properties and return them as a dictionary.
+        """
+        url = self.storage_url(pathobj)
+
+        text, code = await self.request('GET', url, params='properties', auth=pathobj.auth,
+                                        verify=pathobj.verify, cert=pathobj.cert)
+
+        return self._parse_properties(text, code, url)
+
+    async def set_properties(self, pathobj, props, recursive):
+        """
+        Set artifact properties
+        """
+        url = self.storage_url(pathobj)
+
+        text, code = await self.request('PUT', url,
+                                        params=self._properties_params(props, recursive),
+                                        auth=pathobj.auth, verify=pathobj.verify,
+                                        cert=pathobj.cert)
+
+        self._check_item_response(text, code, url, expected=(204,))
+
+    async def del_properties(self, pathobj, props, recursive):
+        """
+        Delete artifact properties
+        """
+        url = self.storage_url(pathobj)
+
+        text, code = await self.request('DELETE', url,
+                                        params=self._properties_params(props, recursive,
+                                                                       delete=True),
+                                        auth=pathobj.auth, verify=pathobj.verify,
+                                        cert=pathobj.cert)
+
+        self._check_item_response(text, code, url, expected=(204,))
+
+
+@export
+class AsyncArtifactoryStream(object):
+    """
+    Contents of a remote file, read asynchronously. Either use it as an
+    async context manager or await it, and close() it when done:
+
+        async with path.open() as stream:
+            async for chunk in stream:
+                ...
+
+    Streams can be passed to AsyncArtifactoryPath.deploy() directly.
+    """
+    def __init__(self, pathobj, chunk_size=1024 * 1024):
+        self.pathobj = pathobj
+        self.chunk_size = chunk_size
+        self.response = None
+
+    async def _open(self):
+        if self.response is None:
+            self.response = await self.pathobj._accessor.open(self.pathobj)
+        return self
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def __aenter__(self):
+        return await self._open()
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def read(self, size=-1):
+        """
+        Read up to size bytes, or everything if size is negative
+        """
+        await self._open()
+        return await self.response.content.read(size)
+
+    async def __aiter__(self):
+        await self._open()
+        while True:
+            chunk = await self.response.content.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        if self.response is not None:
+            self.response.release()
+            self.response = None
+
+
+@export
+class AsyncArtifactoryPath(_ContextPath, PureArtifactoryPath):
+    """
+    asyncio counterpart of ArtifactoryPath
+
+    Path manipulation works exactly like for PureArtifactoryPath, with
+    auth, verify and cert passed on to derived paths. Methods that
+    access the server are coroutines:
+
+        >>> path = AsyncArtifactoryPath("http://b/artifactory/c/d")
+        >>> stat = await path.stat()
+        >>> async for child in path.iterdir():
+        ...     print(child)
+    """
+    __slots__ = ('_context',)
+
+    _accessor = _AsyncArtifactoryAccessor()
+    _context_accessor = _accessor
+
+    def __new__(cls, *args, **kwargs):
+        obj = super(AsyncArtifactoryPath, cls).__new__(cls, *args)
+        obj._context = _DriveContext.for_drive(obj.drive, cls._context_accessor, **kwargs)
+        return obj
+
+    @property
+    def parent(self):
+        """
+        The logical parent of the path.
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).parent)
+
+    def with_name(self, name):
+        """
+        Return a new path with the file name changed.
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).with_name(name))
+
+    def with_suffix(self, suffix):
+        """
+        Return a new path with the file suffix changed (or added, if none).
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).with_suffix(suffix))
+
+    def relative_to(self, *other):
+        """
+        Return the relative path to another path identified by the passed
+        arguments.
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).relative_to(*other))
+
+    def joinpath(self, *args):
+        """
+        Combine this path with one or several arguments
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).joinpath(*args))
+
+    def __truediv__(self, key):
+        """
+        Join two paths with '/'
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).__truediv__(key))
+
+    def __rtruediv__(self, key):
+        """
+        Join two paths with '/'
+        """
+        return self._with_context(super(AsyncArtifactoryPath, self).__rtruediv__(key))
+
+    async def stat(self):
+        """
+        Request remote file/directory status info
+        Returns an object of class ArtifactoryFileStat
+        """
+        return await self._accessor.stat(self)
+
+    async def exists(self):
+        try:
+            await self.stat()
+        except OSError as exc:
+            if exc.errno != 2:
+                raise
+            return False
+        return True
+
+    async def is_dir(self):
+        try:
+            return (await self.stat()).is_dir
+        except OSError as exc:
+            if exc.errno != 2:
+                raise
+            return False
+
+    async def is_file(self):
+        try:
+            return not (await self.stat()).is_dir
+        except OSError as exc:
+            if exc.errno != 2:
+                raise
+            return False
+
+    async def iterdir(self):
+        """
+        Iterate over the files in this directory, with a single request
+        """
+        for name, _ in await self._accessor.list_children(self):
+            yield self / name
+
+    async def scandir(self):
+        """
+        Returns a list of (path, is_dir) tuples for the immediate
+        sub-directories and files in this directory
+        """
+        return [(self / name, is_dir) for name, is_dir in await self._accessor.list_children(self)]
+
+    async def mkdir(self, mode=0o777, parents=False, exist_ok=False):
+        """
+        Create a directory, and with parents=True its missing parents
+        """
+        if parents and self.parent != self and not await self.parent.exists():
+            await self.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            await self._accessor.mkdir(self)
+        except OSError:
+            if not exist_ok or not await self.is_dir():
+                raise
+
+    async def rmdir(self):
+        await self._accessor.rmdir(self)
+
+    async def unlink(self):
+        await self._accessor.unlink(self)
+
+    async def touch(self, mode=0o666, exist_ok=True):
+        if await self.exists() and not exist_ok:
+            raise OSError(17, "File exists: '%s'" % str(self))
+        await self._accessor.touch(self)
+
+    def open(self, chunk_size=1024 * 1024):
+        """
+        Returns an AsyncArtifactoryStream of the file contents, which
+        is iterated in chunks of chunk_size bytes
+        """
+        return AsyncArtifactoryStream(self, chunk_size=chunk_size)
+
+    async def read_bytes(self):
+        """
+        Returns the contents of the file
+        """
+        async with self.open() as stream:
+            return await stream.read()
+
+    async def deploy(self, data, md5=None, sha1=None, sha256=None, sha512=None,
+                     parameters={}, checksum_deploy=True):
+        """
+        Upload data, which can be bytes, a file object or an async
+        iterable of bytes, such as the AsyncArtifactoryStream of another
+        path. If sha1 or sha256 are given, a deploy by checksum is tried
+        first, unless checksum_deploy is False.
+        """
+        await self._accessor.deploy(self, data, md5, sha1, sha256, sha512, parameters,
+                                    checksum_deploy=checksum_deploy)
+
+    async def copy(self, dst, suppress_layouts=False):
+        """
+        Copy artifact from this path to destination. Between instances,
+        the artifact is deployed by checksum if possible, and streamed
+        otherwise.
+        """
+        if self.drive == dst.drive:
+            await self._accessor.copy(self, dst, suppress_layouts=suppress_layouts)
+            return
+
+        stat = await self.stat()
+        if await dst._accessor.deploy_by_checksum(dst, md5=stat.md5, sha1=stat.sha1,
+                                                  sha256=stat.sha256):
+            return
+
+        async with self.open() as stream:
+            await dst.deploy(stream, md5=stat.md5, sha1=stat.sha1, sha256=stat.sha256,
+                             checksum_deploy=False)
+
+    async def move(self, dst):
+        """
+        Move artifact from this path to destinaiton.
+        """
+        if self.drive != dst.drive:
+            raise NotImplementedError(
+                "Moving between instances is not implemented yet")
+
+        await self._accessor.move(self, dst)
+
+    async def get_properties(self):
+        """
+        Fetch artifact properties
+        """
+        return await self._accessor.get_properties(self)
+
+    async def set_properties(self, properties, recursive=True):
+        """
+        Adds new or modifies existing properties listed in properties
+        """
+        if not properties:
+            return
+
+        await self._accessor.set_properties(self, properties, recursive)
+
+    async def del_properties(self, properties, recursive=None):
+        """
+        Delete properties listed in properties
+        """
+        await self._accessor.del_properties(self, properties, recursive)
+
+    async def update_properties(self, add=None, remove=None, recursive=True):
+        """
+        Sets the properties in add and deletes those in remove, see
+        ArtifactoryPath.update_properties()
+        """
+        if isinstance(remove, str):
+            remove = (remove,)
+        remove = set(remove or ())
+        if add and remove.intersection(add):
+            raise ValueError("Properties both set and deleted: %s" %
+                             ', '.join(sorted(remove.intersection(add))))
+
+        if add:
+            await self._accessor.set_properties(self, add, recursive)
+        if remove:
+            await self._accessor.del_properties(self, remove, recursive)
@@ -0,0 +1,178 @@
+import copy
+import json
+import codecs
+
+from .utils import export
+
+@export
+class AQLQuery(object):
+  """
+  Composes an Artifactory Query Language query, e.g.
+
+  >>> query = AQLQuery('items').find({'repo': 'libs-release-local'},
+  ...                                name={'$match': '*.jar'})
+  >>> str(query.include('repo', 'path', 'name').sort('size', order='$desc').limit(10))
+  'items.find({"name": {"$match": "*.jar"}, "repo": "libs-release-local"}).include("repo","path","name").sort({"$desc": ["size"]}).limit(10)'
+
+  All methods return a new query, so partial queries can be reused.
+  A query created by ArtifactoryPath.aql() is bound to the Artifactory
+  instance and credentials of the path, and iterating over it runs it.
+  Sorted queries are fetched page_size results per request; unsorted
+  ones in a single request, since their order isn't stable across
+  requests.
+
+  See https://www.jfrog.com/confluence/display/RTF/Artifactory+Query+Language
+  """
+  def __init__(self, domain='items', criteria=None, pathobj=None, page_size=1000):
+    self.domain = domain
+    self.pathobj = pathobj
+    self.page_size = page_size
+    self._criteria = dict(criteria or {})
+    self._fields = ()
+    self._sort = None
+    self._offset = None
+    self._limit = None
+
+  def _replace(self, **kwargs):
+    obj = copy.copy(self)
+    for attr, value in kwargs.items():
+      setattr(obj, attr, value)
+    return obj
+
+  def find(self, *criteria, **kwargs):
+    """
+    Adds search criteria. Takes dictionaries and/or keyword arguments,
+    which are merged into the criteria of the query.
+    """
+    merged = dict(self._criteria)
+    for criterion in criteria:
+      merged.update(criterion)
+    merged.update(kwargs)
+    return self._replace(_criteria=merged)
+
+  def include(self, *fields):
+    """
+    Restricts (or extends, for fields of other domains) the fields
+    returned for each result
+    """
+    return self._replace(_fields=self._fields + fields)
+
+  def sort(self, *fields, **kwargs):
+    """
+    Sorts results by fields, order being either '$asc' (default)
+    or '$desc'
+    """
+    order = kwargs.get('order', '$asc')
+    if order not in ('$asc', '$desc'):
+      raise ValueError("Invalid sort order: '%s'" % order)
+    return self._replace(_sort={order: list(fields)})
+
+  def offset(self, offset):
+    """
+    Skips the first 'offset' results
+    """
+    return self._replace(_offset=int(offset))
+
+  def limit(self, limit):
+    """
+    Returns at most 'limit' results
+    """
+    return self._replace(_limit=int(limit))
+
+  def __str__(self):
+    query = '%s.find(%s)' % (self.domain, json.dumps(self._criteria, sort_keys=True))
+
+    if self._fields:
+      query += '.include(%s)' % ','.join(json.dumps(field) for field in self._fields)
+    if self._sort:
+      query += '.sort(%s)' % json.dumps(self._sort)
+    if self._offset is not None:
+      query += '.offset(%d)' % self._offset
+    if self._limit is not None:
+      query += '.limit(%d)' % self._limit
+
+    return query
+
+  def __repr__(self):
+    return 'AQLQuery(%s)' % str(self)
+
+  def __iter__(self):
+    """
+    Runs the query and yields the results one by one. Sorted queries
+    are requested in pages of page_size results, unless it is None.
+    Without a sort order, pages could skip or repeat results, so the
+    query is always run in one request, whose response is parsed as it
+    arrives.
+    """
+    if self.pathobj is None:
+      raise RuntimeError("Query is not bound to an Artifactory instance")
+
+    accessor = self.pathobj._accessor
+
+    if not self.page_size or not self._sort:
+      for item in accessor.aql(self.pathobj, str(self)):
+        yield item
+      return
+
+    start = self._offset or 0
+    remaining = self._limit
+
+    while remaining is None or remaining > 0:
+      size = self.page_size if remaining is None else min(self.page_size, remaining)
+      page = self.offset(start).limit(size)
+
+      count = 0
+      for item in accessor.aql(self.pathobj, str(page)):
+        count += 1
+        yield item
+
+      if count < size:
+        return
+
+      start += count
+      if remaining is not None:
+        remaining -= count
+
+@export
+def iter_results(fobj, chunk_size=64 * 1024):
+  """
+  Incrementally parses an AQL response read from a file-like object and
+  yields the entries of its 'results' array one by one, so that memory
+  use doesn't depend on the size of the response.
+  """
+  decoder = json.JSONDecoder()
+  text_decoder = codecs.getincrementaldecoder('utf-8')()
+
+  buf, pos = u'', 0
+  started = eof = False
+
+  while True:
+    if not started:
+      key = buf.find(u'"results"')
+      bracket = buf.find(u'[', key) if key >= 0 else -1
+      if bracket >= 0:
+        pos, started = bracket + 1, True
+        continue
+    else:
+      while pos < len(buf) and buf[pos] in u' \t\r\n,':
+        pos += 1
+
+      if pos < len(buf):
+        if buf[pos] == u']':
+          return
+        try:
+          item, pos = decoder.raw_decode(buf, pos)
+        except ValueError:
+          # the item isn't complete yet, read more data
+          pass
+        else:
+          yield item
+          continue
+
+    if eof:
+      raise ValueError("Unexpected end of AQL response")
+
+    chunk = fobj.read(chunk_size)
+    eof = not chunk
+    buf = buf[pos:] + text_decoder.decode(chunk or b'', final=eof)
+    pos = 0
@@ -0,0 +1,297 @@
+import os
+import errno
+import heapq
+import shutil
+import threading
+import contextlib
+
+try:
+  import fcntl
+except ImportError:
+  # no inter-process locking and no reflinks on this platform
+  fcntl = None
+
+from . import utils
+from .utils import export
+
+# ioctl request to clone a file's extents on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+@export
+class ArtifactCache(object):
+  """
+  Content-addressed local store of downloaded artifacts.
+
+  Files are keyed by the checksums Artifactory reports for them: sha1,
+  which is also what Artifactory addresses its own filestore by, or
+  sha256 if no sha1 is known. Identical artifacts from different paths,
+  repositories or instances are therefore only downloaded once.
+
+  Files are copied into and out of the cache, as reflinks where the
+  file system supports them, so files placed at a destination never
+  share their contents with the cache. Only files whose checksum matches
+  their key are stored.
+
+  The cache is bounded by max_size bytes, evicting least recently used
+  files first. Its size is tracked in memory and the directory is only
+  rescanned occasionally, so files added by other processes may keep it
+  above max_size for a while. Modifications are serialized with a lock
+  file, so the cache can be shared by several processes.
+  """
+  def __init__(self, directory, max_size=None):
+    self.directory = directory
+    self.max_size = max_size
+    self._lock = threading.Lock()
+    # heap of (mtime, size, path) of the cached files, and their total
+    # size, once the directory has been scanned
+    self._entries = None
+    self._total = 0
+    self._added = 0
+
+    try:
+      os.makedirs(directory)
+    except OSError as exc:
+      if exc.errno != errno.EEXIST:
+        raise
+
+  @staticmethod
+  def key(sha1=None, sha256=None):
+    """
+    Returns the (algorithm, checksum) key for the given checksums, or
+    None if they're unknown
+    """
+    if sha1:
+      return ('sha1', sha1.lower())
+    if sha256:
+      return ('sha256', sha256.lower())
+    return None
+
+  def path(self, key):
+    """
+    Returns the location of the file with the given key in the cache
+    """
+    algorithm, checksum = key
+    return os.path.join(self.directory, algorithm, checksum[:2], checksum)
+
+  def get(self, key, size=None):
+    """
+    Returns the location of the cached file with the given key and, if
+    given, size, or None if it isn't cached
+    """
+    if key is None:
+      return None
+
+    path = self.path(key)
+    try:
+      st = os.stat(path)
+      # hardlinks left by older versions may have been modified in place
+      if st.st_nlink > 1 or (size is not None and st.st_size != size):
+        return None
+      # the modification time tracks when the file was last used
+      os.utime(path, None)
+    except OSError:
+      return None
+
+    return path
+
+  def put(self, key, filename):
+    """
+    Stores a copy of filename under key, unless its checksum doesn't
+    match the key. Returns True if the file is cached afterwards.
+    """
+    if key is None:
+      return False
+
+    path = self.path(key)
+    if self.get(key) is not None:
+      return True
+
+    cache_dir = os.path.dirname(path)
+    try:
+      os.makedirs(cache_dir)
+    except OSError as exc:
+      if exc.errno != errno.EEXIST:
+        raise
+
+    algorithm, checksum = key
+    tmp = os.path.join(cache_dir, '.%s.%d.%d.tmp' % (
+      checksum, os.getpid(), threading.current_thread().ident))
+
+    try:
+      _clone(filename, tmp)
+      # checksum the copy, which can't change anymore
+      if utils.hexdigest(tmp, algorithm) != checksum:
+        os.remove(tmp)
+        return False
+
+      with self.locked():
+        if os.name == 'nt' and os.path.exists(path):
+          os.remove(path)
+        os.rename(tmp, path)
+
+        if self.max_size is not None:
+          self._track(path)
+    except BaseException:
+      if os.path.exists(tmp):
+        os.remove(tmp)
+      raise
+
+    return True
+
+  def link_to(self, key, destination, size=None):
+    """
+    Places the cached file with the given key at destination.
+    Returns False if it isn't cached.
+    """
+    path = self.get(key, size)
+    if path is None:
+      return False
+
+    try:
+      place(path, destination)
+    except (IOError, OSError):
+      # most likely evicted in the meantime
+      if os.path.exists(path):
+        raise
+      return False
+
+    return True
+
+  @contextlib.contextmanager
+  def locked(self):
+    """
+    Holds the cache lock, both within this process and across processes
+    """
+    with self._lock:
+      if fcntl is None:
+        yield
+        return
+
+      with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+          yield
+        finally:
+          fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+  def _scan(self):
+    """
+    Rebuilds the list of cached files and their total size from the
+    directory. Has to be called with the lock held.
+    """
+    entries = []
+    total = 0
+
+    for dirpath, _, filenames in os.walk(self.directory):
+      for filename in filenames:
+        if filename.startswith('.'):
+          continue
+        path = os.path.join(dirpath, filename)
+        try:
+          st = os.stat(path)
+        except OSError:
+          continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    heapq.heapify(entries)
+    self._entries = entries
+    self._total = total
+    self._added = 0
+
+  def _track(self, path):
+    """
+    Accounts for a file added to the cache and evicts files if needed.
+    Has to be called with the lock held.
+    """
+    # rescanning after as many additions as there were files keeps the
+    # cost per addition constant, and picks up other processes' files
+    if self._entries is None or self._added >= max(len(self._entries), 64):
+      self._scan()
+    else:
+      st = os.stat(path)
+      heapq.heappush(self._entries, (st.st_mtime, st.st_size, path))
+      self._total += st.st_size
+      self._added += 1
+
+    self._evict()
+
+  def _evict(self):
+    """
+    Removes least recently used files until the cache fits into max_size
+    Has to be called with the lock held.
+    """
+    while self._total > self.max_size and self._entries:
+      mtime, size, path = heapq.heappop(self._entries)
+      try:
+        st = os.stat(path)
+      except OSError:
+        self._total -= size
+        continue
+
+      if st.st_mtime > mtime:
+        # used since it was recorded, requeue it
+        heapq.heappush(self._entries, (st.st_mtime, st.st_size, path))
+        self._total += st.st_size - size
+        continue
+
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      self._total -= size
+
+def _reflink(src, dst):
+  """
+  Clones src into dst without copying data, if the file system
+  supports it. Returns True on success.
+  """
+  if fcntl is None:
+    return False
+
+  try:
+    with open(src, 'rb') as src_file:
+      with open(dst, 'wb') as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    return True
+  except (IOError, OSError):
+    if os.path.exists(dst):
+      os.remove(dst)
+    return False
+
+def _clone(src, dst):
+  """
+  Writes the contents of src to a new file dst, as a reflink if
+  possible or as a copy otherwise
+  """
+  if not _reflink(src, dst):
+    shutil.copyfile(src, dst)
+
+@export
+def place(src, dst):
+  """
+  Atomically puts the contents of file src at dst, as a reflink if
+  possible or as a copy otherwise. dst never shares its contents with
+  src, so either can be modified without affecting the other.
+  Missing parent directories of dst are created.
+  """
+  dst_dir = os.path.dirname(dst)
+  if dst_dir:
+    try:
+      os.makedirs(dst_dir)
+    except OSError as exc:
+      if exc.errno != errno.EEXIST:
+        raise
+
+  tmp = '%s.%d.%d.tmp' % (dst, os.getpid(), threading.current_thread().ident)
+
+  try:
+    _clone(src, tmp)
+
+    if os.path.exists(dst) and os.name == 'nt':
+      os.remove(dst)
+    os.rename(tmp, dst)
+  except BaseException:
+    if os.path.exists(tmp):
+      os.remove(tmp)
+    raise
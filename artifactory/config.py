@@ -2,20 +2,79 @@ import os
 import yaml
 
 from . import utils
-from . import urls
 
 from .exceptions import *
 from .utils import export, singleton
 
+# Per-instance settings that are applied when a config entry doesn't
+# specify them explicitly. Also used for instances that aren't configured.
+DEFAULTS = {
+  'username':         None,
+  'password':         None,
+  'verify':           True,
+  'cert':             None,
+  'pool_connections': 10,
+  'pool_maxsize':     10,
+  'pool_block':       False,
+  'keep_alive':       True,
+  'download_segments': 1,
+  'segment_size':     8 * 1024 * 1024,
+  'cache_dir':        None,
+  'cache_max_size':   10 * 1024 ** 3,
+  'async_limit':      100,
+  'async_limit_per_host': 0,
+  'retries':          3,
+  'retry_backoff':    0.5,
+  'retry_backoff_max': 30,
+  'retry_statuses':   [429, 502, 503, 504],
+  'breaker_threshold': 10,
+  'breaker_timeout':  30,
+  'max_in_flight':    0,
+  'rate_limit':       0,
+  'rate_burst':       None,
+}
+
+def _normalize(url, separator='/'):
+  """
+  Returns url without the scheme and trailing separators, which is how
+  config entries are matched
+  """
+  return (url.partition('://')[2] or url).rstrip(separator)
+
 @export
 @singleton
 class ArtifactoryConfig(dict):
   def __init__(self, *args, **kwargs):
+    self.generation = 0
     self.update(*args, **kwargs)
 
   def __getitem__(self, key):
     search_key = self.search(key) if key not in self else key
     return self.get(search_key, None)
+
+  def _reindex(self):
+    """
+    Rebuilds the lookup index: entries are grouped by host and sorted
+    longest base URL first, so that the most specific entry wins.
+    Bumps 'generation', which callers caching results derived from the
+    config can use to notice changes.
+    """
+    index = {}
+    for entry in self:
+      base = _normalize(entry)
+      host = base.partition('/')[0]
+      index.setdefault(host, []).append((base, entry))
+
+    for candidates in index.values():
+      candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+
+    self._index = index
+    self._searches = utils.LRUCache(maxsize=4096)
+    self.generation += 1
+
+  def update(self, *args, **kwargs):
+    super(ArtifactoryConfig, self).update(*args, **kwargs)
+    self._reindex()
     
   def __setitem__(self, key, value):
     raise ImmutableConfigError("attempt to change value on immutable config object")
@@ -25,12 +84,23 @@ class ArtifactoryConfig(dict):
     return 'Config(%s)' % dictrepr
 
   def search(self, search, separator='/'):
-    search_url = urls.urlparse(search).protoless_url
-    for entry in self:
-      entry_url = urls.urlparse(entry).protoless_url.rstrip(separator)
-      if search_url.startswith(entry_url):
-        return entry
-    return None
+    """
+    Returns the config entry with the longest base URL that search
+    starts with, ignoring the scheme, or None
+    """
+    found = self._searches.get(search, self)
+    if found is not self:
+      return found
+
+    search_url = search.partition('://')[2] or search
+    found = None
+    for base, entry in self._index.get(search_url.partition(separator)[0], ()):
+      if search_url.startswith(base):
+        found = entry
+        break
+
+    self._searches.set(search, found)
+    return found
 
   @property
   def to_yaml(self):
@@ -45,6 +115,25 @@ class ArtifactoryConfig(dict):
         password: '<password>'
         verify: true/false
         cert: /path/to/certificate
+        pool_connections: 10
+        pool_maxsize: 10
+        pool_block: false
+        keep_alive: true
+        download_segments: 1
+        segment_size: 8388608
+        cache_dir: ~/.cache/artifactory
+        cache_max_size: 10737418240
+        async_limit: 100
+        async_limit_per_host: 0
+        retries: 3
+        retry_backoff: 0.5
+        retry_backoff_max: 30
+        retry_statuses: [429, 502, 503, 504]
+        breaker_threshold: 10
+        breaker_timeout: 30
+        max_in_flight: 0
+        rate_limit: 0
+        rate_burst: null
       http://bar.baz.com/:
         ...
 
@@ -60,6 +149,7 @@ class ArtifactoryConfig(dict):
   
   def clear(self):
     super(ArtifactoryConfig, self).clear()
+    self._reindex()
     return self
     
   def load(self, data_dict):
@@ -73,12 +163,9 @@ class ArtifactoryConfig(dict):
       cert = None
       if 'cert' in data and data['cert']:
         cert = os.path.expanduser(data.get('cert'))
-      data.update({
-        'username': data.get('username', None),
-        'password': data.get('password', None),
-        'verify':   data.get('verify', True),
-        'cert':     cert
-      })
+      for setting, default in DEFAULTS.items():
+        data.setdefault(setting, default)
+      data['cert'] = cert
     
     return self
 
@@ -7,3 +7,15 @@ class ArtifactoryError(Exception):
 @export
 class ImmutableConfigError(ArtifactoryError): 
   pass
+
+@export
+class ChecksumMismatchError(ArtifactoryError):
+  pass
+
+@export
+class CircuitOpenError(ArtifactoryError):
+  """
+  Raised instead of sending a request to an Artifactory instance that
+  recently failed repeatedly, see the 'breaker_*' Config settings
+  """
+  pass
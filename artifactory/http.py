@@ -1,3 +1,7 @@
+import io
+import hashlib
+import collections
+
 
 class HTTPResponseWrapper(object):
     """
@@ -37,6 +41,177 @@ class HTTPResponseWrapper(object):
         return int(self.getheader('content-length'))
 
 
+class HashingReader(object):
+    """
+    Streaming upload source that hashes the data of a file-like object as
+    it is read, so the checksums of a transfer are known once it's done,
+    without buffering or re-reading the data.
+
+    Like HTTPResponseWrapper, it has no seek(), and reports 'size' as its
+    length, so that 'requests' sends it with a Content-Length instead of
+    reading it in advance. The data is read from fobj in chunks of
+    chunk_size bytes, however much the caller asks for at a time:
+    http.client reads its body in small blocks, which are served from
+    the current chunk.
+    """
+    def __init__(self, fobj, size=None, algorithms=('md5', 'sha1', 'sha256'),
+                 chunk_size=1024 * 1024):
+        self.fobj = fobj
+        self.size = size
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._hashers = [(name, getattr(hashlib, name)()) for name in algorithms]
+        self._chunk = b''
+        self._offset = 0
+
+    def _next_chunk(self):
+        data = self.fobj.read(self.chunk_size)
+        if data:
+            self.bytes_read += len(data)
+            for _, hasher in self._hashers:
+                hasher.update(data)
+        return data
+
+    def read(self, size=-1):
+        if self._offset >= len(self._chunk):
+            self._chunk = self._next_chunk()
+            self._offset = 0
+        if size is None or size < 0:
+            size = len(self._chunk)
+        data = self._chunk[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def __iter__(self):
+        if self._offset < len(self._chunk):
+            yield self.read()
+        while True:
+            data = self._next_chunk()
+            if not data:
+                return
+            yield data
+
+    def __len__(self):
+        """
+        Unknown sizes are reported as 0, for chunked encoding to be used
+        """
+        return self.size or 0
+
+    def hexdigests(self):
+        """
+        Returns a dictionary that maps algorithm names to hex digests
+        of the data read so far
+        """
+        return dict((name, hasher.hexdigest()) for name, hasher in self._hashers)
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file-like object on top of HTTP range requests.
+
+    fetch(start, end) has to return bytes start to end (inclusive) of the
+    remote file, which is size bytes long. Data is fetched in blocks of
+    block_size bytes, the cache_blocks most recently used of which are
+    kept in memory. After sequential reads, the next 'readahead' blocks
+    are fetched along with the requested one, in a single request.
+
+    If fetch() returns less data than requested, e.g. because the remote
+    file changed, reading raises IOError instead of mixing up versions.
+    """
+    def __init__(self, fetch, size, block_size=256 * 1024, cache_blocks=16, readahead=4):
+        super(RangeFile, self).__init__()
+        self._fetch = fetch
+        self._size = size
+        self._pos = 0
+        self.block_size = block_size
+        self.cache_blocks = max(cache_blocks, 1)
+        self.readahead = readahead
+        self._blocks = collections.OrderedDict()
+        self._last_block = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError("Invalid whence: %r" % whence)
+
+        if pos < 0:
+            raise ValueError("Negative seek position %d" % pos)
+
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        # fill b across block boundaries: callers like zipfile expect
+        # full reads before the end of the file
+        view = memoryview(b)
+        total = 0
+        while total < len(view) and self._pos < self._size:
+            index = self._pos // self.block_size
+            block = self._get_block(index)
+
+            start = self._pos - index * self.block_size
+            count = max(0, min(len(view) - total, len(block) - start))
+            if not count:
+                raise IOError("Short read at offset %d of %d" % (self._pos, self._size))
+            view[total:total + count] = block[start:start + count]
+
+            self._pos += count
+            total += count
+
+        return total
+
+    def _get_block(self, index):
+        block = self._blocks.pop(index, None)
+
+        if block is None:
+            count = 1
+            if self._last_block is not None and index == self._last_block + 1:
+                count = min(1 + self.readahead, self.cache_blocks)
+
+            start = index * self.block_size
+            end = min(start + count * self.block_size, self._size) - 1
+            data = self._fetch(start, end)
+            if len(data) < end + 1 - start:
+                raise IOError("Short read: got %d of %d bytes at offset %d" % (
+                    len(data), end + 1 - start, start))
+
+            for i in range(count):
+                chunk = data[i * self.block_size:(i + 1) * self.block_size]
+                if chunk and i:
+                    self._store(index + i, chunk)
+            block = data[:self.block_size]
+
+        self._store(index, block)
+        self._last_block = index
+        return block
+
+    def _store(self, index, block):
+        self._blocks.pop(index, None)
+        self._blocks[index] = block
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def close(self):
+        self._blocks.clear()
+        super(RangeFile, self).close()
+
+
 def encode_matrix_parameters(parameters):
     """
     Performs encoding of url matrix parameters from dictionary to
@@ -0,0 +1,274 @@
+import json
+import time
+import logging
+import threading
+import collections
+
+from .utils import export
+
+logger = logging.getLogger('artifactory')
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+@export
+def classify(method, path, params=None, headers=None):
+  """
+  Returns the name of the operation a REST request performs, given its
+  method, its URL path relative to the drive, and its query parameters
+  and headers
+  """
+  params = params or ()
+  if path.startswith('/api/storage'):
+    if 'properties' in params:
+      return 'properties'
+    if 'list' in params:
+      return 'list'
+    return 'stat'
+  if path.startswith('/api/copy/'):
+    return 'copy'
+  if path.startswith('/api/move/'):
+    return 'move'
+  if path.startswith('/api/search/aql'):
+    return 'aql'
+  if path.startswith('/api/'):
+    return 'api'
+
+  if method == 'GET':
+    return 'download'
+  if method == 'PUT':
+    if path.endswith('/'):
+      return 'mkdir'
+    if headers and headers.get('X-Checksum-Deploy') == 'true':
+      return 'deploy_by_checksum'
+    return 'deploy'
+  if method == 'DELETE':
+    return 'delete'
+  return method.lower()
+
+@export
+class RequestInfo(object):
+  """
+  A REST request as seen by the request hooks. Fields after 'started'
+  are filled in when the request completes:
+
+    method -- HTTP method
+    url -- requested URL, without query parameters
+    drive -- Artifactory instance the request went to
+    operation -- see classify()
+    started -- timer() value at the start of the request
+    elapsed -- seconds until the response was received: for streamed
+               responses (downloads, AQL), until its headers arrived;
+               otherwise until requests had read the whole body
+    status -- HTTP status code, or None if the request failed
+    bytes_sent -- size of the request body
+    bytes_received -- size of the response body; for streamed
+                      responses, the announced Content-Length
+    error -- exception the request failed with, or None
+  """
+  __slots__ = ('method', 'url', 'drive', 'operation', 'started', 'elapsed',
+               'status', 'bytes_sent', 'bytes_received', 'error')
+
+  def __init__(self, method, url, drive, operation):
+    self.method = method
+    self.url = url
+    self.drive = drive
+    self.operation = operation
+    self.started = timer()
+    self.elapsed = None
+    self.status = None
+    self.bytes_sent = 0
+    self.bytes_received = 0
+    self.error = None
+
+  def __repr__(self):
+    return 'RequestInfo(%s %s, operation=%s, status=%s, elapsed=%s)' % (
+      self.method, self.url, self.operation, self.status, self.elapsed)
+
+class _Series(object):
+  """
+  Counters of the requests of one operation on one drive
+  """
+  def __init__(self, buckets):
+    self.count = 0
+    self.errors = 0
+    self.status_codes = collections.Counter()
+    self.bytes_sent = 0
+    self.bytes_received = 0
+    self.latency_sum = 0.0
+    # the last bucket counts requests slower than all bounds
+    self.latency_buckets = [0] * (len(buckets) + 1)
+
+@export
+class RequestMetrics(object):
+  """
+  In-process metrics of the REST requests made by _ArtifactoryAccessor:
+  request counts, status codes, bytes sent and received and a latency
+  histogram, broken down by operation and drive.
+
+  Hooks added with add_hook() are called with a RequestInfo before and
+  after every request. Requests that take longer than slow_threshold
+  seconds are logged as warnings to the 'artifactory' logger.
+  """
+  def __init__(self, buckets=LATENCY_BUCKETS, slow_threshold=None):
+    self.enabled = True
+    self.slow_threshold = slow_threshold
+    self.buckets = tuple(buckets)
+    self._series = {}
+    self._before = []
+    self._after = []
+    self._lock = threading.Lock()
+
+  def add_hook(self, before=None, after=None):
+    """
+    Registers callables that are called with the RequestInfo of each
+    request before it is sent and after it completed or failed
+    """
+    with self._lock:
+      if before is not None:
+        self._before = self._before + [before]
+      if after is not None:
+        self._after = self._after + [after]
+
+  def remove_hook(self, before=None, after=None):
+    with self._lock:
+      self._before = [hook for hook in self._before if hook is not before]
+      self._after = [hook for hook in self._after if hook is not after]
+
+  def _call_hooks(self, hooks, info):
+    for hook in hooks:
+      try:
+        hook(info)
+      except Exception:
+        logger.exception("Request hook %r failed", hook)
+
+  def before(self, info):
+    """
+    Called by the accessor before sending a request
+    """
+    self._call_hooks(self._before, info)
+
+  def after(self, info):
+    """
+    Called by the accessor after a request completed or failed
+    """
+    self.record(info)
+
+    if self.slow_threshold is not None and info.elapsed >= self.slow_threshold:
+      logger.warning("Slow request: %s %s (%s) took %.3fs, status %s",
+                     info.method, info.url, info.operation, info.elapsed,
+                     info.status if info.error is None else repr(info.error))
+
+    self._call_hooks(self._after, info)
+
+  def record(self, info):
+    bucket = 0
+    while bucket < len(self.buckets) and info.elapsed > self.buckets[bucket]:
+      bucket += 1
+
+    key = (info.operation, info.drive)
+    with self._lock:
+      series = self._series.get(key)
+      if series is None:
+        series = self._series[key] = _Series(self.buckets)
+
+      series.count += 1
+      if info.error is not None:
+        series.errors += 1
+      else:
+        series.status_codes[info.status] += 1
+      series.bytes_sent += info.bytes_sent
+      series.bytes_received += info.bytes_received
+      series.latency_sum += info.elapsed
+      series.latency_buckets[bucket] += 1
+
+  def reset(self):
+    with self._lock:
+      self._series = {}
+
+  def snapshot(self, operation=None, drive=None):
+    """
+    Returns a list of dicts with the counters for each operation and
+    drive, optionally only those of the given operation or drive.
+    'latency_buckets' maps the upper bound of each bucket to the
+    cumulative number of requests that took at most that long.
+    """
+    result = []
+    with self._lock:
+      for (op, drv), series in sorted(self._series.items()):
+        if operation is not None and op != operation:
+          continue
+        if drive is not None and drv != drive:
+          continue
+
+        cumulative, buckets = 0, collections.OrderedDict()
+        for bound, count in zip(self.buckets + (float('inf'),), series.latency_buckets):
+          cumulative += count
+          buckets['+Inf' if bound == float('inf') else repr(bound)] = cumulative
+
+        result.append(collections.OrderedDict([
+          ('operation', op),
+          ('drive', drv),
+          ('count', series.count),
+          ('errors', series.errors),
+          ('status_codes', dict((str(code), n) for code, n in series.status_codes.items())),
+          ('bytes_sent', series.bytes_sent),
+          ('bytes_received', series.bytes_received),
+          ('latency_sum', series.latency_sum),
+          ('latency_buckets', buckets),
+        ]))
+    return result
+
+  def to_json(self, **kwargs):
+    """
+    Returns the snapshot() as a JSON string
+    """
+    return json.dumps({'requests': self.snapshot()}, **kwargs)
+
+  def to_prometheus(self, prefix='artifactory'):
+    """
+    Returns the metrics in the Prometheus text exposition format
+    """
+    def labels(**values):
+      return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                                   .replace('"', '\\"').replace('\n', '\\n'))
+                      for name, value in sorted(values.items()))
+
+    snapshot = self.snapshot()
+    lines = []
+
+    lines.append('# HELP %s_requests_total REST requests by status code' % prefix)
+    lines.append('# TYPE %s_requests_total counter' % prefix)
+    for series in snapshot:
+      codes = dict(series['status_codes'])
+      if series['errors']:
+        codes['error'] = series['errors']
+      for code, count in sorted(codes.items()):
+        lines.append('%s_requests_total{%s} %d' % (prefix, labels(
+          operation=series['operation'], drive=series['drive'], status=code), count))
+
+    for name, key, description in (('request_bytes_total', 'bytes_sent', 'Bytes sent'),
+                            ('response_bytes_total', 'bytes_received', 'Bytes received')):
+      lines.append("# HELP %s_%s %s" % (prefix, name, description))
+      lines.append('# TYPE %s_%s counter' % (prefix, name))
+      for series in snapshot:
+        lines.append('%s_%s{%s} %d' % (prefix, name, labels(
+          operation=series['operation'], drive=series['drive']), series[key]))
+
+    lines.append('# HELP %s_request_duration_seconds REST request latency' % prefix)
+    lines.append('# TYPE %s_request_duration_seconds histogram' % prefix)
+    for series in snapshot:
+      common = dict(operation=series['operation'], drive=series['drive'])
+      for bound, count in series['latency_buckets'].items():
+        lines.append('%s_request_duration_seconds_bucket{%s} %d' % (
+          prefix, labels(le=bound, **common), count))
+      lines.append('%s_request_duration_seconds_sum{%s} %r' % (
+        prefix, labels(**common), series['latency_sum']))
+      lines.append('%s_request_duration_seconds_count{%s} %d' % (
+        prefix, labels(**common), series['count']))
+
+    return '\n'.join(lines) + '\n'
+
+Metrics = RequestMetrics()
@@ -1,4 +1,6 @@
+import os
 import sys
+import time
 import collections
 import errno
 import pathlib
@@ -6,19 +8,37 @@ import collections
 import requests
 import re
 import json
-import dateutil.parser
+import fnmatch
+import hashlib
+import itertools
+import threading
+import concurrent.futures
+import requests.adapters
 
 try:
     import requests.packages.urllib3 as urllib3
 except ImportError:
     import urllib3
 
+try:
+    import http.cookiejar as cookiejar
+except ImportError:
+    import cookielib as cookiejar
+
+from . import aql
 from . import http
+from . import cache
 from . import utils
+from . import config
+from . import metrics
+from . import retry
+from . import throttle
 
+from .exceptions import ArtifactoryError, ChecksumMismatchError, CircuitOpenError
 from .urls import protoless_url, urlparse
 from .utils import export, singleton
 from .config import Config
+from .metrics import Metrics
 
 @export
 @singleton
@@ -43,6 +63,9 @@ class _ArtifactoryFlavour(pathlib._Flavour):
 
     is_supported = (True)
 
+    # splitroot() results, keyed by Config generation and the path string
+    _splitroot_cache = utils.LRUCache(maxsize=16384)
+
     def parse_parts(self, parts):
         drv, root, parsed = super(_ArtifactoryFlavour, self).parse_parts(parts)
         return drv, root, parsed
@@ -56,7 +79,14 @@ class _ArtifactoryFlavour(pathlib._Flavour):
         The next folder is treated as root, and everything else is taken
         for relative path.
         """
+        key = (Config.generation, part, sep)
+        result = self._splitroot_cache.get(key)
+        if result is None:
+            result = self._splitroot(part, sep)
+            self._splitroot_cache.set(key, result)
+        return result
 
+    def _splitroot(self, part, sep=sep):
         base = Config.search(part.rstrip(sep))
         url  = urlparse(part)
 
@@ -124,61 +154,884 @@ class _ArtifactoryFlavour(pathlib._Flavour):
         """
         return path
 
-ArtifactoryFileStat = collections.namedtuple(
-    'ArtifactoryFileStat',
-    ['ctime',
-     'mtime',
-     'st_ctime',
-     'st_mtime',
-     'created_by',
-     'modified_by',
-     'mime_type',
+_STAT_FIELDS = (
+    'ctime',
+    'mtime',
+    'st_ctime',
+    'st_mtime',
+    'created_by',
+    'modified_by',
+    'mime_type',
+    'size',
+    'st_size',
+    'sha512',
+    'sha256',
+    'sha1',
+    'md5',
+    'is_dir',
+    'children')
+
+# st_* fields share the value of the field they mirror
+_STAT_ALIASES = {
+    'st_ctime': 'ctime',
+    'st_mtime': 'mtime',
+    'st_size': 'size',
+}
+
+
+def _stat_field(name):
+    alias = _STAT_ALIASES.get(name)
+
+    if alias is not None:
+        def getter(self):
+            return getattr(self, alias)
+    else:
+        def getter(self):
+            values = self._values
+            try:
+                return values[name]
+            except KeyError:
+                value = values[name] = self._getters[name](self._json)
+                return value
+
+    return property(getter)
+
+
+@export
+class ArtifactoryFileStat(tuple):
+    """
+    Remote file/directory status info, see _ArtifactoryAccessor.stat()
+    for the available fields.
+
+    Stats built from server responses keep the raw JSON and only convert
+    a field when it's first accessed. Otherwise this behaves like the
+    namedtuple it used to be: it is a tuple, can be built from positional
+    or keyword arguments, unpacked, indexed, compared and supports
+    _fields, _asdict(), _replace() and _make().
+
+    The values aren't stored in the underlying tuple, which is empty;
+    the tuple interface is implemented on top of the fields.
+    """
+    _fields = _STAT_FIELDS
+
+    def __new__(cls, *args, **kwargs):
+        if len(args) > len(cls._fields):
+            raise TypeError("ArtifactoryFileStat takes at most %d arguments"
+                            % len(cls._fields))
+
+        values = dict(zip(cls._fields, args))
+        for name, value in kwargs.items():
+            if name not in cls._fields or name in values:
+                raise TypeError("Unexpected or duplicate field '%s'" % name)
+            values[name] = value
+
+        missing = [name for name in cls._fields if name not in values]
+        if missing:
+            raise TypeError("Missing fields: %s" % ", ".join(missing))
+
+        for name in _STAT_ALIASES:
+            del values[name]
+
+        stat = tuple.__new__(cls)
+        stat._values = values
+        stat._json = None
+        stat._getters = None
+        return stat
+
+    @classmethod
+    def _from_json(cls, jsn, getters):
+        stat = tuple.__new__(cls)
+        stat._values = {}
+        stat._json = jsn
+        stat._getters = getters
+        return stat
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def _asdict(self):
+        return collections.OrderedDict(zip(self._fields, self))
+
+    def _replace(self, **kwargs):
+        values = self._asdict()
+        values.update(kwargs)
+        return self.__class__(**values)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    if sys.version_info < (3,):
+        def __getslice__(self, start, stop):
+            return tuple(self)[start:stop]
+
+    def __contains__(self, value):
+        return value in tuple(self)
+
+    def count(self, value):
+        return tuple(self).count(value)
+
+    def index(self, *args):
+        return tuple(self).index(*args)
+
+    def __add__(self, other):
+        return tuple(self) + other
+
+    def __radd__(self, other):
+        return other + tuple(self)
+
+    def __mul__(self, count):
+        return tuple(self) * count
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) != tuple(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) < tuple(other)
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) <= tuple(other)
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) > tuple(other)
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, tuple):
+            return tuple(self) >= tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (self.__class__, tuple(self))
+
+    def __repr__(self):
+        return "ArtifactoryFileStat(%s)" % ", ".join(
+            "%s=%r" % (name, value) for name, value in self._asdict().items())
+
+for _name in _STAT_FIELDS:
+    setattr(ArtifactoryFileStat, _name, _stat_field(_name))
+
+
+def _parse_time(value):
+    return utils.parse_iso8601(value) if value else None
+
+
+def _checksum(algorithm):
+    return lambda jsn: (jsn.get('checksums') or {}).get(algorithm)
+
+
+def _storage_children(jsn):
+    if 'children' not in jsn:
+        return None
+    return [child['uri'][1:] for child in jsn['children']]
+
+
+_STORAGE_STAT_GETTERS = {
+    'ctime':       lambda jsn: _parse_time(jsn.get('created')),
+    'mtime':       lambda jsn: _parse_time(jsn.get('lastModified')),
+    'created_by':  lambda jsn: jsn.get('createdBy', None),
+    'modified_by': lambda jsn: jsn.get('modifiedBy', None),
+    'mime_type':   lambda jsn: jsn.get('mimeType', None),
+    'size':        lambda jsn: int(jsn.get('size', '0')),
+    'sha512':      _checksum('sha512'),
+    'sha256':      _checksum('sha256'),
+    'sha1':        _checksum('sha1'),
+    'md5':         _checksum('md5'),
+    'is_dir':      lambda jsn: 'size' not in jsn,
+    'children':    _storage_children,
+}
+
+_LISTING_STAT_GETTERS = {
+    'ctime':       lambda entry: None,
+    'mtime':       lambda entry: _parse_time(entry.get('lastModified')),
+    'created_by':  lambda entry: None,
+    'modified_by': lambda entry: None,
+    'mime_type':   lambda entry: None,
+    # folders are listed with size -1, but stat() reports 0
+    'size':        lambda entry: 0 if entry.get('folder') else int(entry.get('size', 0) or 0),
+    'sha512':      lambda entry: None,
+    'sha256':      lambda entry: entry.get('sha2') or None,
+    'sha1':        lambda entry: entry.get('sha1') or None,
+    'md5':         lambda entry: None,
+    'is_dir':      lambda entry: bool(entry.get('folder', False)),
+    'children':    lambda entry: None,
+}
+
+
+@export
+def stat_from_json(jsn):
+    """
+    Converts a storage API response, as returned by
+    _ArtifactoryAccessor.get_stat_json(), to an ArtifactoryFileStat
+    """
+    return ArtifactoryFileStat._from_json(jsn, _STORAGE_STAT_GETTERS)
+
+
+def _stat_from_listing(entry):
+    """
+    Converts an entry of the file list API to an ArtifactoryFileStat.
+    The listing doesn't report creation time, users, MIME type, md5,
+    sha512 and children, which are None.
+    """
+    return ArtifactoryFileStat._from_json(entry, _LISTING_STAT_GETTERS)
+
+
+class _NotFound(object):
+    """
+    Result of stat_many() for paths that don't exist
+    """
+    def __repr__(self):
+        return 'NOT_FOUND'
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+NOT_FOUND = _NotFound()
+
+export('NOT_FOUND')
+
+
+TransferResult = collections.namedtuple(
+    'TransferResult',
+    ['source',
+     'target',
      'size',
-     'st_size',
-     'sha512',
-     'sha256',
-     'sha1',
-     'md5',
-     'is_dir',
-     'children'])
-     
-export(ArtifactoryFileStat)
+     'skipped',
+     'error',
+     'elapsed'])
+
+export(TransferResult)
+
+@export
+class TransferReport(object):
+    """
+    Outcome of a bulk transfer, such as ArtifactoryPath.deploy_tree()
+
+    results -- list of TransferResult, one per file:
+      source -- local file name or ArtifactoryPath the file was read from
+      target -- ArtifactoryPath or local file name the file was written to
+      size -- file size
+      skipped -- True if no data had to be transferred, because the
+                 target already had the same contents
+      error -- exception that made the transfer fail, or None
+      elapsed -- seconds spent on the file
+    elapsed -- wall time of the whole transfer in seconds
+    """
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def skipped(self):
+        return [result for result in self.results if result.skipped]
+
+    @property
+    def transferred(self):
+        return [result for result in self.results
+                if result.error is None and not result.skipped]
+
+    @property
+    def bytes(self):
+        """
+        Number of bytes actually transferred
+        """
+        return sum(result.size for result in self.transferred)
+
+    @property
+    def throughput(self):
+        """
+        Transferred bytes per second
+        """
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return '<TransferReport: %d files, %d transferred, %d skipped, %d failed, %d bytes in %.2fs>' % (
+            len(self.results), len(self.transferred), len(self.skipped),
+            len(self.failures), self.bytes, self.elapsed)
+
+
+def _run_transfers(function, jobs, workers):
+    """
+    Calls function with each tuple of arguments in jobs from a pool of
+    workers threads and returns a TransferReport of its results
+    """
+    start = time.time()
+
+    if workers and workers > 1 and len(jobs) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda job: function(*job), jobs))
+    else:
+        results = [function(*job) for job in jobs]
+
+    return TransferReport(results, time.time() - start)
+
+
+def _read_part_meta(part_path):
+    """
+    Returns what _write_part_meta() stored about part_path, or None
+    """
+    try:
+        with open(part_path + '.meta') as fobj:
+            return json.load(fobj)
+    except (IOError, OSError, ValueError):
+        return None
+
+def _write_part_meta(part_path, meta):
+    """
+    Stores the version of the file a .part file is a download of
+    """
+    with open(part_path + '.meta', 'w') as fobj:
+        json.dump(meta, fobj)
+
+def _download_file(pathobj, local_path, sha1=None, chunk_size=1024 * 1024):
+    """
+    Downloads pathobj to local_path through a temporary file that only
+    replaces local_path once complete and, if sha1 is given, verified.
+    Returns the number of bytes written.
+    """
+    local_dir = os.path.dirname(local_path)
+    if local_dir and not os.path.isdir(local_dir):
+        try:
+            os.makedirs(local_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+
+    tmp_path = local_path + '.part'
+    hasher = hashlib.sha1()
+    size = 0
+
+    try:
+        with pathobj.open() as fobj:
+            with open(tmp_path, 'wb') as out:
+                for chunk in iter(lambda: fobj.read(chunk_size), b''):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+        if sha1 and hasher.hexdigest() != sha1:
+            raise ChecksumMismatchError("Checksum mismatch for '%s': expected sha1 %s, got %s" % (
+                str(pathobj), sha1, hasher.hexdigest()))
+
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        os.rename(tmp_path, local_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return size
+
+
+def _check_digest(local_path, stat):
+    """
+    Whether the local file has the strongest checksum reported in stat.
+    Files without server checksums are considered valid.
+    """
+    for name in ('sha256', 'sha1', 'md5'):
+        expected = getattr(stat, name)
+        if expected:
+            return utils.multi_digest(local_path, (name,))[name] == expected
+
+    return True
+
+
+def _compare_digests(pathobj, expected, actual):
+    """
+    Raises ChecksumMismatchError if any of the 'expected' checksums is
+    different in 'actual'. Both map algorithm names to hex digests.
+    """
+    for name in ('sha256', 'sha1', 'md5'):
+        if expected.get(name) and actual.get(name) and \
+                expected[name].lower() != actual[name].lower():
+            raise ChecksumMismatchError("Checksum mismatch for '%s': expected %s %s, got %s" % (
+                str(pathobj), name, expected[name], actual[name]))
+
+
+def _filter_names(relpath, include, exclude):
+    """
+    Whether relpath matches any of the include glob patterns (if given)
+    and none of the exclude patterns. Patterns may be strings or lists.
+    """
+    if isinstance(include, str):
+        include = [include]
+    if isinstance(exclude, str):
+        exclude = [exclude]
+
+    if include and not any(fnmatch.fnmatchcase(relpath, pat) for pat in include):
+        return False
+
+    return not exclude or not any(fnmatch.fnmatchcase(relpath, pat) for pat in exclude)
+
+class _AccessorMixin(object):
+    """
+    The parts of the REST API accessors that don't depend on how requests
+    are sent: URLs, parameters and headers, and the mapping of error
+    responses to exceptions. Shared by _ArtifactoryAccessor and the
+    asyncio accessor.
+    """
+    def get_config(self, drive):
+        """
+        Returns the Config entry for drive, completed with defaults
+        """
+        return utils.merge_dicts(config.DEFAULTS, Config[drive] or {})
+
+    def api_url(self, pathobj, api):
+        """
+        Returns the url of the path under the REST API endpoint api
+        """
+        return '/'.join([pathobj.drive,
+                         'api', api,
+                         str(pathobj.relative_to(pathobj.drive)).strip('/')])
+
+    def storage_url(self, pathobj):
+        """
+        Returns the storage API url of the path
+        """
+        return self.api_url(pathobj, 'storage')
+
+    def _deploy_request(self, pathobj, md5=None, sha1=None, sha256=None, sha512=None,
+                        parameters=None):
+        """
+        Returns url and checksum headers to deploy to
+        """
+        url = str(pathobj)
+
+        if parameters:
+            url += ";%s" % http.encode_matrix_parameters(parameters)
+
+        headers = {}
+
+        if md5:
+            headers['X-Checksum-Md5'] = md5
+        if sha1:
+            headers['X-Checksum-Sha1'] = sha1
+        if sha256:
+            headers['X-Checksum-Sha256'] = sha256
+        if sha512:
+            headers['X-Checksum-Sha512'] = sha512
+
+        return url, headers
+
+    def _copy_params(self, dst, suppress_layouts=None):
+        """
+        Returns the query parameters of a copy or, without
+        suppress_layouts, a move to dst
+        """
+        params = {'to': '/' + str(dst.relative_to(dst.drive)).strip('/')}
+        if suppress_layouts is not None:
+            params['suppressLayouts'] = int(suppress_layouts)
+        return params
+
+    def _properties_params(self, props, recursive, delete=False):
+        """
+        Returns the query parameters to set props, or with delete=True,
+        to delete the property names in props
+        """
+        if delete:
+            if isinstance(props, str):
+                props = (props,)
+            params = {'properties': ','.join(sorted(props))}
+        else:
+            params = {'properties': http.encode_properties(props)}
+
+        if not recursive:
+            params['recursive'] = '0'
+
+        return params
+
+    @staticmethod
+    def _check_item_response(text, code, url, expected=(200,)):
+        """
+        Raises OSError if the item at url doesn't exist, or RuntimeError
+        if the status code isn't one of expected
+        """
+        if code == 404 and "Unable to find item" in text:
+            raise OSError(2, "No such file or directory: '%s'" % url)
+        if code not in expected:
+            raise RuntimeError(text)
+
+    @classmethod
+    def _parse_properties(cls, text, code, url):
+        """
+        Returns the properties in a properties response as a dictionary
+        """
+        if code == 404 and "No properties could be found" in text:
+            return {}
+        cls._check_item_response(text, code, url)
+        return json.loads(text)['properties']
 
 @export
 @singleton
-class _ArtifactoryAccessor(pathlib._Accessor):
+class _ArtifactoryAccessor(_AccessorMixin, pathlib._Accessor):
     """
     Implements operations with Artifactory REST API
+
+    All requests to the same Artifactory instance (drive) share a single
+    requests.Session, so TCP connections and TLS sessions are kept alive
+    and reused across ArtifactoryPath objects. Pool and TLS settings are
+    taken from the Config entry of the drive.
+
+    Stat results can optionally be cached, see enable_stat_cache().
+    Every request is recorded in artifactory.Metrics.
+
+    Idempotent requests that fail with a connection error or a retryable
+    status are retried, and each drive has a circuit breaker that stops
+    sending requests to an instance that keeps failing. The number of
+    concurrent requests and the request rate to each drive can be
+    limited, see limiter(). See _request().
     """
+    _sessions = {}
+    _breakers = {}
+    _policies = {}
+    _limiters = {}
+    _sessions_lock = threading.Lock()
+    _stat_cache = None
+    _caches = {}
+
+    def session(self, url):
+        """
+        Returns the shared requests.Session for the Artifactory instance
+        that url belongs to, creating it on first use
+        """
+        drive = PureArtifactoryPath._flavour.splitroot(url)[0]
+
+        try:
+            return self._sessions[drive]
+        except KeyError:
+            pass
+
+        with self._sessions_lock:
+            if drive not in self._sessions:
+                self._sessions[drive] = self._make_session(drive)
+            return self._sessions[drive]
+
+    def retry_policy(self, drive):
+        """
+        Returns the retry.RetryPolicy configured for drive
+        """
+        try:
+            generation, policy = self._policies[drive]
+            if generation == Config.generation:
+                return policy
+        except KeyError:
+            pass
+
+        policy = retry.policy_from_config(self.get_config(drive))
+        self._policies[drive] = (Config.generation, policy)
+        return policy
+
+    def breaker(self, drive):
+        """
+        Returns the retry.CircuitBreaker of drive
+        """
+        try:
+            return self._breakers[drive]
+        except KeyError:
+            pass
+
+        with self._sessions_lock:
+            return self._breakers.setdefault(drive, retry.CircuitBreaker())
+
+    def limiter(self, drive):
+        """
+        Returns the throttle.Limiter of drive, shared by all threads and
+        paths. It is replaced when its settings in Config change.
+        """
+        current = self._limiters.get(drive)
+        if current is not None and current[0] == Config.generation:
+            return current[1]
+
+        new = throttle.Limiter.from_config(self.get_config(drive))
+        with self._sessions_lock:
+            generation, limiter = self._limiters.get(drive, (None, None))
+            if generation != Config.generation:
+                if limiter is None or limiter.settings != new.settings:
+                    limiter = new
+                self._limiters[drive] = (Config.generation, limiter)
+            return limiter
+
+    @classmethod
+    def reset_breakers(cls):
+        """
+        Closes all circuit breakers, forgetting past failures
+        """
+        with cls._sessions_lock:
+            cls._breakers = {}
+
+    def get_cache(self, drive):
+        """
+        Returns the local artifact cache configured for drive with the
+        'cache_dir' and 'cache_max_size' settings, or None
+        """
+        cfg_entry = self.get_config(drive)
+        if not cfg_entry['cache_dir']:
+            return None
+
+        directory = os.path.abspath(os.path.expanduser(cfg_entry['cache_dir']))
+
+        with self._sessions_lock:
+            if directory not in self._caches:
+                self._caches[directory] = cache.ArtifactCache(
+                    directory, max_size=cfg_entry['cache_max_size'])
+            return self._caches[directory]
+
+    def _make_session(self, drive):
+        """
+        Creates a new session with connection pool settings for drive
+        """
+        cfg_entry = self.get_config(drive)
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=int(cfg_entry['pool_connections']),
+            pool_maxsize=int(cfg_entry['pool_maxsize']),
+            pool_block=bool(cfg_entry['pool_block']))
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.verify = cfg_entry['verify']
+        session.cert = cfg_entry['cert']
+        # the session is shared by paths with different credentials, so it
+        # must not keep cookies that authenticate one of them
+        session.cookies.set_policy(cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+        if not cfg_entry['keep_alive']:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    @classmethod
+    def close_sessions(cls):
+        """
+        Closes all pooled connections. New sessions will be created
+        on demand by subsequent requests.
+        """
+        with cls._sessions_lock:
+            sessions, cls._sessions = cls._sessions, {}
+
+        for session in sessions.values():
+            session.close()
+
+    @classmethod
+    def enable_stat_cache(cls, maxsize=4096, ttl=60):
+        """
+        Cache up to maxsize stat results for ttl seconds, so that
+        consecutive exists(), is_dir(), owner() etc. calls on the same
+        path result in a single request. Operations that modify a path
+        through this module invalidate the affected entries.
+        """
+        cls._stat_cache = utils.LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @classmethod
+    def disable_stat_cache(cls):
+        """
+        Turn the stat cache off and drop all cached entries
+        """
+        cls._stat_cache = None
+
+    def invalidate(self, pathobj, recursive=False):
+        """
+        Drop cached stat results for the path. With recursive=True,
+        results for everything below the path are dropped too.
+        """
+        cache = self._stat_cache
+        if cache is None:
+            return
+
+        url = self.storage_url(pathobj)
+        cache.pop(url)
+        if recursive:
+            cache.pop_prefix(url + '/')
+
+    def _invalidate_tree(self, pathobj):
+        """
+        Drop cached stat results for the path, everything below it and
+        its parent, whose children list has changed
+        """
+        if self._stat_cache is None:
+            return
+
+        self.invalidate(pathobj, recursive=True)
+        self.invalidate(pathobj.parent)
+
+    def _request(self, method, url, idempotent=None, **kwargs):
+        """
+        Sends a request with the session of the drive of url and returns
+        the requests.Response.
+
+        If the request is idempotent, connection errors and responses with
+        one of the 'retry_statuses' of the drive are retried up to
+        'retries' times, waiting for the time the server asks for with
+        Retry-After, or else for an exponentially growing, randomized
+        time. GET and HEAD requests are idempotent, and so are PUT requests
+        with a sha1 or sha256 checksum, i.e. deploys, unless their body
+        can't be rewound.
+
+        Each failure counts towards the circuit breaker of the drive.
+        While it's open, CircuitOpenError is raised without sending
+        the request.
+
+        Each attempt waits for the limiter of the drive. A request counts
+        as in flight until its response headers arrive; the body of a
+        streamed response is read outside of the limit.
+        """
+        drive = PureArtifactoryPath._flavour.splitroot(url)[0]
+        policy = self.retry_policy(drive)
+        breaker = self.breaker(drive)
+        limiter = self.limiter(drive)
+
+        data = kwargs.get('data')
+        position = None
+        if idempotent is None:
+            headers = kwargs.get('headers') or {}
+            idempotent = method in ('GET', 'HEAD') or (
+                method == 'PUT' and ('X-Checksum-Sha1' in headers or
+                                     'X-Checksum-Sha256' in headers))
+        if idempotent and data is not None and not isinstance(data, (bytes, str)):
+            try:
+                position = data.tell() if data.seekable() else None
+            except (AttributeError, IOError, ValueError):
+                pass
+            idempotent = position is not None
+
+        retries = policy.retries if idempotent else 0
+        attempt = 0
+
+        while True:
+            if not breaker.allow(policy):
+                raise CircuitOpenError(
+                    "%s failed repeatedly, not sending requests for %.1fs" % (
+                        drive, breaker.retry_in(policy)))
+
+            try:
+                with limiter:
+                    res = self._send(drive, method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.failure(policy)
+                if attempt >= retries:
+                    raise
+                delay = retry.backoff_delay(policy, attempt)
+            except Exception:
+                breaker.release()
+                raise
+            else:
+                if res.status_code not in policy.statuses:
+                    breaker.success()
+                    return res
+
+                if res.status_code >= 500:
+                    breaker.failure(policy)
+                else:
+                    breaker.success()
+
+                if attempt >= retries:
+                    return res
+
+                delay = retry.retry_after(res.headers.get('Retry-After'))
+                if delay is None:
+                    delay = retry.backoff_delay(policy, attempt)
+                delay = min(delay, policy.backoff_max)
+                res.close()
+
+            attempt += 1
+            time.sleep(delay)
+            if position is not None:
+                data.seek(position)
+
+    def _send(self, drive, method, url, **kwargs):
+        """
+        Sends a single request, recording it in Metrics
+        """
+        session = self.session(url)
+        if not Metrics.enabled:
+            return session.request(method, url, **kwargs)
+
+        operation = metrics.classify(method, url[len(drive):], kwargs.get('params'),
+                                     kwargs.get('headers'))
+        info = metrics.RequestInfo(method, url, drive, operation)
+        Metrics.before(info)
+
+        try:
+            res = session.request(method, url, **kwargs)
+        except Exception as exc:
+            info.elapsed = metrics.timer() - info.started
+            info.error = exc
+            Metrics.after(info)
+            raise
+
+        info.elapsed = metrics.timer() - info.started
+        info.status = res.status_code
+        info.bytes_sent = int(res.request.headers.get('Content-Length') or 0)
+        if kwargs.get('stream'):
+            info.bytes_received = int(res.headers.get('Content-Length') or 0)
+        else:
+            info.bytes_received = len(res.content)
+        Metrics.after(info)
+
+        return res
+
     def rest_get(self, url, params=None, headers=None, auth=None, verify=True, cert=None):
         """
         Perform a GET request to url with optional authentication
         """
-        res = requests.get(url, params=params, headers=headers, auth=auth, verify=verify,
-                           cert=cert)
+        res = self._request('GET', url, params=params, headers=headers, auth=auth,
+                            verify=verify, cert=cert)
         return res.text, res.status_code
 
     def rest_put(self, url, params=None, headers=None, auth=None, verify=True, cert=None):
         """
         Perform a PUT request to url with optional authentication
         """
-        res = requests.put(url, params=params, headers=headers, auth=auth, verify=verify,
-                           cert=cert)
+        res = self._request('PUT', url, params=params, headers=headers, auth=auth,
+                            verify=verify, cert=cert)
         return res.text, res.status_code
 
-    def rest_post(self, url, params=None, headers=None, auth=None, verify=True, cert=None):
+    def rest_post(self, url, params=None, headers=None, auth=None, verify=True, cert=None,
+                  data=None):
         """
-        Perform a PUT request to url with optional authentication
+        Perform a POST request to url with optional authentication
         """
-        res = requests.post(url, params=params, headers=headers, auth=auth, verify=verify,
-                            cert=cert)
+        res = self._request('POST', url, params=params, headers=headers, auth=auth,
+                            verify=verify, cert=cert, data=data)
         return res.text, res.status_code
 
     def rest_del(self, url, params=None, auth=None, verify=True, cert=None):
         """
         Perform a DELETE request to url with optional authentication
         """
-        res = requests.delete(url, params=params, auth=auth, verify=verify, cert=cert)
+        res = self._request('DELETE', url, params=params, auth=auth, verify=verify,
+                            cert=cert)
         return res.text, res.status_code
 
     def rest_put_stream(self, url, stream, headers=None, auth=None, verify=True, cert=None):
@@ -186,15 +1039,28 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         Perform a chunked PUT request to url with optional authentication
         This is specifically to upload files.
         """
-        res = requests.put(url, headers=headers, auth=auth, data=stream, verify=verify, cert=cert)
+        res = self._request('PUT', url, headers=headers, auth=auth, data=stream,
+                            verify=verify, cert=cert)
         return res.text, res.status_code
 
-    def rest_get_stream(self, url, auth=None, verify=True, cert=None):
+    def rest_post_stream(self, url, data, headers=None, auth=None, verify=True, cert=None):
+        """
+        Perform a POST request to url with optional authentication,
+        streaming the response. This is specifically for searches with
+        large results.
+        """
+        res = self._request('POST', url, headers=headers, auth=auth, data=data,
+                            stream=True, verify=verify, cert=cert, idempotent=True)
+        res.raw.decode_content = True
+        return res.raw, res.status_code
+
+    def rest_get_stream(self, url, auth=None, verify=True, cert=None, headers=None):
         """
         Perform a chunked GET request to url with optional authentication
         This is specifically to download files.
         """
-        res = requests.get(url, auth=auth, stream=True, verify=verify, cert=cert)
+        res = self._request('GET', url, auth=auth, stream=True, verify=verify,
+                            cert=cert, headers=headers)
         return res.raw, res.status_code
 
     def get_stat_json(self, pathobj):
@@ -202,16 +1068,11 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         Request remote file/directory status info
         Returns a json object as specified by Artifactory REST API
         """
-        url = '/'.join([pathobj.drive,
-                        'api/storage',
-                        str(pathobj.relative_to(pathobj.drive)).strip('/')])
+        url = self.storage_url(pathobj)
 
         text, code = self.rest_get(url, auth=pathobj.auth, verify=pathobj.verify,
                                    cert=pathobj.cert)
-        if code == 404 and "Unable to find item" in text:
-            raise OSError(2, "No such file or directory: '%s'" % url)
-        if code != 200:
-            raise RuntimeError(text)
+        self._check_item_response(text, code, url)
 
         return json.loads(text)
 
@@ -237,37 +1098,16 @@ class _ArtifactoryAccessor(pathlib._Accessor):
           is_dir -- 'True' if path is a directory
           children -- list of children names
         """
-        jsn = self.get_stat_json(pathobj)
+        cache = self._stat_cache
+        if cache is not None:
+            stat = cache.get(self.storage_url(pathobj))
+            if stat is not None:
+                return stat
 
-        is_dir = False
-        if 'size' not in jsn:
-            is_dir = True
+        stat = stat_from_json(self.get_stat_json(pathobj))
 
-        children = None
-        if 'children' in jsn:
-            children = [child['uri'][1:] for child in jsn['children']]
-
-        chksum_defaults = { 
-          'sha512': None, 'sha256': None, 
-          'sha1': None, 'md5': None 
-        }
-        
-        stat = ArtifactoryFileStat(
-            ctime       = dateutil.parser.parse(jsn['created']),
-            mtime       = dateutil.parser.parse(jsn['lastModified']),
-            st_ctime    = dateutil.parser.parse(jsn['created']),
-            st_mtime    = dateutil.parser.parse(jsn['lastModified']),
-            created_by  = jsn.get('createdBy', None),
-            modified_by = jsn.get('modifiedBy', None),
-            mime_type   = jsn.get('mimeType', None),
-            size        = int(jsn.get('size', '0')),
-            st_size     = int(jsn.get('size', '0')),
-            sha512      = utils.merge_dicts(chksum_defaults, jsn.get('checksums', {'sha512': None}))['sha512'],
-            sha256      = utils.merge_dicts(chksum_defaults, jsn.get('checksums', {'sha256': None}))['sha256'],
-            sha1        = utils.merge_dicts(chksum_defaults, jsn.get('checksums', {'sha1': None}))['sha1'],
-            md5         = utils.merge_dicts(chksum_defaults, jsn.get('checksums', {'md5': None}))['md5'],
-            is_dir      = is_dir,
-            children    = children)
+        if cache is not None:
+            cache.set(self.storage_url(pathobj), stat)
 
         return stat
 
@@ -308,6 +1148,53 @@ class _ArtifactoryAccessor(pathlib._Accessor):
 
         return stat.children
 
+    def list_children(self, pathobj):
+        """
+        Returns a list of (name, is_dir) tuples for the immediate
+        sub-directories and files in path. Unlike calling is_dir() on
+        each child, this costs a single request.
+        """
+        jsn = self.get_stat_json(pathobj)
+
+        if 'size' in jsn:
+            raise OSError(20, "Not a directory: %s" % str(pathobj))
+
+        return [(child['uri'][1:], bool(child.get('folder', False)))
+                for child in jsn.get('children', [])]
+
+    def get_deep_listing(self, pathobj):
+        """
+        Request the list of all files and folders below path with a single
+        request to the file list API. Returns a list of dicts with at least
+        'uri' (relative to path, with a leading '/') and 'folder' keys, as
+        returned by Artifactory, or None if the server can't produce the
+        listing, in which case the caller should fall back to listing
+        directories one by one.
+        """
+        return self.get_listing(pathobj, deep=True)
+
+    def get_listing(self, pathobj, deep=False):
+        """
+        Request the list of files and folders in path from the file list
+        API, or of everything below path if deep is True. Entries have
+        'uri', 'folder', 'size', 'lastModified', 'sha1' and 'sha2' keys.
+        Returns None if the server can't produce the listing.
+        """
+        url = self.storage_url(pathobj)
+        params = 'list&deep=%d&listFolders=1' % int(deep)
+        if deep:
+            params += '&mdTimestamps=1'
+
+        text, code = self.rest_get(url, params=params, auth=pathobj.auth,
+                                   verify=pathobj.verify, cert=pathobj.cert)
+
+        if code == 404 and "Unable to find item" in text:
+            raise OSError(2, "No such file or directory: '%s'" % url)
+        if code != 200:
+            return None
+
+        return json.loads(text).get('files', [])
+
     def mkdir(self, pathobj, _):
         """
         Creates remote directory
@@ -326,6 +1213,8 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if not code == 201:
             raise RuntimeError("%s %d" % (text, code))
 
+        self._invalidate_tree(pathobj)
+
     def rmdir(self, pathobj):
         """
         Removes a directory
@@ -343,6 +1232,8 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if code not in [200, 202, 204]:
             raise RuntimeError("Failed to delete directory: '%s'" % text)
 
+        self._invalidate_tree(pathobj)
+
     def unlink(self, pathobj):
         """
         Removes a file
@@ -359,6 +1250,8 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if code not in [200, 202, 204]:
             raise RuntimeError("Failed to delete file: %d '%s'" % (code, text))
 
+        self._invalidate_tree(pathobj)
+
     def touch(self, pathobj):
         """
         Create an empty file
@@ -376,6 +1269,8 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if not code == 201:
             raise RuntimeError("%s %d" % (text, code))
 
+        self._invalidate_tree(pathobj)
+
     def owner(self, pathobj):
         """
         Returns file owner
@@ -417,29 +1312,78 @@ class _ArtifactoryAccessor(pathlib._Accessor):
 
         return raw
 
-    def deploy(self, pathobj, fobj, md5=None, sha1=None, sha256=None, sha512=None, parameters=None):
-        """
-        Uploads a given file-like object
-        HTTP chunked encoding will be attempted
+    def open_range(self, pathobj, start, end=None, if_range=None):
         """
-        if isinstance(fobj, urllib3.response.HTTPResponse):
-            fobj = HTTPResponseWrapper(fobj)
+        Opens the remote file for reading bytes start to end (inclusive,
+        or to the end of the file if end is None)
+        Returns a file-like object HTTPResponse and the status code, which
+        is 206 for a partial response and 200 if the server ignored the
+        range and sends the whole file
 
+        if_range -- ETag or Last-Modified value of the version of the file
+                    the range is wanted of. If the file has changed since,
+                    the server sends the whole file instead.
+        """
         url = str(pathobj)
+        headers = {'Range': 'bytes=%d-%s' % (start, '' if end is None else end)}
+        if if_range:
+            headers['If-Range'] = if_range
 
-        if parameters:
-            url += ";%s" % http.encode_matrix_parameters(parameters)
+        raw, code = self.rest_get_stream(url, auth=pathobj.auth, verify=pathobj.verify,
+                                         cert=pathobj.cert, headers=headers)
 
-        headers = {}
+        if code not in [200, 206]:
+            raise RuntimeError("%d" % code)
 
-        if md5:
-            headers['X-Checksum-Md5'] = md5
-        if sha1:
-            headers['X-Checksum-Sha1'] = sha1
-        if sha256:
-            headers['X-Checksum-Sha256'] = sha256
-        if sha512:
-            headers['X-Checksum-Sha512'] = sha512
+        return raw, code
+
+    def deploy_by_checksum(self, pathobj, md5=None, sha1=None, sha256=None, sha512=None,
+                           parameters=None):
+        """
+        Deploys an artifact by checksum only, without sending its contents,
+        which succeeds if an artifact with the same sha1 or sha256 checksum
+        is already stored on the server.
+        Returns True on success and False if the server doesn't have
+        the contents.
+        """
+        if not sha1 and not sha256:
+            return False
+
+        url, headers = self._deploy_request(pathobj, md5, sha1, sha256, sha512, parameters)
+        headers['X-Checksum-Deploy'] = 'true'
+
+        text, code = self.rest_put(url,
+                                   headers=headers,
+                                   auth=pathobj.auth,
+                                   verify=pathobj.verify,
+                                   cert=pathobj.cert)
+
+        if code == 404:
+            return False
+        if code not in [200, 201]:
+            raise RuntimeError("%s" % text)
+
+        self._invalidate_tree(pathobj)
+        return True
+
+    def deploy(self, pathobj, fobj, md5=None, sha1=None, sha256=None, sha512=None, parameters=None,
+               checksum_deploy=True):
+        """
+        Uploads a given file-like object
+        HTTP chunked encoding will be attempted
+
+        If checksum_deploy is True and sha1 or sha256 are given, a deploy
+        by checksum is tried first, and the contents are only sent if the
+        server doesn't have them already.
+        """
+        if checksum_deploy and self.deploy_by_checksum(pathobj, md5, sha1, sha256, sha512,
+                                                       parameters):
+            return
+
+        if isinstance(fobj, urllib3.response.HTTPResponse):
+            fobj = http.HTTPResponseWrapper(fobj)
+
+        url, headers = self._deploy_request(pathobj, md5, sha1, sha256, sha512, parameters)
 
         text, code = self.rest_put_stream(url,
                                           fobj,
@@ -451,16 +1395,14 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if code not in [200, 201]:
             raise RuntimeError("%s" % text)
 
+        self._invalidate_tree(pathobj)
+
     def copy(self, src, dst, suppress_layouts=False):
         """
         Copy artifact from src to dst
         """
-        url = '/'.join([src.drive,
-                        'api/copy',
-                        str(src.relative_to(src.drive)).rstrip('/')])
-
-        params = {'to': str(dst.relative_to(dst.drive)).rstrip('/'),
-                  'suppressLayouts': int(suppress_layouts)}
+        url = self.api_url(src, 'copy')
+        params = self._copy_params(dst, suppress_layouts)
 
         text, code = self.rest_post(url,
                                     params=params,
@@ -471,15 +1413,14 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if code not in [200, 201]:
             raise RuntimeError("%s" % text)
 
+        self._invalidate_tree(dst)
+
     def move(self, src, dst):
         """
         Move artifact from src to dst
         """
-        url = '/'.join([src.drive,
-                        'api/move',
-                        str(src.relative_to(src.drive)).rstrip('/')])
-
-        params = {'to': str(dst.relative_to(dst.drive)).rstrip('/')}
+        url = self.api_url(src, 'move')
+        params = self._copy_params(dst)
 
         text, code = self.rest_post(url,
                                     params=params,
@@ -490,117 +1431,245 @@ class _ArtifactoryAccessor(pathlib._Accessor):
         if code not in [200, 201]:
             raise RuntimeError("%s" % text)
 
+        self._invalidate_tree(src)
+        self._invalidate_tree(dst)
+
+    def aql(self, pathobj, query):
+        """
+        Run an AQL query on the Artifactory instance of the path
+        Returns a generator of results, which are parsed from the
+        response as it arrives
+        """
+        url = '/'.join([pathobj.drive, 'api/search/aql'])
+
+        raw, code = self.rest_post_stream(url,
+                                          str(query),
+                                          headers={'Content-Type': 'text/plain'},
+                                          auth=pathobj.auth,
+                                          verify=pathobj.verify,
+                                          cert=pathobj.cert)
+
+        try:
+            if code != 200:
+                raise RuntimeError(raw.read().decode('utf-8', 'replace'))
+
+            for item in aql.iter_results(raw):
+                yield item
+        finally:
+            raw.close()
+
     def get_properties(self, pathobj):
         """
         Get artifact properties and return them as a dictionary.
         """
-        url = '/'.join([pathobj.drive,
-                        'api/storage',
-                        str(pathobj.relative_to(pathobj.drive)).strip('/')])
-
-        params = 'properties'
+        url = self.storage_url(pathobj)
 
         text, code = self.rest_get(url,
-                                   params=params,
+                                   params='properties',
                                    auth=pathobj.auth,
                                    verify=pathobj.verify,
                                    cert=pathobj.cert)
 
-        if code == 404 and "Unable to find item" in text:
-            raise OSError(2, "No such file or directory: '%s'" % url)
-        if code == 404 and "No properties could be found" in text:
-            return {}
-        if code != 200:
-            raise RuntimeError(text)
-
-        return json.loads(text)['properties']
-
+        return self._parse_properties(text, code, url)
 
     def set_properties(self, pathobj, props, recursive):
         """
         Set artifact properties
         """
-        url = '/'.join([pathobj.drive,
-                        'api/storage',
-                        str(pathobj.relative_to(pathobj.drive)).strip('/')])
-
-        params = { 'properties': http.encode_properties(props) }
-
-        if not recursive:
-            params['recursive'] = '0'
+        url = self.storage_url(pathobj)
 
         text, code = self.rest_put(url,
-                                   params=params,
+                                   params=self._properties_params(props, recursive),
                                    auth=pathobj.auth,
                                    verify=pathobj.verify,
                                    cert=pathobj.cert)
 
-        if code == 404 and "Unable to find item" in text:
-            raise OSError(2, "No such file or directory: '%s'" % url)
-        if code != 204:
-            raise RuntimeError(text)
-
+        self._check_item_response(text, code, url, expected=(204,))
+        self.invalidate(pathobj, recursive=bool(recursive))
 
     def del_properties(self, pathobj, props, recursive):
         """
         Delete artifact properties
         """
-        if isinstance(props, str):
-            props = (props,)
-
-        url = '/'.join([pathobj.drive,
-                        'api/storage',
-                        str(pathobj.relative_to(pathobj.drive)).strip('/')])
-
-        params = { 'properties': ','.join(sorted(props)) }
-
-        if not recursive:
-            params['recursive'] = '0'
+        url = self.storage_url(pathobj)
 
         text, code = self.rest_del(url,
-                                   params=params,
+                                   params=self._properties_params(props, recursive,
+                                                                  delete=True),
                                    auth=pathobj.auth,
                                    verify=pathobj.verify,
                                    cert=pathobj.cert)
 
-        if code == 404 and "Unable to find item" in text:
-            raise OSError(2, "No such file or directory: '%s'" % url)
-        if code != 204:
-            raise RuntimeError(text)
+        self._check_item_response(text, code, url, expected=(204,))
+        self.invalidate(pathobj, recursive=bool(recursive))
+
+@export
+class ArtifactoryProAccessor(_ArtifactoryAccessor):
+    """
+    TODO: implement OpenSource/Pro differentiation
+    """
+    pass
+
+
+@export
+class ArtifactoryOpensourceAccessor(_ArtifactoryAccessor):
+    """
+    TODO: implement OpenSource/Pro differentiation
+    """
+    pass
+
+@export
+class PureArtifactoryPath(pathlib.PurePath):
+    """
+    A class to work with Artifactory paths that doesn't connect
+    to Artifactory server. I.e. it supports only basic path
+    operations.
+    """
+    _flavour = _ArtifactoryFlavour()
+    __slots__ = ()
+
+
+@export
+class _FakePathTemplate(object):
+    def __init__(self, accessor):
+        self._accessor = accessor
+
+_default_template = _FakePathTemplate(_ArtifactoryAccessor())
+
+
+class _DriveContext(object):
+    """
+    Immutable connection settings shared by all paths on the same
+    Artifactory instance (drive) with the same credentials:
+
+      drive -- base URL of the instance
+      auth -- credentials passed on to requests
+      verify -- whether (or with what CA bundle) to verify TLS certificates
+      cert -- client certificate
+      accessor -- accessor that talks to the instance
+
+    Contexts are interned, so that paths only carry a reference to one.
+    """
+    __slots__ = ('drive', 'auth', 'verify', 'cert', 'accessor')
+
+    _contexts = utils.LRUCache(maxsize=1024)
+
+    def __init__(self, drive, auth, verify, cert, accessor):
+        for name, value in zip(self.__slots__, (drive, auth, verify, cert, accessor)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("_DriveContext is immutable")
+
+    def __repr__(self):
+        return '_DriveContext(drive=%r, verify=%r, cert=%r)' % (
+            self.drive, self.verify, self.cert)
+
+    @classmethod
+    def for_drive(cls, drive, accessor, **kwargs):
+        """
+        Returns the context for drive. 'auth', 'verify' and 'cert' keyword
+        arguments take precedence over the Config entry of the drive.
+        """
+        key = (Config.generation, accessor, drive, kwargs.get('auth'),
+               'verify' in kwargs, kwargs.get('verify'), kwargs.get('cert'))
+        try:
+            context = cls._contexts.get(key)
+        except TypeError:
+            # unhashable credentials, don't share the context
+            key = context = None
+
+        if context is None:
+            context = cls._from_config(drive, accessor, kwargs)
+            if key is not None:
+                cls._contexts.set(key, context)
+
+        return context
+
+    @classmethod
+    def _from_config(cls, drive, accessor, kwargs):
+        cfg_entry = Config[drive]
+        auth = kwargs.get('auth', None)
+        cert = kwargs.get('cert', None)
+
+        if auth is None and cfg_entry:
+            auth = (cfg_entry['username'], cfg_entry['password'])
+
+        if cert is None and cfg_entry:
+            cert = cfg_entry['cert']
+
+        if 'verify' in kwargs:
+            verify = kwargs.get('verify')
+        elif cfg_entry:
+            verify = cfg_entry['verify']
+        else:
+            verify = True
 
-@export
-class ArtifactoryProAccessor(_ArtifactoryAccessor):
-    """
-    TODO: implement OpenSource/Pro differentiation
-    """
-    pass
+        return cls(drive, auth, verify, cert, accessor)
 
+    def _replace(self, **kwargs):
+        values = dict((name, getattr(self, name)) for name in self.__slots__)
+        values.update(kwargs)
+        return self.__class__(**values)
 
-@export
-class ArtifactoryOpensourceAccessor(_ArtifactoryAccessor):
-    """
-    TODO: implement OpenSource/Pro differentiation
-    """
-    pass
+    @property
+    def session(self):
+        """
+        The pooled session of the accessor for this drive
+        """
+        return self.accessor.session(self.drive)
 
-@export
-class PureArtifactoryPath(pathlib.PurePath):
+
+class _ContextPath(object):
     """
-    A class to work with Artifactory paths that doesn't connect
-    to Artifactory server. I.e. it supports only basic path
-    operations.
+    Gives paths 'auth', 'verify' and 'cert' attributes backed by a shared
+    _DriveContext. Derived paths reuse the context of the path they were
+    derived from.
     """
-    _flavour = _ArtifactoryFlavour()
     __slots__ = ()
 
+    # accessor the contexts of this path class refer to
+    _context_accessor = None
 
-@export
-class _FakePathTemplate(object):
-    def __init__(self, accessor):
-        self._accessor = accessor
+    def _get_context(self):
+        try:
+            return self._context
+        except AttributeError:
+            # derived by pathlib internals we don't override
+            context = self._context = _DriveContext.for_drive(self.drive,
+                                                             self._context_accessor)
+            return context
+
+    def _with_context(self, obj):
+        obj._context = self._get_context()
+        return obj
+
+    @property
+    def auth(self):
+        return self._get_context().auth
+
+    @auth.setter
+    def auth(self, value):
+        self._context = self._get_context()._replace(auth=value)
+
+    @property
+    def verify(self):
+        return self._get_context().verify
+
+    @verify.setter
+    def verify(self, value):
+        self._context = self._get_context()._replace(verify=value)
+
+    @property
+    def cert(self):
+        return self._get_context().cert
+
+    @cert.setter
+    def cert(self, value):
+        self._context = self._get_context()._replace(cert=value)
 
 @export
-class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
+class ArtifactoryPath(_ContextPath, pathlib.Path, PureArtifactoryPath):
     """
     Implements fully-featured pathlib-like Artifactory interface
     Unless explicitly mentioned, all methods copy the behaviour
@@ -611,9 +1680,11 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
     field, since the copying strategy of pathlib.Path is not based
     on regular constructors, but rather on templates.
     """
-    # Pathlib limits what members can be present in 'Path' class,
-    # so authentication information has to be added via __slots__
-    __slots__ = ('auth', 'verify', 'cert')
+    # Pathlib limits what members can be present in 'Path' class, so the
+    # connection context has to be added via __slots__
+    __slots__ = ('_context',)
+
+    _context_accessor = _default_template._accessor
 
     def __new__(cls, *args, **kwargs):
         """
@@ -624,29 +1695,12 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         only then add auth information.
         """
         obj = pathlib.Path.__new__(cls, *args, **kwargs)
-
-        cfg_entry = Config[obj.drive]
-        obj.auth = kwargs.get('auth', None)
-        obj.cert = kwargs.get('cert', None)
-
-        if obj.auth is None and cfg_entry:
-            obj.auth = (cfg_entry['username'], cfg_entry['password'])
-
-        if obj.cert is None and cfg_entry:
-            obj.cert = cfg_entry['cert']
-
-        if 'verify' in kwargs:
-            obj.verify = kwargs.get('verify')
-        elif cfg_entry:
-            obj.verify = cfg_entry['verify']
-        else:
-            obj.verify = True
-
+        obj._context = _DriveContext.for_drive(obj.drive, cls._context_accessor, **kwargs)
         return obj
 
     def _init(self, *args, **kwargs):
         if not 'template' in kwargs:
-            kwargs['template'] = _FakePathTemplate(_ArtifactoryAccessor())
+            kwargs['template'] = _default_template
 
         super(ArtifactoryPath, self)._init(*args, **kwargs)
 
@@ -655,31 +1709,19 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         """
         The logical parent of the path.
         """
-        obj = super(ArtifactoryPath, self).parent
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).parent)
 
     def with_name(self, name):
         """
         Return a new path with the file name changed.
         """
-        obj = super(ArtifactoryPath, self).with_name(name)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).with_name(name))
 
     def with_suffix(self, suffix):
         """
         Return a new path with the file suffix changed (or added, if none).
         """
-        obj = super(ArtifactoryPath, self).with_suffix(suffix)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).with_suffix(suffix))
 
     def relative_to(self, *other):
         """
@@ -687,11 +1729,7 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         arguments.  If the operation is not possible (because this is not
         a subpath of the other path), raise ValueError.
         """
-        obj = super(ArtifactoryPath, self).relative_to(*other)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).relative_to(*other))
 
     def joinpath(self, *args):
         """
@@ -700,49 +1738,29 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         paths) or a totally different path (if one of the arguments is
         anchored).
         """
-        obj = super(ArtifactoryPath, self).joinpath(*args)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).joinpath(*args))
 
     def __truediv__(self, key):
         """
         Join two paths with '/'
         """
-        obj = super(ArtifactoryPath, self).__truediv__(key)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).__truediv__(key))
 
     def __rtruediv__(self, key):
         """
         Join two paths with '/'
         """
-        obj = super(ArtifactoryPath, self).__truediv__(key)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self).__truediv__(key))
 
     if sys.version_info < (3,):
         __div__ = __truediv__
         __rdiv__ = __rtruediv__
 
     def _make_child(self, args):
-        obj = super(ArtifactoryPath, self)._make_child(args)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self)._make_child(args))
 
     def _make_child_relpath(self, args):
-        obj = super(ArtifactoryPath, self)._make_child_relpath(args)
-        obj.auth = self.auth
-        obj.verify = self.verify
-        obj.cert = self.cert
-        return obj
+        return self._with_context(super(ArtifactoryPath, self)._make_child_relpath(args))
 
     def __iter__(self):
         """Iterate over the files in this directory.  Does not yield any
@@ -754,18 +1772,204 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
                 continue
             yield self._make_child_relpath(name)
 
+    def glob(self, pattern):
+        """
+        Iterate over this subtree and yield all existing files (of any
+        kind, including directories) matching the given pattern.
+        Recursive ('**') patterns are matched against a single deep listing
+        of the subtree when the server supports it. Otherwise the subtree
+        is listed a directory at a time.
+        """
+        if pattern.startswith('/'):
+            raise NotImplementedError("Non-relative patterns are unsupported")
+        pattern_parts = _split_pattern(pattern)
+        if pattern_parts is None:
+            raise ValueError("Unacceptable pattern: {!r}".format(pattern))
+
+        result = self._glob_aql(pattern)
+
+        if result is None and '**' in pattern:
+            result = self._glob_deep(pattern)
+
+        if result is None:
+            result = self._glob_scandir(pattern_parts)
+
+        return iter(result)
+
+    def rglob(self, pattern):
+        """
+        Recursively yield all existing files (of any kind, including
+        directories) matching the given pattern, anywhere in this subtree.
+        """
+        return self.glob('**/' + pattern)
+
+    def _glob_aql(self, pattern):
+        """
+        Search for pattern with a single AQL query. Returns a list of
+        matching paths, or None if the pattern can't be expressed in AQL
+        or the server refuses the query.
+        """
+        pattern_parts = _split_pattern(pattern)
+        if pattern_parts is None:
+            return None
+
+        base_parts = list(self.parts[1:])
+        criteria = _glob_aql_criteria(self.root.strip('/'), base_parts, pattern_parts)
+        if criteria is None:
+            return None
+
+        query = self.aql(criteria, page_size=None).include('repo', 'path', 'name', 'type')
+
+        result = []
+        try:
+            for item in query:
+                parts = [] if item['path'] == '.' else item['path'].split('/')
+                parts.append(item['name'])
+
+                # AQL wildcards also match across '/', so recheck the exact pattern
+                if parts[:len(base_parts)] != base_parts:
+                    continue
+                parts = parts[len(base_parts):]
+                if _match_parts(pattern_parts, parts):
+                    result.append(self.joinpath(*parts))
+        except RuntimeError:
+            return None
+
+        return result
+
+    def aql(self, *criteria, **kwargs):
+        """
+        Returns an AQL query on this Artifactory instance, which can be
+        refined with include(), sort(), offset() and limit(). Iterating
+        over the query runs it with the credentials of this path and yields
+        the results as they arrive. Sorted queries are requested page_size
+        results at a time, unsorted ones in a single request.
+
+        >>> path = ArtifactoryPath("http://example.com/artifactory")
+        >>> query = path.aql({'repo': 'libs-release-local'}, name={'$match': '*.jar'})
+        >>> for item in query.include('repo', 'path', 'name', 'size').sort('size'):
+        ...     print item['name'], item['size']
+
+        criteria  - dicts and keyword arguments for the find() clause
+        domain    - the AQL domain to search, 'items' by default
+        page_size - results per request for sorted queries, None to run
+                    them in one go
+        """
+        domain = kwargs.pop('domain', 'items')
+        page_size = kwargs.pop('page_size', 1000)
+
+        query = aql.AQLQuery(domain, pathobj=self, page_size=page_size)
+        return query.find(*criteria, **kwargs)
+
+    def _glob_deep(self, pattern):
+        """
+        Match pattern against the deep listing of this path. Returns a list
+        of matching paths, or None if the pattern or the server isn't
+        suitable for it.
+        """
+        pattern_parts = _split_pattern(pattern)
+        if pattern_parts is None:
+            return None
+
+        listing = self._accessor.get_deep_listing(self)
+        if listing is None:
+            return None
+
+        # like pathlib, a trailing '**' only matches directories
+        dirs_only = pattern_parts[-1] == '**'
+
+        result = []
+        if _match_parts(pattern_parts, []):
+            result.append(self)
+
+        for entry in listing:
+            if dirs_only and not entry.get('folder'):
+                continue
+            parts = entry['uri'].strip('/').split('/')
+            if _match_parts(pattern_parts, parts):
+                result.append(self.joinpath(*parts))
+
+        return result
+
+    def _glob_scandir(self, pattern_parts):
+        """
+        Match pattern components against this subtree, listing one
+        directory at a time and only descending into directories that
+        may contain matches
+        """
+        # like pathlib, a trailing '**' only matches directories
+        dirs_only = pattern_parts[-1] == '**'
+
+        walk = _walk_scandir(self, topdown=True)
+        try:
+            top = next(walk)
+        except OSError as exc:
+            if exc.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            return []
+
+        result = []
+        if _match_parts(pattern_parts, []):
+            result.append(self)
+
+        for dirpath, dirs, nondirs in itertools.chain([top], walk):
+            parts = list(dirpath.parts[len(self.parts):])
+
+            for name in dirs + ([] if dirs_only else nondirs):
+                if _match_parts(pattern_parts, parts + [name]):
+                    result.append(dirpath / name)
+
+            dirs[:] = [name for name in dirs
+                       if _match_prefix(pattern_parts, parts + [name])]
+
+        return result
+
     def open(self, mode='r', buffering=-1, encoding=None,
-             errors=None, newline=None):
+             errors=None, newline=None, seekable=False,
+             block_size=256 * 1024, cache_blocks=16, readahead=4):
         """
         Open the given Artifactory URI and return a file-like object
         HTTPResponse, as if it was a regular filesystem object.
         The only difference is that this object doesn't support seek()
+
+        With seekable=True, a seekable io.RawIOBase object is returned
+        instead, which reads with HTTP range requests, so random access
+        to parts of a large file, e.g. the index of an archive, only
+        transfers those parts. It fetches block_size bytes at a time and
+        keeps the cache_blocks most recently used blocks in memory. After
+        sequential reads, 'readahead' more blocks are fetched ahead.
+
+        If a local artifact cache is configured for the instance and
+        holds the contents of the file, the cached file is opened instead.
         """
-        if mode != 'r' or buffering != -1 or encoding or errors or newline:
+        if mode not in ('r', 'rb') or buffering != -1 or encoding or errors or newline:
             raise NotImplementedError('Only the default open() ' +
                                       'arguments are supported')
 
-        return self._accessor.open(self)
+        stat = None
+        artifact_cache = self._accessor.get_cache(self.drive)
+        if artifact_cache is not None:
+            stat = self.stat()
+            cached = artifact_cache.get(artifact_cache.key(stat.sha1, stat.sha256), stat.size)
+            if cached is not None:
+                return open(cached, 'rb')
+
+        if not seekable:
+            return self._accessor.open(self)
+
+        stat = stat or self.stat()
+        if stat.is_dir:
+            raise OSError(21, "Is a directory: '%s'" % str(self))
+
+        def fetch(start, end):
+            fobj, code = self._accessor.open_range(self, start, end)
+            with fobj:
+                if code != 206:
+                    raise IOError("Range requests are not supported for '%s'" % str(self))
+                return fobj.read()
+
+        return http.RangeFile(fetch, stat.size, block_size=block_size,
+                              cache_blocks=cache_blocks, readahead=readahead)
 
     def owner(self):
         """
@@ -783,6 +1987,30 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         """
         return self._accessor.creator(self)
 
+    @staticmethod
+    def stat_many(paths, workers=8, listing=True):
+        """
+        Stat a batch of paths with as few requests as possible,
+        see stat_many()
+        """
+        return stat_many(paths, workers=workers, listing=listing)
+
+    def invalidate(self, recursive=False):
+        """
+        Drop cached stat results for this path, and with recursive=True
+        for everything below it as well. Does nothing unless the stat
+        cache is enabled.
+        """
+        self._accessor.invalidate(self, recursive=recursive)
+
+    def refresh(self):
+        """
+        Re-read and return the stat result for this path, bypassing
+        the stat cache.
+        """
+        self.invalidate()
+        return self.stat()
+
     def is_dir(self):
         """
         Whether this path is a directory.
@@ -861,11 +2089,18 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         """
         raise NotImplementedError()
 
-    def deploy(self, fobj, md5=None, sha1=None, sha256=None, sha512=None, parameters={}):
+    def deploy(self, fobj, md5=None, sha1=None, sha256=None, sha512=None, parameters={},
+               checksum_deploy=True):
         """
         Upload the given file object to this path
+
+        If sha1 or sha256 are given, the upload is first attempted as
+        a deploy by checksum, which doesn't transfer any data if the server
+        already stores the same contents. Set checksum_deploy to False
+        to always upload.
         """
-        return self._accessor.deploy(self, fobj, md5, sha1, sha256, sha512, parameters)
+        return self._accessor.deploy(self, fobj, md5, sha1, sha256, sha512, parameters,
+                                     checksum_deploy=checksum_deploy)
 
     def deploy_file(self,
                     file_name,
@@ -873,14 +2108,24 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
                     calc_sha1=True,
                     calc_sha256=True,
                     calc_sha512=True,
-                    parameters={}):
+                    parameters={},
+                    checksum_deploy=True):
         """
         Upload the given file to this path
+
+        Unless checksum_deploy is False, the file contents are only sent
+        if the server doesn't have them already (see deploy()).
         """
-        md5 = utils.md5sum(file_name) if calc_md5 else None
-        sha1 = utils.sha1sum(file_name) if calc_sha1 else None
-        sha256 = utils.sha256sum(file_name) if calc_sha256 else None
-        sha512 = utils.sha512sum(file_name) if calc_sha512 else None
+        algorithms = [name for name, enabled in [('md5', calc_md5),
+                                                 ('sha1', calc_sha1),
+                                                 ('sha256', calc_sha256),
+                                                 ('sha512', calc_sha512)] if enabled]
+        digests = utils.multi_digest(file_name, algorithms)
+
+        md5 = digests.get('md5')
+        sha1 = digests.get('sha1')
+        sha256 = digests.get('sha256')
+        sha512 = digests.get('sha512')
 
         target = self
 
@@ -888,7 +2133,349 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
             target = self / pathlib.Path(file_name).name
 
         with open(file_name, 'rb') as fobj:
-            target.deploy(fobj, md5, sha1, sha256, sha512, parameters)
+            target.deploy(fobj, md5, sha1, sha256, sha512, parameters,
+                          checksum_deploy=checksum_deploy)
+
+    def deploy_tree(self, local_dir, workers=8, include=None, exclude=None, parameters={},
+                    checksum_deploy=True):
+        """
+        Upload all files below local_dir into this directory, keeping their
+        relative paths. Files are hashed and uploaded concurrently from
+        a pool of 'workers' threads, and files whose contents the server
+        already stores are deployed by checksum (see deploy()).
+
+        include, exclude -- glob pattern or list of patterns, matched
+                            against paths relative to local_dir
+                            (e.g. '*.jar' or 'docs/*')
+        parameters -- matrix parameters to attach to every file
+
+        Returns a TransferReport. Failing files don't interrupt the rest
+        of the upload, they are listed in its 'failures'.
+        """
+        if self.is_file():
+            raise OSError(20, "Not a directory: '%s'" % str(self))
+
+        jobs = []
+        for dirpath, _, filenames in os.walk(local_dir):
+            for filename in sorted(filenames):
+                local_path = os.path.join(dirpath, filename)
+                relpath = os.path.relpath(local_path, local_dir).replace(os.sep, '/')
+                if _filter_names(relpath, include, exclude):
+                    jobs.append((local_path, self.joinpath(*relpath.split('/'))))
+
+        def upload(local_path, target):
+            start = time.time()
+            size = 0
+            try:
+                size = os.path.getsize(local_path)
+                digests = utils.multi_digest(local_path, ('md5', 'sha1', 'sha256'))
+
+                skipped = checksum_deploy and self._accessor.deploy_by_checksum(
+                    target, parameters=parameters, **digests)
+
+                if not skipped:
+                    with open(local_path, 'rb') as fobj:
+                        target.deploy(fobj, parameters=parameters, checksum_deploy=False,
+                                      **digests)
+
+                return TransferResult(local_path, target, size, skipped, None,
+                                      time.time() - start)
+            except (EnvironmentError, ArtifactoryError, RuntimeError,
+                    requests.RequestException) as exc:
+                return TransferResult(local_path, target, size, False, exc,
+                                      time.time() - start)
+
+        return _run_transfers(upload, jobs, workers)
+
+    def download_to(self, local_path, resume=True, retries=3, verify_checksum=True,
+                    chunk_size=1024 * 1024, segments=None, segment_size=None):
+        """
+        Download this file to local_path.
+
+        The data is written to 'local_path.part' first, which only replaces
+        local_path once the download is complete and verified against
+        the checksum reported by the server.
+
+        With resume=True, a download continues where a previous attempt
+        left off: an existing .part file is completed with an HTTP Range
+        request instead of starting over, and a connection lost during
+        the download is resumed the same way up to 'retries' times.
+        The ETag or Last-Modified header of the response the .part file
+        was started from is kept in 'local_path.part.meta' and sent as
+        If-Range, so a file that changed in the meantime is downloaded
+        from the start instead of being pieced together.
+        A complete local_path with the right checksum isn't downloaded
+        again.
+
+        With segments > 1, files larger than segment_size are downloaded
+        as segment_size byte ranges over up to 'segments' concurrent
+        connections, written directly at their offsets into a
+        'local_path.segments' file. Failing segments are retried
+        separately, but an interrupted segmented download isn't resumed. Both default to the
+        'download_segments' and 'segment_size' Config settings of the
+        instance, and downloads aren't segmented by default.
+
+        If a local artifact cache is configured for the instance, files
+        it holds are placed at local_path without downloading them, and
+        downloaded files are added to it.
+        """
+        stat = self.stat()
+        if stat.is_dir:
+            raise OSError(21, "Is a directory: '%s'" % str(self))
+
+        if (resume and verify_checksum and os.path.isfile(local_path) and
+                os.path.getsize(local_path) == stat.size and
+                _check_digest(local_path, stat)):
+            return
+
+        artifact_cache = self._accessor.get_cache(self.drive)
+        if artifact_cache is not None and artifact_cache.link_to(
+                artifact_cache.key(stat.sha1, stat.sha256), local_path, stat.size):
+            return
+
+        cfg_entry = self._accessor.get_config(self.drive)
+        segments = int(segments or cfg_entry['download_segments'])
+        segment_size = int(segment_size or cfg_entry['segment_size'])
+
+        part_path = local_path + '.part'
+
+        if segments > 1 and stat.size > segment_size:
+            if self._download_segmented(part_path, stat.size, segments, segment_size,
+                                        retries, chunk_size):
+                self._finish_download(part_path, local_path, stat, verify_checksum)
+                return
+
+        offset = 0
+        validator = {'sha1': stat.sha1, 'if_range': None}
+        if resume and os.path.isfile(part_path):
+            meta = _read_part_meta(part_path)
+            # only resume the download of the same version of the file
+            if meta is not None and meta.get('sha1') == stat.sha1:
+                validator = meta
+                offset = os.path.getsize(part_path)
+                if offset > stat.size:
+                    offset = 0
+
+        attempt = 0
+        while True:
+            try:
+                offset = self._download_range(part_path, offset, stat.size, chunk_size,
+                                              validator)
+                if offset >= stat.size:
+                    break
+            except (requests.RequestException, urllib3.exceptions.HTTPError):
+                if not resume or attempt >= retries:
+                    raise
+            else:
+                if not resume or attempt >= retries:
+                    raise IOError("Incomplete download of '%s': got %d of %d bytes" % (
+                        str(self), offset, stat.size))
+
+            attempt += 1
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        self._finish_download(part_path, local_path, stat, verify_checksum)
+
+    def _finish_download(self, part_path, local_path, stat, verify_checksum):
+        """
+        Verifies a complete .part file and moves it to local_path
+        """
+        if os.path.exists(part_path + '.meta'):
+            os.remove(part_path + '.meta')
+
+        if verify_checksum and not _check_digest(part_path, stat):
+            os.remove(part_path)
+            raise ChecksumMismatchError("Checksum mismatch for '%s'" % str(self))
+
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        os.rename(part_path, local_path)
+
+        artifact_cache = self._accessor.get_cache(self.drive)
+        if artifact_cache is not None:
+            artifact_cache.put(artifact_cache.key(stat.sha1, stat.sha256), local_path)
+
+    def _download_segmented(self, part_path, size, segments, segment_size, retries,
+                            chunk_size):
+        """
+        Downloads this file in segment_size ranges over up to 'segments'
+        connections into a preallocated file, which is renamed to part_path
+        once it is complete. Returns False if the server doesn't support
+        range requests.
+
+        The preallocated file has its full size from the start, so it is
+        kept apart from part_path, which a resumed download would take
+        as complete, and removed if the download fails.
+        """
+        segments_path = part_path[:-len('.part')] + '.segments'
+        with open(segments_path, 'wb') as out:
+            out.truncate(size)
+
+        # set when the server sends whole files in response to range requests
+        unsupported = threading.Event()
+        # set when a segment failed
+        cancelled = threading.Event()
+
+        def fetch(start, end):
+            attempt = 0
+            while not (unsupported.is_set() or cancelled.is_set()):
+                try:
+                    fobj, code = self._accessor.open_range(self, start, end)
+                    with fobj:
+                        if code != 206:
+                            unsupported.set()
+                            return
+
+                        with open(segments_path, 'r+b') as out:
+                            out.seek(start)
+                            for chunk in iter(lambda: fobj.read(min(chunk_size, end + 1 - start)), b''):
+                                out.write(chunk)
+                                start += len(chunk)
+                                if start > end:
+                                    return
+                except (requests.RequestException, urllib3.exceptions.HTTPError):
+                    if attempt >= retries:
+                        raise
+                else:
+                    if attempt >= retries:
+                        raise IOError("Incomplete segment of '%s' at %d" % (str(self), start))
+                attempt += 1
+
+        ranges = [(start, min(start + segment_size, size) - 1)
+                  for start in range(0, size, segment_size)]
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=segments) as executor:
+                try:
+                    for _ in executor.map(lambda r: fetch(*r), ranges):
+                        pass
+                except BaseException:
+                    # segments that haven't started yet give up
+                    cancelled.set()
+                    raise
+        except BaseException:
+            os.remove(segments_path)
+            raise
+
+        if unsupported.is_set():
+            os.remove(segments_path)
+            return False
+
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        os.rename(segments_path, part_path)
+        return True
+
+    def _download_range(self, part_path, offset, size, chunk_size, validator):
+        """
+        Writes this file from offset on into part_path
+        Returns the size of part_path afterwards
+
+        validator -- dict with the 'sha1' of the file and the 'if_range'
+                     validator of the response part_path was started
+                     from; updated when the download starts over
+        """
+        if offset and offset >= size:
+            return offset
+
+        if offset:
+            fobj, code = self._accessor.open_range(self, offset,
+                                                   if_range=validator['if_range'])
+        else:
+            fobj, code = self._accessor.open(self), 200
+
+        with fobj:
+            if code != 206:
+                # a new download, possibly of a changed file
+                headers = getattr(fobj, 'headers', None) or {}
+                validator['if_range'] = headers.get('ETag') or headers.get('Last-Modified')
+                _write_part_meta(part_path, validator)
+
+            with open(part_path, 'r+b' if code == 206 else 'wb') as out:
+                if code == 206:
+                    out.seek(offset)
+                    out.truncate()
+                else:
+                    offset = 0
+
+                for chunk in iter(lambda: fobj.read(chunk_size), b''):
+                    out.write(chunk)
+                    offset += len(chunk)
+
+        return offset
+
+    def download_tree(self, local_dir, workers=8, include=None, exclude=None):
+        """
+        Download all files below this directory into local_dir, keeping
+        their relative paths. The remote tree is enumerated with a single
+        request when the server supports it (see walk()), and files are
+        downloaded concurrently from a pool of 'workers' threads.
+
+        Local files that already have the same sha1 checksum as the remote
+        ones are skipped, so repeated syncs only transfer what changed.
+        Downloads are verified against the remote checksum, which takes an
+        extra request per file if the tree can't be listed in one. Files held by
+        the local artifact cache, if configured, are also skipped.
+
+        include, exclude -- glob pattern or list of patterns, matched
+                            against paths relative to this directory
+
+        Returns a TransferReport. Failing files don't interrupt the rest
+        of the download, they are listed in its 'failures'.
+        """
+        # (relative parts, size, sha1) of every file; size and sha1 are
+        # None if they have to be looked up separately
+        files = []
+
+        listing = self._accessor.get_deep_listing(self)
+        if listing is not None:
+            for entry in listing:
+                if not entry.get('folder'):
+                    files.append((entry['uri'].strip('/').split('/'),
+                                  entry.get('size'), entry.get('sha1')))
+        else:
+            for root, _, filenames in walk(self, deep=False, workers=workers):
+                for name in filenames:
+                    files.append((list(root.parts[len(self.parts):]) + [name], None, None))
+
+        jobs = []
+        for parts, size, sha1 in files:
+            if _filter_names('/'.join(parts), include, exclude):
+                jobs.append((self.joinpath(*parts), os.path.join(local_dir, *parts), size, sha1))
+
+        artifact_cache = self._accessor.get_cache(self.drive)
+
+        def download(remote, local_path, size, sha1):
+            start = time.time()
+            try:
+                if sha1 is None:
+                    # without the deep listing, the checksum to compare
+                    # and verify against has to be looked up separately
+                    stat = remote.stat()
+                    size, sha1 = stat.size, stat.sha1
+
+                if os.path.isfile(local_path) and os.path.getsize(local_path) == size:
+                    if utils.sha1sum(local_path) == sha1:
+                        return TransferResult(remote, local_path, size, True, None,
+                                              time.time() - start)
+
+                key = artifact_cache.key(sha1) if artifact_cache is not None else None
+                if key is not None and artifact_cache.link_to(key, local_path, size):
+                    return TransferResult(remote, local_path, size, True, None,
+                                          time.time() - start)
+
+                size = _download_file(remote, local_path, sha1)
+                if key is not None:
+                    artifact_cache.put(key, local_path)
+
+                return TransferResult(remote, local_path, size, False, None,
+                                      time.time() - start)
+            except (EnvironmentError, ArtifactoryError, RuntimeError,
+                    requests.RequestException) as exc:
+                return TransferResult(remote, local_path, size or 0, False, exc,
+                                      time.time() - start)
+
+        return _run_transfers(download, jobs, workers)
 
     def deploy_deb(self,
                    file_name,
@@ -915,11 +2502,14 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
 
         self.deploy_file(file_name, parameters=params)
 
-    def copy(self, dst, suppress_layouts=False):
+    def copy(self, dst, suppress_layouts=False, verify_checksum=True,
+             chunk_size=1024 * 1024):
         """
         Copy artifact from this path to destinaiton.
         If files are on the same instance of artifactory, lightweight (local)
-        copying will be attempted.
+        copying will be attempted. Otherwise the artifact is deployed to the
+        other instance by checksum if it already stores the same contents,
+        and only transferred if it doesn't (see replicate()).
 
         The suppress_layouts parameter, when set to True, will allow artifacts
         from one path to be copied directly into another path without enforcing
@@ -964,9 +2554,51 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         """
         if self.drive == dst.drive:
             self._accessor.copy(self, dst, suppress_layouts=suppress_layouts)
-        else:
+            return
+
+        self.replicate(dst, verify_checksum=verify_checksum, chunk_size=chunk_size)
+
+    def replicate(self, dst, verify_checksum=True, chunk_size=1024 * 1024):
+        """
+        Copy the artifact to dst on another Artifactory instance.
+
+        If the other instance already stores the same contents, it is
+        deployed there by checksum. Otherwise the contents are read from
+        this instance in chunks of chunk_size bytes and streamed to the
+        other one, without temporary files, and hashed on the way. The checksums
+        reported by the source are sent along, so the destination rejects
+        corrupted uploads.
+
+        If verify_checksum is True, the transferred data and the checksums
+        the destination reports afterwards are compared with those of the
+        source, and ChecksumMismatchError is raised if they differ.
+        """
+        stat = self.stat()
+        if stat.is_dir:
+            raise OSError(21, "Is a directory: '%s'" % str(self))
+
+        expected = dict((name, getattr(stat, name))
+                        for name in ('sha256', 'sha1', 'md5') if getattr(stat, name))
+
+        # the other instance may already store the same contents
+        if not dst._accessor.deploy_by_checksum(dst, md5=stat.md5, sha1=stat.sha1,
+                                                sha256=stat.sha256):
             with self.open() as fobj:
-                dst.deploy(fobj)
+                reader = http.HashingReader(fobj, size=stat.size, chunk_size=chunk_size)
+                dst.deploy(reader, md5=stat.md5, sha1=stat.sha1, sha256=stat.sha256,
+                           checksum_deploy=False)
+
+            if verify_checksum:
+                if reader.bytes_read != stat.size:
+                    raise ChecksumMismatchError(
+                        "Size mismatch for '%s': expected %d bytes, transferred %d" % (
+                            str(self), stat.size, reader.bytes_read))
+                _compare_digests(self, expected, reader.hexdigests())
+
+        if verify_checksum:
+            dst_stat = dst.stat()
+            _compare_digests(dst, expected, dict((name, getattr(dst_stat, name))
+                                                 for name in expected))
 
     def move(self, dst):
         """
@@ -987,12 +2619,14 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
 
     @properties.setter
     def properties(self, properties):
-        self.del_properties(self.properties, recursive=False)
-        self.set_properties(properties, recursive=False)
+        current = self.properties
+        changed = dict((key, value) for key, value in properties.items()
+                       if _property_values(value) != _property_values(current.get(key)))
+        self.update_properties(changed, set(current) - set(properties), recursive=False)
 
     @properties.deleter
     def properties(self):
-        self.del_properties(self.properties, recursive=False)
+        self.update_properties(remove=self.properties, recursive=False)
 
     def set_properties(self, properties, recursive=True):
         """
@@ -1020,29 +2654,377 @@ class ArtifactoryPath(pathlib.Path, PureArtifactoryPath):
         """
         return self._accessor.del_properties(self, properties, recursive)
 
-@export
-def walk(pathobj, topdown=True):
+    def update_properties(self, add=None, remove=None, recursive=True):
+        """
+        Sets the properties in the dict add and deletes the property names
+        in remove, without fetching the current properties first. Sends one
+        request for each of them that isn't empty, setting before deleting,
+        so properties that are kept never disappear in between.
+
+        recursive  - on folders property attachment is recursive by default. It is
+                     possible to force recursive behavior.
+        """
+        if isinstance(remove, str):
+            remove = (remove,)
+        remove = set(remove or ())
+        if add and remove.intersection(add):
+            raise ValueError("Properties both set and deleted: %s" %
+                             ', '.join(sorted(remove.intersection(add))))
+
+        if add:
+            self._accessor.set_properties(self, add, recursive)
+        if remove:
+            self._accessor.del_properties(self, remove, recursive)
+
+def _property_values(value):
     """
-    os.walk like function to traverse the URI like a file system.
+    Returns the values of a property, as set or as returned by
+    get_properties(), in a form that can be compared
+    """
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple)):
+        value = (value,)
+    return sorted('%s' % item for item in value)
 
-    The only difference is that this function takes and returns Path objects
-    in places where original implementation will return strings
+def _split_pattern(pattern):
+    """
+    Splits a relative glob pattern into its components. Returns None
+    for patterns that can't be matched against a listing.
+    """
+    if not pattern or pattern.startswith('/'):
+        return None
+
+    parts = [part for part in pattern.split('/') if part and part != '.']
+    if not parts or '..' in parts:
+        return None
+
+    return parts
+
+
+def _aql_match(part):
+    """
+    Returns AQL criterion for a glob pattern component, or None if it
+    can't be expressed. AQL $match only knows '*' and '?'.
+    """
+    if '[' in part:
+        return None
+    if '*' in part or '?' in part:
+        return {'$match': part}
+    return part
+
+
+def _glob_aql_criteria(repo, base_parts, pattern_parts):
+    """
+    Translates a glob pattern relative to base_parts within repo into
+    AQL items.find criteria. The criteria may be looser than the pattern,
+    so results have to be checked with _match_parts(). Returns None if
+    the pattern can't be narrowed down by AQL.
+    """
+    if not repo or pattern_parts[-1] == '**':
+        return None
+
+    criteria = {'repo': repo, 'type': 'any'}
+
+    name = _aql_match(pattern_parts[-1])
+    if name is not None:
+        criteria['name'] = name
+
+    dir_parts = pattern_parts[:-1]
+    literal = 0
+    while literal < len(dir_parts) and _aql_match(dir_parts[literal]) == dir_parts[literal]:
+        literal += 1
+
+    prefix = '/'.join(base_parts + dir_parts[:literal])
+
+    if literal == len(dir_parts):
+        criteria['path'] = prefix or '.'
+    elif set(dir_parts[literal:]) == set(['**']):
+        criteria['$or'] = [{'path': prefix or '.'},
+                           {'path': {'$match': prefix + '/*' if prefix else '*'}}]
+    else:
+        criteria['path'] = {'$match': prefix + '/*' if prefix else '*'}
+
+    return criteria
+
+
+def _match_parts(pattern_parts, parts):
+    """
+    Matches path components against glob pattern components, where '**'
+    stands for any number of directories, including none
+    """
+    if not pattern_parts:
+        return not parts
+
+    head = pattern_parts[0]
+
+    if head == '**':
+        return any(_match_parts(pattern_parts[1:], parts[i:])
+                   for i in range(len(parts) + 1))
+
+    return (bool(parts) and fnmatch.fnmatchcase(parts[0], head) and
+            _match_parts(pattern_parts[1:], parts[1:]))
+
+
+def _match_prefix(pattern_parts, parts):
+    """
+    Returns whether paths below the given path components can match
+    the glob pattern components
+    """
+    if not parts:
+        return bool(pattern_parts)
+    if not pattern_parts:
+        return False
+
+    head = pattern_parts[0]
+
+    if head == '**':
+        return True
+
+    return (fnmatch.fnmatchcase(parts[0], head) and
+            _match_prefix(pattern_parts[1:], parts[1:]))
+
+
+def _listing_tree(listing):
     """
+    Turns a deep listing into a dictionary that maps relative directory
+    paths ('' being the top directory) to (dirs, nondirs) name lists
+    """
+    tree = {'': ([], [])}
+
+    for entry in listing:
+        relpath = entry['uri'].strip('/')
+        child_is_dir = bool(entry.get('folder'))
+
+        if child_is_dir:
+            if relpath in tree:
+                # already added as the parent of a previous entry
+                continue
+            tree[relpath] = ([], [])
+
+        # make sure the parent chain exists even if the server didn't
+        # list intermediate folders
+        parent, _, child = relpath.rpartition('/')
+        while True:
+            is_new = parent not in tree
+            dirs, nondirs = tree.setdefault(parent, ([], []))
+            (dirs if child_is_dir else nondirs).append(child)
+            if not is_new or not parent:
+                break
+            parent, _, child = parent.rpartition('/')
+            child_is_dir = True
+
+    return tree
+
+
+def _walk_tree(pathobj, tree, relpath, topdown):
+    dirs, nondirs = tree.get(relpath, ([], []))
+    if topdown:
+        yield pathobj, dirs, nondirs
+    for name in dirs:
+        childpath = relpath + '/' + name if relpath else name
+        for result in _walk_tree(pathobj / name, tree, childpath, topdown):
+            yield result
+    if not topdown:
+        yield pathobj, dirs, nondirs
+
+
+def _scandir_split(pathobj):
     dirs, nondirs = [], []
-    for child in pathobj:
-        relpath = str(child.relative_to(str(pathobj)))
-        if relpath.startswith('/'):
-            relpath = relpath[1:]
-        if relpath.endswith('/'):
-            relpath = relpath[:-1]
-        if child.is_dir():
-            dirs.append(relpath)
+    for name, is_dir in pathobj._accessor.list_children(pathobj):
+        if name in ['.', '..']:
+            continue
+        if is_dir:
+            dirs.append(name)
         else:
-            nondirs.append(relpath)
+            nondirs.append(name)
+    return dirs, nondirs
+
+
+def _walk_scandir(pathobj, topdown):
+    dirs, nondirs = _scandir_split(pathobj)
     if topdown:
         yield pathobj, dirs, nondirs
-    for dir in dirs:
-        for result in walk(pathobj / dir):
+    for name in dirs:
+        for result in _walk_scandir(pathobj / name, topdown):
             yield result
     if not topdown:
         yield pathobj, dirs, nondirs
+
+
+def _walk_concurrent(pathobj, topdown, workers):
+    """
+    Lists up to 'workers' directories at a time. Results are yielded as
+    listings arrive, but a directory is always yielded before (topdown)
+    or after (bottom-up) all of its sub-directories.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+
+    def submit(dirpath, parent):
+        pending[executor.submit(_scandir_split, dirpath)] = (dirpath, parent)
+
+    try:
+        submit(pathobj, None)
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                list(pending), return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                dirpath, parent = pending.pop(future)
+                dirs, nondirs = future.result()
+
+                if topdown:
+                    yield dirpath, dirs, nondirs
+                    # the caller may have pruned dirs in the meantime
+                    for name in dirs:
+                        submit(dirpath / name, None)
+                    continue
+
+                # bottom-up: a node is [parent node, number of sub-directories
+                # not yet yielded, result]. It's yielded when that hits zero.
+                node = [parent, len(dirs), (dirpath, dirs, nondirs)]
+                for name in dirs:
+                    submit(dirpath / name, node)
+
+                while node is not None and node[1] == 0:
+                    yield node[2]
+                    node = node[0]
+                    if node is not None:
+                        node[1] -= 1
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+@export
+def walk(pathobj, topdown=True, deep=True, workers=None):
+    """
+    os.walk like function to traverse the URI like a file system.
+
+    The only difference is that this function takes and returns Path objects
+    in places where original implementation will return strings
+
+    With deep=True the whole subtree is fetched with a single request to
+    the file list API, if the server supports it. Otherwise, or with
+    deep=False, every directory is listed with a separate request.
+    These requests are made from a pool of 'workers' threads if given,
+    in which case the order of results is only guaranteed to respect
+    topdown, i.e. parents are yielded before (or after) their children.
+    """
+    listing = None
+    if deep:
+        listing = pathobj._accessor.get_deep_listing(pathobj)
+
+    if listing is None and workers and workers > 1:
+        results = _walk_concurrent(pathobj, topdown, workers)
+    elif listing is None:
+        results = _walk_scandir(pathobj, topdown)
+    else:
+        results = _walk_tree(pathobj, _listing_tree(listing), '', topdown)
+
+    for result in results:
+        yield result
+
+
+def _stat_one(pathobj):
+    """
+    Returns [stat] of pathobj, or [NOT_FOUND] if it doesn't exist
+    """
+    try:
+        return [pathobj.stat()]
+    except OSError as exc:
+        if exc.errno != errno.ENOENT:
+            raise
+        return [NOT_FOUND]
+
+
+def _stat_group(parent, members):
+    """
+    Returns stats of the members, which are children of parent, taken
+    from a single listing of parent, or None if the server can't list it
+    """
+    try:
+        entries = parent._accessor.get_listing(parent)
+    except OSError as exc:
+        if exc.errno != errno.ENOENT:
+            raise
+        return [NOT_FOUND] * len(members)
+
+    if entries is None:
+        return None
+
+    by_name = dict((entry['uri'].lstrip('/'), entry) for entry in entries)
+
+    return [_stat_from_listing(by_name[member.name]) if member.name in by_name
+            else NOT_FOUND for member in members]
+
+
+@export
+def stat_many(paths, workers=8, listing=True):
+    """
+    Stat a batch of paths with as few requests as possible.
+    Returns an OrderedDict that maps each path to its ArtifactoryFileStat,
+    or to NOT_FOUND if it doesn't exist. Strings are converted to
+    ArtifactoryPath.
+
+    Paths that share a parent directory are answered from a single
+    listing of that directory if listing is True. The stats are partial:
+    the file list API doesn't report creation time, users, MIME type,
+    md5, sha512 and children, which are None. The other paths are
+    requested one by one, from a pool of 'workers' threads. Stats held
+    by the stat cache are used as they are.
+    """
+    results = collections.OrderedDict()
+    for path in paths:
+        if not isinstance(path, ArtifactoryPath):
+            path = ArtifactoryPath(path)
+        results[path] = None
+
+    stat_cache = _ArtifactoryAccessor._stat_cache
+    groups = collections.OrderedDict()
+    singles = []
+
+    for path in results:
+        if stat_cache is not None:
+            stat = stat_cache.get(path._accessor.storage_url(path))
+            if stat is not None:
+                results[path] = stat
+                continue
+
+        # repositories have no listable parent
+        if listing and len(path.parts) > 1:
+            groups.setdefault(str(path.parent), []).append(path)
+        else:
+            singles.append(path)
+
+    for key, members in list(groups.items()):
+        if len(members) < 2:
+            singles.extend(members)
+            del groups[key]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = dict((executor.submit(_stat_one, path), [path]) for path in singles)
+        for members in groups.values():
+            pending[executor.submit(_stat_group, members[0].parent, members)] = members
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                members = pending.pop(future)
+                stats = future.result()
+
+                if stats is None:
+                    # no listing, fall back to requesting the paths one by one
+                    for path in members:
+                        pending[executor.submit(_stat_one, path)] = [path]
+                    continue
+
+                results.update(zip(members, stats))
+
+    return results
+
@@ -0,0 +1,118 @@
+import time
+import random
+import threading
+import collections
+import email.utils
+
+from .utils import export
+
+RetryPolicy = collections.namedtuple(
+  'RetryPolicy',
+  ['retries',
+   'backoff',
+   'backoff_max',
+   'statuses',
+   'breaker_threshold',
+   'breaker_timeout'])
+
+export(RetryPolicy)
+
+@export
+def policy_from_config(cfg_entry):
+  """
+  Returns the RetryPolicy described by the 'retries', 'retry_backoff',
+  'retry_backoff_max', 'retry_statuses', 'breaker_threshold' and
+  'breaker_timeout' settings of a Config entry
+  """
+  return RetryPolicy(
+    retries           = int(cfg_entry['retries'] or 0),
+    backoff           = float(cfg_entry['retry_backoff']),
+    backoff_max       = float(cfg_entry['retry_backoff_max']),
+    statuses          = frozenset(cfg_entry['retry_statuses'] or ()),
+    breaker_threshold = int(cfg_entry['breaker_threshold'] or 0),
+    breaker_timeout   = float(cfg_entry['breaker_timeout']))
+
+@export
+def backoff_delay(policy, attempt):
+  """
+  Seconds to wait before retry number attempt (starting at 0): a random
+  time up to an exponentially growing bound ("full jitter")
+  """
+  return random.uniform(0, min(policy.backoff_max, policy.backoff * 2 ** attempt))
+
+@export
+def retry_after(value, now=None):
+  """
+  Parses a Retry-After header, which holds either seconds or an HTTP
+  date. Returns seconds to wait, or None if value can't be parsed.
+  """
+  if not value:
+    return None
+
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+
+  parsed = email.utils.parsedate_tz(value)
+  if parsed is None:
+    return None
+  return max(0.0, email.utils.mktime_tz(parsed) - (now if now is not None else time.time()))
+
+@export
+class CircuitBreaker(object):
+  """
+  Tracks consecutive failures of requests to an Artifactory instance.
+  After 'threshold' of them the circuit opens, and requests are refused
+  for 'timeout' seconds. Then a single trial request is let through,
+  which closes the circuit if it succeeds and reopens it otherwise.
+  """
+  def __init__(self, timer=time.time):
+    self.failures = 0
+    self.opened = None
+    self._trial = False
+    self._timer = timer
+    self._lock = threading.Lock()
+
+  def allow(self, policy):
+    """
+    Returns True if a request may be sent
+    """
+    with self._lock:
+      if self.opened is None:
+        return True
+      if not self._trial and self._timer() - self.opened >= policy.breaker_timeout:
+        self._trial = True
+        return True
+      return False
+
+  def retry_in(self, policy):
+    """
+    Seconds until the next trial request is let through
+    """
+    with self._lock:
+      if self.opened is None:
+        return 0.0
+      return max(0.0, self.opened + policy.breaker_timeout - self._timer())
+
+  def release(self):
+    """
+    Lets the next request through as a trial if the outcome of the
+    current trial is unknown
+    """
+    with self._lock:
+      self._trial = False
+
+  def success(self):
+    with self._lock:
+      self.failures = 0
+      self.opened = None
+      self._trial = False
+
+  def failure(self, policy):
+    with self._lock:
+      self.failures += 1
+      if self._trial or (policy.breaker_threshold and
+                         self.failures >= policy.breaker_threshold):
+        self.opened = self._timer()
+      self._trial = False
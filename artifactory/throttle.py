@@ -0,0 +1,83 @@
+import time
+import threading
+
+from .utils import export
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+@export
+class Limiter(object):
+  """
+  Limits the requests sent to an Artifactory instance, shared by all
+  threads: at most 'max_in_flight' requests at a time, and on average
+  at most 'rate' requests per second with bursts of up to 'burst'
+  requests (a token bucket). A limit of 0 or None turns it off.
+
+  Use as a context manager around sending a request:
+
+    with limiter:
+      res = session.request(...)
+  """
+  def __init__(self, max_in_flight=0, rate=0, burst=None, timer=monotonic, sleep=time.sleep):
+    self.max_in_flight = max_in_flight or 0
+    self.rate = float(rate or 0)
+    self.burst = float(burst or max(1.0, self.rate))
+    self.in_flight = 0
+    self._slots = threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+    self._tokens = self.burst
+    self._timer = timer
+    self._sleep = sleep
+    self._updated = timer()
+    self._lock = threading.Lock()
+
+  @classmethod
+  def from_config(cls, cfg_entry):
+    """
+    Returns the Limiter described by the 'max_in_flight', 'rate_limit'
+    and 'rate_burst' settings of a Config entry
+    """
+    return cls(max_in_flight=int(cfg_entry['max_in_flight'] or 0),
+               rate=cfg_entry['rate_limit'],
+               burst=cfg_entry['rate_burst'])
+
+  @property
+  def settings(self):
+    return (self.max_in_flight, self.rate, self.burst)
+
+  def _reserve(self):
+    """
+    Takes a token from the bucket and returns the seconds to wait until
+    it is actually available
+    """
+    with self._lock:
+      now = self._timer()
+      self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+      self._updated = now
+      self._tokens -= 1
+      return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+  def acquire(self):
+    """
+    Blocks until a request may be sent
+    """
+    if self.rate:
+      delay = self._reserve()
+      if delay:
+        self._sleep(delay)
+    if self._slots is not None:
+      self._slots.acquire()
+    with self._lock:
+      self.in_flight += 1
+
+  def release(self):
+    with self._lock:
+      self.in_flight -= 1
+    if self._slots is not None:
+      self._slots.release()
+
+  def __enter__(self):
+    self.acquire()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.release()
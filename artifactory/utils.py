@@ -1,8 +1,17 @@
+import io
+import re
 import sys
+import time
+import datetime
 import types
 import hashlib
+import threading
+import collections
 from contextlib import contextmanager
 
+import dateutil.tz
+import dateutil.parser
+
 def export(symbol):
   caller_module = sys._getframe(1).f_globals
 
@@ -36,6 +45,105 @@ def merge_dicts(*args):
         result.update(_dict)
     return result
 
+_ISO8601_RE = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?'
+    r'(?:(Z)|([+-])(\d\d):?(\d\d))?$')
+
+_tzoffsets = {}
+
+def _tzoffset(seconds):
+    try:
+        return _tzoffsets[seconds]
+    except KeyError:
+        tz = _tzoffsets[seconds] = dateutil.tz.tzoffset(None, seconds)
+        return tz
+
+@export
+def parse_iso8601(value):
+    """
+    Parses a timestamp in the fixed ISO-8601 format Artifactory reports,
+    e.g. '2014-02-24T21:20:59.999+04:00', into a datetime. Falls back to
+    dateutil for anything else.
+    """
+    match = _ISO8601_RE.match(value)
+    if match is None:
+        return dateutil.parser.parse(value)
+
+    (year, month, day, hour, minute, second,
+     fraction, utc, sign, tz_hours, tz_minutes) = match.groups()
+
+    tz = None
+    if utc:
+        tz = dateutil.tz.tzutc()
+    elif sign:
+        offset = int(tz_hours) * 3600 + int(tz_minutes) * 60
+        tz = _tzoffset(-offset if sign == '-' else offset)
+
+    microsecond = int(fraction[:6].ljust(6, '0')) if fraction else 0
+
+    return datetime.datetime(int(year), int(month), int(day),
+                             int(hour), int(minute), int(second),
+                             microsecond, tz)
+
+@export
+class LRUCache(object):
+  """
+  Thread-safe least-recently-used cache bounded by maxsize, with an
+  optional time-to-live (in seconds) for its entries
+  """
+  def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._timer = timer
+    self._data = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._data)
+
+  def __contains__(self, key):
+    return self.get(key, self) is not self
+
+  def get(self, key, default=None):
+    with self._lock:
+      try:
+        expires, value = self._data.pop(key)
+      except KeyError:
+        return default
+
+      if expires is not None and expires <= self._timer():
+        return default
+
+      # re-insert to mark the entry as most recently used
+      self._data[key] = (expires, value)
+      return value
+
+  def set(self, key, value):
+    expires = None if not self.ttl else self._timer() + self.ttl
+
+    with self._lock:
+      self._data.pop(key, None)
+      self._data[key] = (expires, value)
+
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def pop(self, key, default=None):
+    with self._lock:
+      return self._data.pop(key, (None, default))[1]
+
+  def pop_prefix(self, prefix):
+    """
+    Removes all entries with keys starting with prefix
+    """
+    with self._lock:
+      for key in [k for k in self._data if k.startswith(prefix)]:
+        del self._data[key]
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+
 @export
 class Singleton(type):
   _instances = {}
@@ -79,9 +187,28 @@ def sha512sum(filename):
     """
     return hexdigest(filename, 'sha512')
 
+@export
+def multi_digest(filename, algorithms=('md5', 'sha1', 'sha256', 'sha512'),
+                 buffer_size=1024 * 1024):
+    """
+    Calculates several hashes of a file in a single pass over its
+    contents, reading it into one reusable buffer.
+    Returns a dictionary that maps algorithm names to hex digests.
+    """
+    hashers = [(name, getattr(hashlib, name)()) for name in algorithms]
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+
+    with io.open(filename, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buf)
+            if not size:
+                break
+            chunk = view[:size]
+            for _, hasher in hashers:
+                hasher.update(chunk)
+
+    return dict((name, hasher.hexdigest()) for name, hasher in hashers)
+
 def hexdigest(filename, hash_type):
-  hasher = getattr(hashlib, hash_type)()
-  with open(filename, 'rb') as f:
-    for chunk in iter(lambda: f.read(128 * hasher.block_size), b''):
-      hasher.update(chunk)
-  return hasher.hexdigest()
+  return multi_digest(filename, (hash_type,))[hash_type]
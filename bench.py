@@ -0,0 +1,986 @@
+#!/usr/bin/env python
+"""
+Offline benchmarks for ArtifactoryPath
+
+Starts a stand-in Artifactory server on localhost, which keeps artifacts
+in memory and implements the storage, file list, deploy, download, copy,
+move, properties and AQL endpoints this module uses. The server runs in a
+separate process with configurable per-request latency and bandwidth, so
+that measurements only include client-side time and memory.
+
+    python bench.py --latency 5 --bandwidth 100 --output results.json
+    python bench.py --baseline results.json
+
+Results are written as JSON. With --baseline, throughput is compared
+with an earlier run, and the exit status is 1 if any benchmark got
+slower by more than --threshold percent.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import fnmatch
+import hashlib
+import argparse
+import platform
+import threading
+import multiprocessing
+
+try:
+    # attempt python 3 variant first
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, unquote, parse_qs
+except ImportError:
+    # fallback to python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+    from urllib import unquote
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+from artifactory import ArtifactoryPath
+from artifactory.paths import walk
+
+timer = getattr(time, 'perf_counter', time.time)
+
+RESULTS_FORMAT = 1
+
+CHECKSUMS = ('md5', 'sha1', 'sha256', 'sha512')
+
+
+def _timestamp(seconds=None):
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000+00:00', time.gmtime(seconds))
+
+
+class FakeStore(object):
+    """
+    In-memory tree of repositories, folders and files. Keys are paths
+    relative to the Artifactory base URL, e.g. 'repo/dir/file.bin'.
+    File contents are stored once per sha1, so that deploys by checksum
+    work like on a real server.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.items = {}
+        self.children = {}
+        self.blobs = {}
+        self.sha256 = {}
+
+    def _item(self, folder, blob=None, size=0):
+        now = _timestamp()
+        return {'folder': folder, 'blob': blob, 'size': size, 'created': now,
+                'modified': now, 'properties': {}}
+
+    def _link(self, key, item):
+        parent, _, name = key.rpartition('/')
+        if parent:
+            self.mkdir(parent)
+            self.children[parent].add(name)
+        self.items[key] = item
+        if item['folder']:
+            self.children.setdefault(key, set())
+
+    def mkdir(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self._link(key, self._item(folder=True))
+            elif not item['folder']:
+                raise OSError(17, "File exists: '%s'" % key)
+
+    def put(self, key, data, properties=None):
+        digests = dict((name, hashlib.new(name, data).hexdigest()) for name in CHECKSUMS)
+        with self.lock:
+            self.blobs[digests['sha1']] = (data, digests)
+            self.sha256[digests['sha256']] = digests['sha1']
+            self.link_blob(key, digests['sha1'], properties)
+        return digests
+
+    def link_blob(self, key, sha1, properties=None):
+        with self.lock:
+            self.delete(key)
+            item = self._item(folder=False, blob=sha1, size=len(self.blobs[sha1][0]))
+            item['properties'] = dict(properties or {})
+            self._link(key, item)
+
+    def find_blob(self, sha1=None, sha256=None):
+        with self.lock:
+            if sha256 and not sha1:
+                sha1 = self.sha256.get(sha256)
+            return sha1 if sha1 in self.blobs else None
+
+    def get(self, key):
+        return self.items.get(key)
+
+    def data(self, item):
+        return self.blobs[item['blob']][0]
+
+    def digests(self, item):
+        if item['folder']:
+            return {}
+        return self.blobs[item['blob']][1]
+
+    def list(self, key):
+        with self.lock:
+            return sorted(self.children.get(key, ()))
+
+    def walk(self, key):
+        """
+        Yields (relative path, item) for everything below key
+        """
+        with self.lock:
+            stack = [('', key)]
+            result = []
+            while stack:
+                relpath, current = stack.pop()
+                for name in sorted(self.children.get(current, ()), reverse=True):
+                    childkey = current + '/' + name
+                    childpath = relpath + '/' + name
+                    result.append((childpath, self.items[childkey]))
+                    stack.append((childpath, childkey))
+            return result
+
+    def delete(self, key):
+        with self.lock:
+            if key not in self.items:
+                return False
+            for name in list(self.children.get(key, ())):
+                self.delete(key + '/' + name)
+            self.children.pop(key, None)
+            del self.items[key]
+            parent, _, name = key.rpartition('/')
+            if parent in self.children:
+                self.children[parent].discard(name)
+            return True
+
+    def copy(self, src, dst):
+        with self.lock:
+            item = self.items[src]
+            if item['folder']:
+                self.mkdir(dst)
+                for name in self.list(src):
+                    self.copy(src + '/' + name, dst + '/' + name)
+            else:
+                self.link_blob(dst, item['blob'], item['properties'])
+
+    def all_items(self):
+        with self.lock:
+            return [(key, item) for key, item in self.items.items() if '/' in key]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serves the Artifactory REST API subset used by ArtifactoryPath
+    """
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let them wait for
+    # delayed ACKs
+    disable_nagle_algorithm = True
+    prefix = '/artifactory/'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def _throttle(self, size):
+        if self.server.bandwidth:
+            time.sleep(float(size) / self.server.bandwidth)
+
+    def _parse(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if not path.startswith(self.prefix):
+            return None, {}, {}
+        path = path[len(self.prefix):]
+
+        matrix = {}
+        if ';' in path:
+            path, _, params = path.partition(';')
+            for param in params.split(';'):
+                name, _, value = param.partition('=')
+                matrix[name] = value.split(',')
+
+        query = parse_qs(url.query, keep_blank_values=True)
+        return path, query, matrix
+
+    def _read_body(self):
+        chunks = []
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                self._throttle(size)
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+                self._throttle(len(chunk))
+        return b''.join(chunks)
+
+    def _send(self, code, body=b'', content_type='application/json', headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        view = memoryview(body)
+        for start in range(0, len(body), 64 * 1024):
+            chunk = view[start:start + 64 * 1024]
+            self.wfile.write(chunk)
+            self._throttle(len(chunk))
+
+    def _not_found(self, key):
+        self._send(404, json.dumps({'errors': [{
+            'status': 404, 'message': 'Unable to find item: %s' % key}]}).encode('utf-8'))
+
+    def do_GET(self):
+        path, query, _ = self._parse()
+        if path is None:
+            return self._send(404)
+
+        if path.startswith('api/storage/'):
+            key = path[len('api/storage/'):].strip('/')
+            item = self.store.get(key)
+            if item is None:
+                return self._not_found(key)
+            if 'list' in query:
+                return self._send(200, self._listing(key, item, query))
+            if 'properties' in query:
+                if not item['properties']:
+                    return self._send(404, b'No properties could be found.')
+                return self._send(200, {'properties': item['properties']})
+            return self._send(200, self._stat(key, item))
+
+        key = path.strip('/')
+        item = self.store.get(key)
+        if item is None or item['folder']:
+            return self._not_found(key)
+        self._download(item)
+
+    def _stat(self, key, item):
+        jsn = {
+            'repo': key.partition('/')[0],
+            'path': '/' + key.partition('/')[2],
+            'created': item['created'],
+            'createdBy': 'bench',
+            'lastModified': item['modified'],
+            'modifiedBy': 'bench',
+            'lastUpdated': item['modified'],
+        }
+        if item['folder']:
+            jsn['children'] = [{'uri': '/' + name,
+                                'folder': self.store.get(key + '/' + name)['folder']}
+                               for name in self.store.list(key)]
+        else:
+            digests = self.store.digests(item)
+            jsn['size'] = str(item['size'])
+            jsn['mimeType'] = 'application/octet-stream'
+            jsn['checksums'] = digests
+            jsn['originalChecksums'] = digests
+        return jsn
+
+    def _listing(self, key, item, query):
+        if not item['folder']:
+            return {'files': []}
+
+        if query.get('deep', ['0'])[0] == '1':
+            entries = self.store.walk(key)
+        else:
+            entries = [('/' + name, self.store.get(key + '/' + name))
+                       for name in self.store.list(key)]
+
+        files = []
+        for uri, child in entries:
+            if child['folder'] and query.get('listFolders', ['0'])[0] != '1':
+                continue
+            digests = self.store.digests(child)
+            files.append({'uri': uri, 'size': child['size'],
+                          'lastModified': child['modified'], 'folder': child['folder'],
+                          'sha1': digests.get('sha1'), 'sha2': digests.get('sha256')})
+        return {'uri': self.path, 'created': item['created'], 'files': files}
+
+    def _download(self, item):
+        data = self.store.data(item)
+        ranges = self.headers.get('Range')
+        if not ranges or not ranges.startswith('bytes='):
+            return self._send(200, data, 'application/octet-stream')
+
+        start, _, end = ranges[len('bytes='):].partition('-')
+        start = int(start)
+        end = min(int(end), len(data) - 1) if end else len(data) - 1
+        if start >= len(data):
+            return self._send(416)
+        self._send(206, data[start:end + 1], 'application/octet-stream',
+                   {'Content-Range': 'bytes %d-%d/%d' % (start, end, len(data))})
+
+    def do_PUT(self):
+        path, query, matrix = self._parse()
+        body = self._read_body()
+        if path is None:
+            return self._send(404)
+
+        if path.startswith('api/storage/'):
+            key = path[len('api/storage/'):].strip('/')
+            if self.store.get(key) is None:
+                return self._not_found(key)
+            properties = {}
+            for prop in query.get('properties', [''])[0].split('|'):
+                name, _, value = prop.partition('=')
+                if name:
+                    properties[name] = value.split(',')
+            self._update_properties(key, query, lambda props: props.update(properties))
+            return self._send(204)
+
+        if path.endswith('/'):
+            self.store.mkdir(path.strip('/'))
+            return self._send(201)
+
+        key = path.strip('/')
+        if self.headers.get('X-Checksum-Deploy', '').lower() == 'true':
+            sha1 = self.store.find_blob(self.headers.get('X-Checksum-Sha1'),
+                                        self.headers.get('X-Checksum-Sha256'))
+            if sha1 is None:
+                return self._send(404, b'Checksum deploy failed: no such checksum')
+            self.store.link_blob(key, sha1, matrix)
+            return self._send(201)
+
+        digests = self.store.put(key, body, matrix)
+        for name in CHECKSUMS:
+            expected = self.headers.get('X-Checksum-' + name.capitalize())
+            if expected and expected != digests[name]:
+                self.store.delete(key)
+                return self._send(409, b'Checksum mismatch')
+        self._send(201, {'repo': key.partition('/')[0], 'path': '/' + key.partition('/')[2],
+                         'size': str(len(body)), 'checksums': digests})
+
+    def _update_properties(self, key, query, update):
+        recursive = query.get('recursive', ['1'])[0] != '0'
+        item = self.store.get(key)
+        items = [item]
+        if recursive and item['folder']:
+            items += [child for _, child in self.store.walk(key)]
+        with self.store.lock:
+            for child in items:
+                update(child['properties'])
+
+    def do_DELETE(self):
+        path, query, _ = self._parse()
+        if path is None:
+            return self._send(404)
+
+        if path.startswith('api/storage/'):
+            key = path[len('api/storage/'):].strip('/')
+            if self.store.get(key) is None:
+                return self._not_found(key)
+            names = query.get('properties', [''])[0].split(',')
+
+            def remove(props):
+                for name in names:
+                    props.pop(name, None)
+
+            self._update_properties(key, query, remove)
+            return self._send(204)
+
+        key = path.strip('/')
+        if not self.store.delete(key):
+            return self._not_found(key)
+        self._send(204)
+
+    def do_POST(self):
+        path, query, _ = self._parse()
+        body = self._read_body()
+        if path is None:
+            return self._send(404)
+
+        for operation in ('copy', 'move'):
+            prefix = 'api/%s/' % operation
+            if path.startswith(prefix):
+                src = path[len(prefix):].strip('/')
+                dst = query.get('to', [''])[0].strip('/')
+                if self.store.get(src) is None:
+                    return self._not_found(src)
+                with self.store.lock:
+                    self.store.copy(src, dst)
+                    if operation == 'move':
+                        self.store.delete(src)
+                message = '%s %s to %s completed successfully' % (operation, src, dst)
+                return self._send(200, {'messages': [{'level': 'INFO', 'message': message}]})
+
+        if path == 'api/search/aql':
+            try:
+                return self._send(200, _run_aql(self.store, body.decode('utf-8')))
+            except ValueError as exc:
+                return self._send(400, str(exc).encode('utf-8'), 'text/plain')
+
+        self._send(404)
+
+
+def _parse_aql(query):
+    """
+    Parses items.find(...).include(...).sort(...).offset(n).limit(n)
+    """
+    query = query.strip()
+    if not query.startswith('items.find('):
+        raise ValueError("Only items.find() queries are supported")
+
+    criteria, pos = json.JSONDecoder().raw_decode(query, len('items.find('))
+    if query[pos] != ')':
+        raise ValueError("Malformed query: %s" % query)
+    pos += 1
+
+    modifiers = {}
+    while pos < len(query):
+        name, _, rest = query[pos:].lstrip('.').partition('(')
+        depth, end = 1, 0
+        while depth:
+            depth += {'(': 1, ')': -1}.get(rest[end], 0)
+            end += 1
+        modifiers[name] = rest[:end - 1]
+        pos = len(query) - len(rest) + end
+
+    include = json.loads('[%s]' % modifiers['include']) if 'include' in modifiers else None
+    sort = json.loads(modifiers['sort']) if 'sort' in modifiers else None
+    offset = int(modifiers.get('offset', 0))
+    limit = int(modifiers['limit']) if 'limit' in modifiers else None
+
+    return criteria, include, sort, offset, limit
+
+
+def _aql_compare(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for op, operand in condition.items():
+        if op == '$match':
+            matched = value is not None and fnmatch.fnmatchcase(str(value), operand)
+        elif op == '$nmatch':
+            matched = value is None or not fnmatch.fnmatchcase(str(value), operand)
+        elif op == '$eq':
+            matched = value == operand
+        elif op == '$ne':
+            matched = value != operand
+        elif op in ('$gt', '$gte', '$lt', '$lte'):
+            if value is None:
+                return False
+            matched = {'$gt': value > operand, '$gte': value >= operand,
+                       '$lt': value < operand, '$lte': value <= operand}[op]
+        else:
+            raise ValueError("Unsupported operator: %s" % op)
+        if not matched:
+            return False
+    return True
+
+
+def _aql_matches(criteria, fields):
+    for key, value in criteria.items():
+        if key == '$and':
+            if not all(_aql_matches(c, fields) for c in value):
+                return False
+        elif key == '$or':
+            if not any(_aql_matches(c, fields) for c in value):
+                return False
+        elif key == 'type':
+            if value != 'any' and fields['type'] != value:
+                return False
+        elif key.startswith('@'):
+            values = fields['properties'].get(key[1:], [])
+            if not any(_aql_compare(v, value) for v in values):
+                return False
+        elif not _aql_compare(fields.get(key), value):
+            return False
+    return True
+
+
+def _run_aql(store, query):
+    criteria, include, sort, offset, limit = _parse_aql(query)
+
+    # like Artifactory, only search files unless asked otherwise
+    if 'type' not in criteria:
+        criteria = {'$and': [criteria, {'type': 'file'}]}
+
+    results = []
+    for key, item in store.all_items():
+        repo, _, relpath = key.partition('/')
+        path, _, name = relpath.rpartition('/')
+        digests = store.digests(item)
+        fields = {
+            'repo': repo,
+            'path': path or '.',
+            'name': name,
+            'type': 'folder' if item['folder'] else 'file',
+            'size': item['size'],
+            'created': item['created'],
+            'modified': item['modified'],
+            'updated': item['modified'],
+            'created_by': 'bench',
+            'modified_by': 'bench',
+            'depth': relpath.count('/') + 1,
+            'actual_md5': digests.get('md5'),
+            'actual_sha1': digests.get('sha1'),
+            'sha256': digests.get('sha256'),
+            'properties': item['properties'],
+        }
+        if _aql_matches(criteria, fields):
+            results.append(fields)
+
+    if sort:
+        for order in ('$desc', '$asc'):
+            if order in sort:
+                results.sort(key=lambda fields: [fields.get(f) for f in sort[order]],
+                             reverse=order == '$desc')
+
+    total = len(results)
+    results = results[offset:None if limit is None else offset + limit]
+
+    default = ['repo', 'path', 'name', 'type', 'size', 'created', 'created_by',
+               'modified', 'modified_by', 'updated']
+    names = include or default
+    results = [dict((name, fields.get(name)) for name in names) for fields in results]
+
+    return {'results': results,
+            'range': {'start_pos': offset, 'end_pos': offset + len(results), 'total': total}}
+
+
+class FakeArtifactory(ThreadingMixIn, HTTPServer):
+    """
+    Stand-in Artifactory server, see the module docstring
+
+    latency -- seconds to wait before handling each request
+    bandwidth -- bytes per second for request and response bodies,
+                 or None for no limit
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0, bandwidth=None, store=None):
+        HTTPServer.__init__(self, address, _Handler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.store = store if store is not None else FakeStore()
+
+    @property
+    def url(self):
+        return 'http://%s:%d/artifactory' % self.server_address[:2]
+
+
+def _fixture_data(index, size):
+    """
+    Returns deterministic, incompressible contents for fixture files
+    """
+    rand = random.Random(index)
+    block = bytes(bytearray(rand.getrandbits(8) for _ in range(min(size, 4096))))
+    return (block * (size // 4096 + 1))[:size]
+
+
+def _populate(store, settings):
+    store.mkdir(REPO)
+    store.mkdir(REPO + '/upload')
+    for d in range(settings['dirs']):
+        for f in range(settings['files']):
+            key = '%s/tree/d%03d/f%04d.bin' % (REPO, d, f)
+            store.put(key, _fixture_data(d * settings['files'] + f, settings['size']))
+    store.put(REPO + '/large.bin', _fixture_data(-1, settings['large_size']))
+
+
+def _serve(settings, populate, conn):
+    server = FakeArtifactory(latency=settings['latency'] / 1000.0,
+                             bandwidth=settings['bandwidth'] * 1024 * 1024
+                             if settings['bandwidth'] else None)
+    if populate:
+        _populate(server.store, settings)
+    else:
+        server.store.mkdir(REPO)
+    conn.send(server.url)
+    server.serve_forever()
+
+
+def start_server(settings, populate=True):
+    """
+    Starts a FakeArtifactory in a child process. Returns the process and
+    the base URL of the server.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(settings, populate, child))
+    process.daemon = True
+    process.start()
+    return process, parent.recv()
+
+
+REPO = 'bench-local'
+
+
+class BenchEnv(object):
+    """
+    Paths and local files the benchmarks operate on
+    """
+    def __init__(self, settings, url, replica_url, workdir):
+        self.settings = settings
+        self.repo = ArtifactoryPath(url + '/' + REPO)
+        self.replica = ArtifactoryPath(replica_url + '/' + REPO)
+        self.tree = self.repo / 'tree'
+        self.dirs = [self.tree / ('d%03d' % d) for d in range(settings['dirs'])]
+        self.files = [d / ('f%04d.bin' % f) for d in self.dirs
+                      for f in range(settings['files'])]
+        self.large = self.repo / 'large.bin'
+        self.workdir = workdir
+        self._counter = 0
+
+    def unique(self, prefix):
+        self._counter += 1
+        return '%s-%06d' % (prefix, self._counter)
+
+    def local_file(self, size, unique=True):
+        """
+        Writes a local file to deploy; unique files can't be deployed
+        by checksum
+        """
+        name = os.path.join(self.workdir, self.unique('local'))
+        with open(name, 'wb') as f:
+            f.write(os.urandom(size) if unique else b'\0' * size)
+        return name
+
+
+def _cycle(items, count):
+    return [items[i % len(items)] for i in range(count)]
+
+
+def bench_stat(env, count):
+    return [(path.stat, 0) for path in _cycle(env.files, count)]
+
+
+def bench_iterdir(env, count):
+    return [(lambda d=d: list(d.iterdir()), 0) for d in _cycle(env.dirs, count)]
+
+
+def bench_walk(env, count):
+    return [(lambda: list(walk(env.tree)), 0) for _ in range(count)]
+
+
+def bench_walk_concurrent(env, count):
+    return [(lambda: list(walk(env.tree, deep=False, workers=8)), 0) for _ in range(count)]
+
+
+def bench_glob(env, count):
+    return [(lambda: list(env.tree.glob('d00*/f000*.bin')), 0) for _ in range(count)]
+
+
+def bench_rglob(env, count):
+    return [(lambda: list(env.tree.rglob('*.bin')), 0) for _ in range(count)]
+
+
+def bench_deploy_file(env, count):
+    size = env.settings['size']
+
+    def op(name):
+        return lambda: (env.repo / 'upload' / env.unique('deploy')).deploy_file(name)
+
+    return [(op(env.local_file(size)), size) for _ in range(count)]
+
+
+def bench_deploy_file_by_checksum(env, count):
+    size = env.settings['size']
+    name = env.local_file(size)
+    (env.repo / 'upload' / env.unique('seed')).deploy_file(name)
+    return [(lambda: (env.repo / 'upload' / env.unique('dedup')).deploy_file(name), size)
+            for _ in range(count)]
+
+
+def _read(path, chunk_size=1024 * 1024):
+    with path.open() as f:
+        while f.read(chunk_size):
+            pass
+
+
+def bench_read(env, count):
+    size = env.settings['size']
+    return [(lambda p=p: _read(p), size) for p in _cycle(env.files, count)]
+
+
+def bench_read_large(env, count):
+    return [(lambda: _read(env.large), env.settings['large_size']) for _ in range(count)]
+
+
+def bench_read_seekable(env, count):
+    size = env.settings['large_size']
+    rand = random.Random(0)
+
+    def op(offset):
+        with env.large.open(seekable=True) as f:
+            f.seek(offset)
+            f.read(64 * 1024)
+
+    return [(lambda o=rand.randrange(size): op(o), 64 * 1024) for _ in range(count)]
+
+
+def bench_copy(env, count):
+    return [(lambda p=p: p.copy(env.repo / 'upload' / env.unique('copy')), 0)
+            for p in _cycle(env.files, count)]
+
+
+def bench_replicate(env, count):
+    return [(lambda: env.large.copy(env.replica / env.unique('replica')),
+             env.settings['large_size']) for _ in range(count)]
+
+
+BENCHMARKS = [
+    ('stat', bench_stat),
+    ('iterdir', bench_iterdir),
+    ('walk', bench_walk),
+    ('walk_concurrent', bench_walk_concurrent),
+    ('glob', bench_glob),
+    ('rglob', bench_rglob),
+    ('deploy_file', bench_deploy_file),
+    ('deploy_file_by_checksum', bench_deploy_file_by_checksum),
+    ('read', bench_read),
+    ('read_large', bench_read_large),
+    ('read_seekable', bench_read_seekable),
+    ('copy', bench_copy),
+    ('replicate', bench_replicate),
+]
+
+# Benchmarks over the whole tree or large files run fewer times
+SCALE = {
+    'walk': 0.1,
+    'walk_concurrent': 0.1,
+    'rglob': 0.1,
+    'read_large': 0.1,
+    'replicate': 0.1,
+}
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return None
+    rank = int(math.ceil(pct / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def run_benchmark(env, function, count):
+    ops = function(env, count)
+
+    latencies = []
+    transferred = 0
+    started = timer()
+    for op, size in ops:
+        op_started = timer()
+        op()
+        latencies.append(timer() - op_started)
+        transferred += size
+    elapsed = timer() - started
+
+    # peak memory is taken in a separate pass, as tracing slows down
+    # the client considerably
+    peak = None
+    if tracemalloc is not None:
+        ops = function(env, max(1, min(count, 5)))
+        tracemalloc.start()
+        try:
+            for op, _ in ops:
+                op()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000.0, 3)
+    return {
+        'ops': len(latencies),
+        'seconds': round(elapsed, 6),
+        'ops_per_sec': round(len(latencies) / elapsed, 3) if elapsed else None,
+        'mb_per_sec': round(transferred / elapsed / 1024 / 1024, 3)
+                      if transferred and elapsed else None,
+        'latency_ms': {
+            'min': ms(latencies[0]),
+            'mean': ms(sum(latencies) / len(latencies)),
+            'p50': ms(percentile(latencies, 50)),
+            'p90': ms(percentile(latencies, 90)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]),
+        },
+        'peak_memory_kb': round(peak / 1024.0, 1) if peak is not None else None,
+    }
+
+
+def _package_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('artifactory').version
+    except Exception:
+        return None
+
+
+def run(settings, names=None, out=sys.stdout):
+    import tempfile
+    import shutil
+
+    server, url = start_server(settings)
+    replica, replica_url = start_server(settings, populate=False)
+    workdir = tempfile.mkdtemp(prefix='artifactory-bench-')
+
+    results = {}
+    try:
+        env = BenchEnv(settings, url, replica_url, workdir)
+        for name, function in BENCHMARKS:
+            if names and name not in names:
+                continue
+            count = max(1, int(settings['iterations'] * SCALE.get(name, 1)))
+            results[name] = run_benchmark(env, function, count)
+            out.write(format_result(name, results[name]) + '\n')
+            out.flush()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        for process in (server, replica):
+            process.terminate()
+            process.join()
+
+    return {
+        'format': RESULTS_FORMAT,
+        'created': _timestamp(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'artifactory': _package_version(),
+        'settings': settings,
+        'benchmarks': results,
+    }
+
+
+def format_result(name, result, baseline=None):
+    line = '%-24s %10.1f ops/s  p50 %9.3f ms  p99 %9.3f ms' % (
+        name, result['ops_per_sec'] or 0,
+        result['latency_ms']['p50'], result['latency_ms']['p99'])
+    if result['mb_per_sec'] is not None:
+        line += '  %8.1f MB/s' % result['mb_per_sec']
+    if result['peak_memory_kb'] is not None:
+        line += '  peak %9.1f KB' % result['peak_memory_kb']
+    if baseline is not None:
+        line += '  %+6.1f%%' % change(baseline, result)
+    return line
+
+
+def change(baseline, result):
+    """
+    Change of throughput in percent
+    """
+    before, after = baseline['ops_per_sec'], result['ops_per_sec']
+    if not before or after is None:
+        return 0.0
+    return (after - before) * 100.0 / before
+
+
+def compare(baseline, current, threshold, out=sys.stdout):
+    """
+    Prints the results of current next to the change against baseline.
+    Returns the names of benchmarks whose throughput dropped by more
+    than threshold percent.
+    """
+    if baseline.get('settings') != current.get('settings'):
+        out.write('warning: the runs were made with different settings\n')
+
+    regressions = []
+    for name, result in sorted(current['benchmarks'].items()):
+        before = baseline['benchmarks'].get(name)
+        out.write(format_result(name, result, before) + '\n')
+        if before is not None and change(before, result) < -threshold:
+            regressions.append(name)
+
+    if regressions:
+        out.write('regressions: %s\n' % ', '.join(regressions))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0,
+                        help='server latency per request in milliseconds (default: 0)')
+    parser.add_argument('--bandwidth', type=float, default=0,
+                        help='server bandwidth in MB/s, 0 for unlimited (default: 0)')
+    parser.add_argument('--dirs', type=int, default=10,
+                        help='number of directories in the test tree (default: 10)')
+    parser.add_argument('--files', type=int, default=20,
+                        help='number of files per directory (default: 20)')
+    parser.add_argument('--size', type=int, default=64 * 1024,
+                        help='size of the files in the test tree in bytes (default: 65536)')
+    parser.add_argument('--large-size', type=int, default=16 * 1024 * 1024,
+                        help='size of the large file in bytes (default: 16777216)')
+    parser.add_argument('--iterations', type=int, default=100,
+                        help='operations per benchmark (default: 100)')
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        choices=[name for name, _ in BENCHMARKS],
+                        help='run only the named benchmark, can be repeated')
+    parser.add_argument('--output', '-o', metavar='FILE',
+                        help='write results as JSON to FILE')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='compare with results of an earlier run')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='throughput drop in percent that counts as a '
+                             'regression (default: 10)')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        return 1 if compare(baseline, current, args.threshold) else 0
+
+    settings = {
+        'latency': args.latency,
+        'bandwidth': args.bandwidth,
+        'dirs': args.dirs,
+        'files': args.files,
+        'size': args.size,
+        'large_size': args.large_size,
+        'iterations': args.iterations,
+    }
+
+    results = run(settings, args.only)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.stdout.write('\ncompared with %s:\n' % args.baseline)
+        return 1 if compare(baseline, results, args.threshold) else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
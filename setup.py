@@ -31,7 +31,8 @@ dependencies = [
   'pathlib',
   'requests',
   'python-dateutil',
-  'PyYAML'
+  'PyYAML',
+  'futures; python_version < "3"'
 ]
 
 setup(
@@ -58,6 +59,9 @@ setup(
     url='http://github.com/parallels/artifactory',
     download_url='http://github.com/parallels/artifactory',
     install_requires=dependencies,
+    extras_require={
+      'async': ['aiohttp; python_version >= "3.6"']
+    },
     zip_safe=False,
     package_data={'': ['README.md']}
 )
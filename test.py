@@ -7,21 +7,27 @@ import io
 import unittest
 import multiprocessing
 import tempfile
+import threading
+import time
 import artifactory
 import json
+import pickle
+import hashlib
 import requests
+import requests.packages.urllib3 as urllib3
 import datetime
 import dateutil
 
-from artifactory import Config, ArtifactoryPath, PureArtifactoryPath, http
-from artifactory.paths import _ArtifactoryAccessor, _ArtifactoryFlavour
+from artifactory import Config, ArtifactoryPath, PureArtifactoryPath, AQLQuery, aql, cache, http, metrics, retry, throttle, utils
+from artifactory import CircuitOpenError
+from artifactory.paths import _ArtifactoryAccessor, _ArtifactoryFlavour, walk
 
 try:
   # attempt python 3 variant first
-  from unittest.mock import MagicMock as MM
+  from unittest.mock import MagicMock as MM, patch, call
 except ImportError:
   # fallback to python 2
-  from mock import MagicMock as MM
+  from mock import MagicMock as MM, patch, call
 
 class UtilTest(unittest.TestCase):
     def test_matrix_encode(self):
@@ -38,6 +44,54 @@ class UtilTest(unittest.TestCase):
 
         self.assertEqual(s, "baz=bar;baz=quux;foo=asdf")
 
+    def test_lru_cache(self):
+        now = [0]
+        cache = utils.LRUCache(maxsize=2, ttl=10, timer=lambda: now[0])
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('a'), 1)
+
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('c'))
+
+        cache.set('a/b', 1)
+        cache.set('a/c', 2)
+        cache.pop_prefix('a/')
+        self.assertEqual(len(cache), 0)
+
+    def test_multi_digest(self):
+        import hashlib
+        data = os.urandom(3 * 1024 + 17)
+
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        try:
+            digests = utils.multi_digest(f.name, buffer_size=1024)
+            self.assertEqual(sorted(digests), ['md5', 'sha1', 'sha256', 'sha512'])
+            for name, digest in digests.items():
+                self.assertEqual(digest, hashlib.new(name, data).hexdigest())
+
+            self.assertEqual(utils.sha1sum(f.name), digests['sha1'])
+            self.assertEqual(utils.multi_digest(f.name, ['md5']), {'md5': digests['md5']})
+        finally:
+            os.unlink(f.name)
+
+    def test_parse_iso8601(self):
+        for value in ["2014-02-24T21:20:59.999+04:00",
+                      "2014-02-24T21:20:59.1234567-0530",
+                      "2014-02-24T21:20:59Z",
+                      "2014-02-24T21:20:59",
+                      "24 Feb 2014 21:20"]:
+            parsed = utils.parse_iso8601(value)
+            self.assertEqual(parsed, dateutil.parser.parse(value))
+            self.assertEqual(parsed.utcoffset(),
+                             dateutil.parser.parse(value).utcoffset())
+
     def test_escape_chars(self):
         s = http.escape_chars('a,b|c=d')
         self.assertEqual(s, "a\,b\|c\=d")
@@ -243,6 +297,73 @@ class ArtifactoryAccessorTest(unittest.TestCase):
         self.assertEqual(s.md5, None)
         self.assertEqual(s.is_dir, True)
 
+    def test_stat_cache(self):
+        a = self.cls()
+        P = ArtifactoryPath
+
+        p = P("http://artifactory.local/artifactory/ext-release-local/org/company/tool/1.0/tool-1.0.tar.gz")
+
+        a.rest_get = MM(return_value=(self.file_stat, 200))
+        a.rest_del = MM(return_value=('', 204))
+
+        self.cls.enable_stat_cache()
+        try:
+            s1 = a.stat(p)
+            s2 = a.stat(p)
+            self.assertIs(s1, s2)
+            self.assertEqual(a.rest_get.call_count, 1)
+
+            a.invalidate(p)
+            a.stat(p)
+            self.assertEqual(a.rest_get.call_count, 2)
+
+            a.invalidate(p.parent, recursive=True)
+            a.stat(p)
+            self.assertEqual(a.rest_get.call_count, 3)
+
+            a.unlink(p)
+            a.stat(p)
+            self.assertEqual(a.rest_get.call_count, 4)
+        finally:
+            self.cls.disable_stat_cache()
+
+    def test_stat_lazy(self):
+        a = self.cls()
+        P = ArtifactoryPath
+
+        p = P("http://artifactory.local/artifactory/ext-release-local/org/company/tool/1.0/tool-1.0.tar.gz")
+
+        a.rest_get = MM(return_value=(self.file_stat, 200))
+
+        with patch('artifactory.utils.parse_iso8601',
+                   MM(side_effect=utils.parse_iso8601)) as parse:
+            s = a.stat(p)
+            self.assertEqual(parse.call_count, 0)
+            self.assertEqual(s.size, 26776462)
+            self.assertEqual(parse.call_count, 0)
+
+            self.assertEqual(s.st_mtime, s.mtime)
+            self.assertEqual(s.st_ctime, s.ctime)
+            self.assertEqual(parse.call_count, 2)
+
+        self.assertIsInstance(s, tuple)
+        ctime, mtime = s[:2]
+        self.assertEqual(mtime, s.mtime)
+        self.assertEqual(s[7], s.size)
+        self.assertEqual(s[-1], s.children)
+        self.assertEqual(len(s), len(s._fields))
+        self.assertEqual(len(tuple(s)), len(s._fields))
+        self.assertEqual(s, tuple(s))
+        self.assertEqual(tuple(s), s)
+        self.assertEqual(() + s, tuple(s))
+        self.assertEqual(pickle.loads(pickle.dumps(s)), s)
+        self.assertEqual(list(s._asdict()), list(s._fields))
+        self.assertEqual(s, artifactory.paths.ArtifactoryFileStat(*s))
+
+        r = s._replace(size=1)
+        self.assertEqual((r.size, r.st_size), (1, 1))
+        self.assertEqual(r.sha1, s.sha1)
+
     def test_listdir(self):
         a = self.cls()
         P = ArtifactoryPath
@@ -286,6 +407,89 @@ class ArtifactoryAccessorTest(unittest.TestCase):
         a.rest_put_stream.assert_called_with(url, f, headers={}, auth=None, verify=True, cert=None)
 
 
+    def test_deploy_by_checksum(self):
+        a = self.cls()
+        P = ArtifactoryPath
+
+        p = P("http://b/artifactory/c/d")
+        f = io.BytesIO(b'data')
+
+        a.rest_put = MM(return_value=('Created', 201))
+        a.rest_put_stream = MM(return_value=('Created', 201))
+
+        a.deploy(p, f, sha1='abc', sha256='def')
+
+        a.rest_put.assert_called_with("http://b/artifactory/c/d",
+                                      headers={'X-Checksum-Sha1': 'abc',
+                                               'X-Checksum-Sha256': 'def',
+                                               'X-Checksum-Deploy': 'true'},
+                                      auth=None, verify=True, cert=None)
+        self.assertFalse(a.rest_put_stream.called)
+
+        # contents unknown to the server
+        a.rest_put = MM(return_value=('Checksum deploy failed', 404))
+
+        a.deploy(p, f, sha1='abc')
+
+        self.assertTrue(a.rest_put.called)
+        a.rest_put_stream.assert_called_with("http://b/artifactory/c/d", f,
+                                             headers={'X-Checksum-Sha1': 'abc'},
+                                             auth=None, verify=True, cert=None)
+
+        # disabled
+        a.rest_put = MM()
+        a.deploy(p, f, sha1='abc', checksum_deploy=False)
+        self.assertFalse(a.rest_put.called)
+
+
+class ArtifactoryAccessorSessionTest(unittest.TestCase):
+    """ Test connection pooling of the accessor """
+    cls = _ArtifactoryAccessor
+
+    def tearDown(self):
+        self.cls.close_sessions()
+        Config.clear()
+
+    def test_session_per_drive(self):
+        a = self.cls()
+
+        s1 = a.session("http://b/artifactory/api/storage/c/d")
+        s2 = self.cls().session("http://b/artifactory/c/e")
+        s3 = a.session("http://x/artifactory/c/d")
+
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+
+    def test_session_config(self):
+        Config.load({'http://b/artifactory': {'pool_maxsize': 32,
+                                              'keep_alive': False,
+                                              'verify': False}})
+        s = self.cls().session("http://b/artifactory/c/d")
+
+        adapter = s.get_adapter("http://b/artifactory/c/d")
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(s.headers['Connection'], 'close')
+        self.assertEqual(s.verify, False)
+
+    def test_session_cookies(self):
+        import email
+        import http.client
+        s = self.cls().session("http://b/artifactory/c/d")
+        request = s.prepare_request(requests.Request('GET', "http://b/artifactory/c/d"))
+
+        # cookies set in response to one user's request aren't kept
+        headers = email.message_from_string('Set-Cookie: SESSION=secret; Path=/\n\n',
+                                            _class=http.client.HTTPMessage)
+        s.cookies.extract_cookies(requests.cookies.MockResponse(headers),
+                                  requests.cookies.MockRequest(request))
+        self.assertEqual(len(s.cookies), 0)
+
+        # nor sent with anyone else's
+        s.cookies.set_cookie(requests.cookies.create_cookie('SESSION', 'secret', domain='b'))
+        request = s.prepare_request(requests.Request('GET', "http://b/artifactory/c/d"))
+        self.assertNotIn('Cookie', request.headers)
+
+
 class ArtifactoryPathTest(unittest.TestCase):
     """ Test the filesystem-accessing fuctionality """
     cls = ArtifactoryPath
@@ -299,6 +503,20 @@ class ArtifactoryPathTest(unittest.TestCase):
         a = P("http://a/artifactory/", auth=('foo', 'bar'))
         self.assertEqual(a.auth, ('foo', 'bar'))
 
+    def test_shared_context(self):
+        P = self.cls
+        a = P("http://b/artifactory/c/d", auth=('foo', 'bar'))
+        b = P("http://b/artifactory/e", auth=('foo', 'bar'))
+        self.assertIs(a._context, b._context)
+        self.assertIs((a / 'f').parent._context, a._context)
+        self.assertIsNot(P("http://b/artifactory/c/d")._context, a._context)
+
+        b.verify = False
+        self.assertEqual(b.verify, False)
+        self.assertEqual(b.auth, ('foo', 'bar'))
+        self.assertEqual(a.verify, True)
+        self.assertIs((b / 'f')._context, b._context)
+
     def test_auth_inheritance(self):
         P = self.cls
         b = P("http://b/artifactory/c/d", auth=('foo', 'bar'))
@@ -325,6 +543,1027 @@ class ArtifactoryPathTest(unittest.TestCase):
         c = b.with_suffix(".txt")
         self.assertEqual(c.auth, ('foo', 'bar'))
 
+    def test_copy_move_requests(self):
+        src = self.cls("http://b/artifactory/c/d")
+        dst = self.cls("http://b/artifactory/e/d")
+
+        post = MM(return_value=('{}', 200))
+        with patch.object(_ArtifactoryAccessor, 'rest_post', post):
+            src._accessor.copy(src, dst)
+            src._accessor.move(src, dst)
+
+        self.assertEqual(post.call_args_list[0][0][0], "http://b/artifactory/api/copy/c/d")
+        self.assertEqual(post.call_args_list[0][1]['params'],
+                         {'to': '/e/d', 'suppressLayouts': 0})
+        self.assertEqual(post.call_args_list[1][0][0], "http://b/artifactory/api/move/c/d")
+        self.assertEqual(post.call_args_list[1][1]['params'], {'to': '/e/d'})
+
+    def test_properties(self):
+        p = self.cls("http://b/artifactory/c/d")
+        url = "http://b/artifactory/api/storage/c/d"
+        current = {'properties': {'keep': ['1'], 'change': ['a', 'b'], 'drop': ['x']}}
+
+        get = MM(return_value=(json.dumps(current), 200))
+        put = MM(return_value=('', 204))
+        delete = MM(return_value=('', 204))
+        with patch.object(_ArtifactoryAccessor, 'rest_get', get), \
+                patch.object(_ArtifactoryAccessor, 'rest_put', put), \
+                patch.object(_ArtifactoryAccessor, 'rest_del', delete):
+            p.properties = {'keep': 1, 'change': ['a', 'c'], 'new': 'n'}
+            self.assertEqual(put.call_args[0][0], url)
+            self.assertEqual(put.call_args[1]['params'],
+                             {'properties': 'change=a,c|new=n', 'recursive': '0'})
+            self.assertEqual(delete.call_args[1]['params'],
+                             {'properties': 'drop', 'recursive': '0'})
+
+            # nothing to do without changes
+            put.reset_mock()
+            delete.reset_mock()
+            p.properties = {'keep': ['1'], 'change': ('b', 'a'), 'drop': 'x'}
+            self.assertFalse(put.called or delete.called)
+
+            # update_properties() doesn't fetch the current properties
+            get.reset_mock()
+            p.update_properties({'tag': 'release'})
+            self.assertFalse(get.called or delete.called)
+            self.assertEqual(put.call_args[1]['params'], {'properties': 'tag=release'})
+
+            p.update_properties(remove='tag', recursive=False)
+            self.assertEqual(delete.call_args[1]['params'],
+                             {'properties': 'tag', 'recursive': '0'})
+            self.assertRaises(ValueError, p.update_properties, {'a': 'b'}, ['a'])
+
+
+class ArtifactoryWalkTest(unittest.TestCase):
+    """ Test tree traversal on top of listings """
+
+    def setUp(self):
+        self.deep_listing = json.dumps({
+            "uri": "http://b/artifactory/api/storage/c/d",
+            "created": "2014-02-18T15:35:29.361+04:00",
+            "files": [
+                {"uri": "/a", "folder": True},
+                {"uri": "/a/x.gz", "folder": False, "size": 1},
+                {"uri": "/a/b/y.gz", "folder": False, "size": 2},
+                {"uri": "/a/b", "folder": True},
+                {"uri": "/z.txt", "folder": False, "size": 3},
+            ]
+        })
+        self.dir_stats = {
+            "http://b/artifactory/api/storage/c/d": [("a", True), ("z.txt", False)],
+            "http://b/artifactory/api/storage/c/d/a": [("x.gz", False), ("b", True)],
+            "http://b/artifactory/api/storage/c/d/a/b": [("y.gz", False)],
+        }
+
+    def _rest_get(self, url, params=None, **kwargs):
+        if params:
+            return self.deep_listing, 200
+        children = [{"uri": "/" + name, "folder": folder}
+                    for name, folder in self.dir_stats[url]]
+        return json.dumps({"children": children}), 200
+
+    def _walk(self, **kwargs):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+        return [(str(root), sorted(dirs), sorted(files))
+                for root, dirs, files in walk(p, **kwargs)]
+
+    def test_walk(self):
+        expected = [("http://b/artifactory/c/d", ["a"], ["z.txt"]),
+                    ("http://b/artifactory/c/d/a", ["b"], ["x.gz"]),
+                    ("http://b/artifactory/c/d/a/b", [], ["y.gz"])]
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=self._rest_get)) as rest_get:
+            self.assertEqual(self._walk(), expected)
+            self.assertEqual(rest_get.call_count, 1)
+
+            self.assertEqual(self._walk(topdown=False), expected[::-1])
+            self.assertEqual(rest_get.call_count, 2)
+
+            self.assertEqual(self._walk(deep=False), expected)
+            self.assertEqual(rest_get.call_count, 5)
+
+    def test_walk_concurrent(self):
+        expected = [("http://b/artifactory/c/d", ["a"], ["z.txt"]),
+                    ("http://b/artifactory/c/d/a", ["b"], ["x.gz"]),
+                    ("http://b/artifactory/c/d/a/b", [], ["y.gz"])]
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=self._rest_get)) as rest_get:
+            self.assertEqual(self._walk(deep=False, workers=4), expected)
+            self.assertEqual(self._walk(deep=False, workers=4, topdown=False),
+                             expected[::-1])
+            self.assertEqual(rest_get.call_count, 6)
+
+    def test_walk_concurrent_prune(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=self._rest_get)) as rest_get:
+            roots = []
+            for root, dirs, files in walk(p, deep=False, workers=4):
+                roots.append(str(root))
+                dirs[:] = []
+            self.assertEqual(roots, ["http://b/artifactory/c/d"])
+            self.assertEqual(rest_get.call_count, 1)
+
+    def test_walk_fallback(self):
+        def rest_get(url, params=None, **kwargs):
+            if params:
+                return "Bad request", 400
+            return self._rest_get(url, **kwargs)
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=rest_get)):
+            self.assertEqual([root for root, _, _ in self._walk()],
+                             ["http://b/artifactory/c/d",
+                              "http://b/artifactory/c/d/a",
+                              "http://b/artifactory/c/d/a/b"])
+
+    def test_glob_aql(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        results = json.dumps({"results": [
+            {"repo": "c", "path": "d/a", "name": "x.gz", "type": "file"},
+            {"repo": "c", "path": "d/a/b", "name": "y.gz", "type": "file"},
+            {"repo": "c", "path": "d/a/b", "name": "y.gz.txt", "type": "file"},
+            {"repo": "c", "path": "e", "name": "w.gz", "type": "file"},
+        ]})
+
+        def rest_post_stream(url, data, **kwargs):
+            return io.BytesIO(results.encode('utf-8')), 200
+
+        with patch.object(_ArtifactoryAccessor, 'rest_post_stream',
+                          MM(side_effect=rest_post_stream)) as rest_post:
+            self.assertEqual(sorted(str(x) for x in p.glob("a/*/*.gz")),
+                             ["http://b/artifactory/c/d/a/b/y.gz"])
+
+            query = rest_post.call_args[0][1]
+            self.assertEqual(
+                query,
+                'items.find({"name": {"$match": "*.gz"}, '
+                '"path": {"$match": "d/a/*"}, "repo": "c", "type": "any"})'
+                '.include("repo","path","name","type")')
+
+            self.assertEqual(sorted(str(x) for x in p.rglob("*.gz")),
+                             ["http://b/artifactory/c/d/a/b/y.gz",
+                              "http://b/artifactory/c/d/a/x.gz"])
+            self.assertEqual(rest_post.call_count, 2)
+
+    def test_glob_deep(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        with patch.object(_ArtifactoryAccessor, 'rest_post_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(b"Not Found"), 404))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=self._rest_get)) as rest_get:
+            self.assertEqual(sorted(str(x) for x in p.glob("**/*.gz")),
+                             ["http://b/artifactory/c/d/a/b/y.gz",
+                              "http://b/artifactory/c/d/a/x.gz"])
+            self.assertEqual(sorted(str(x) for x in p.rglob("*.txt")),
+                             ["http://b/artifactory/c/d/z.txt"])
+            self.assertEqual(sorted(str(x) for x in p.glob("a/**")),
+                             ["http://b/artifactory/c/d/a",
+                              "http://b/artifactory/c/d/a/b"])
+            self.assertEqual(rest_get.call_count, 3)
+
+    def test_glob_fallback(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        def rest_get(url, params=None, **kwargs):
+            if params:
+                return "Bad request", 400
+            return self._rest_get(url, **kwargs)
+
+        with patch.object(_ArtifactoryAccessor, 'rest_post_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(b"Not Found"), 404))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(side_effect=rest_get)) as rest_get:
+            self.assertEqual(sorted(str(x) for x in p.glob("*/*.gz")),
+                             ["http://b/artifactory/c/d/a/x.gz"])
+            self.assertEqual(sorted(str(x) for x in p.rglob("*.gz")),
+                             ["http://b/artifactory/c/d/a/b/y.gz",
+                              "http://b/artifactory/c/d/a/x.gz"])
+            self.assertEqual(sorted(str(x) for x in p.glob("a/**")),
+                             ["http://b/artifactory/c/d/a",
+                              "http://b/artifactory/c/d/a/b"])
+
+            # "*" doesn't descend into d/a/b
+            rest_get.reset_mock()
+            self.assertEqual(sorted(str(x) for x in p.glob("*")),
+                             ["http://b/artifactory/c/d/a",
+                              "http://b/artifactory/c/d/z.txt"])
+            self.assertEqual(rest_get.call_count, 1)
+
+
+class ArtifactoryTransferTest(unittest.TestCase):
+    """ Test bulk uploads and downloads """
+
+    dir_stat = json.dumps({
+        "repo": "c", "path": "/d",
+        "created": "2014-02-18T15:35:29.361+04:00",
+        "lastModified": "2014-02-18T15:35:29.361+04:00",
+        "children": []
+    })
+
+    def setUp(self):
+        self.local_dir = tempfile.mkdtemp()
+        for relpath, data in [('a.txt', b'a'), ('sub/b.jar', b'bb'), ('sub/c.txt', b'ccc')]:
+            path = os.path.join(self.local_dir, *relpath.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.local_dir)
+
+    def test_deploy_tree(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+        with open(os.path.join(self.local_dir, 'sub', 'd.txt'), 'wb') as f:
+            f.write(b'dddd')
+
+        def rest_put(url, headers=None, **kwargs):
+            # the server already has 'bb'
+            if headers['X-Checksum-Sha1'] == utils.sha1sum(
+                    os.path.join(self.local_dir, 'sub', 'b.jar')):
+                return 'Created', 201
+            return 'Not Found', 404
+
+        uploaded = {}
+
+        def rest_put_stream(url, stream, **kwargs):
+            if url.endswith('c.txt'):
+                return 'Forbidden', 403
+            if url.endswith('d.txt'):
+                raise artifactory.CircuitOpenError('circuit open')
+            uploaded[url] = stream.read()
+            return 'Created', 201
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self.dir_stat, 200))) as rest_get, \
+             patch.object(_ArtifactoryAccessor, 'rest_put',
+                          MM(side_effect=rest_put)), \
+             patch.object(_ArtifactoryAccessor, 'rest_put_stream',
+                          MM(side_effect=rest_put_stream)):
+            report = p.deploy_tree(self.local_dir, workers=4)
+
+        self.assertEqual(rest_get.call_count, 1)
+        self.assertEqual(uploaded, {"http://b/artifactory/c/d/a.txt": b'a'})
+        self.assertEqual(len(report.results), 4)
+        self.assertEqual([str(r.target) for r in report.skipped],
+                         ["http://b/artifactory/c/d/sub/b.jar"])
+        failures = sorted(report.failures, key=lambda r: str(r.target))
+        self.assertEqual([str(r.target) for r in failures],
+                         ["http://b/artifactory/c/d/sub/c.txt",
+                          "http://b/artifactory/c/d/sub/d.txt"])
+        self.assertIsInstance(failures[0].error, RuntimeError)
+        self.assertIsInstance(failures[1].error, artifactory.CircuitOpenError)
+        self.assertEqual(report.bytes, 1)
+
+    def test_deploy_tree_filter(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self.dir_stat, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_put',
+                          MM(return_value=('Not Found', 404))), \
+             patch.object(_ArtifactoryAccessor, 'rest_put_stream',
+                          MM(return_value=('Created', 201))):
+            report = p.deploy_tree(self.local_dir, include='*.txt', exclude='sub/*')
+
+        self.assertEqual([str(r.target) for r in report.results],
+                         ["http://b/artifactory/c/d/a.txt"])
+
+
+    def test_download_tree(self):
+        import hashlib
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        remote = {'a.txt': b'a', 'sub/b.jar': b'new', 'sub/e/f.txt': b'ffff'}
+        listing = json.dumps({"files": [{"uri": "/sub", "folder": True}] + [
+            {"uri": "/" + name, "folder": False, "size": len(data),
+             "sha1": hashlib.sha1(data).hexdigest()}
+            for name, data in remote.items()]})
+
+        def rest_get_stream(url, **kwargs):
+            return io.BytesIO(remote[url[len(str(p)) + 1:]]), 200
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(listing, 200))) as rest_get, \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)) as rest_get_stream:
+            report = p.download_tree(self.local_dir, workers=4)
+
+        self.assertEqual(rest_get.call_count, 1)
+        self.assertEqual(rest_get_stream.call_count, 2)
+        self.assertEqual(report.failures, [])
+        self.assertEqual([str(r.source) for r in report.skipped],
+                         ["http://b/artifactory/c/d/a.txt"])
+        self.assertEqual(report.bytes, 7)
+
+        for name, data in remote.items():
+            with open(os.path.join(self.local_dir, *name.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_download_tree_checksum_mismatch(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        listing = json.dumps({"files": [
+            {"uri": "/g.txt", "folder": False, "size": 1, "sha1": "0" * 40}]})
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(listing, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(b'g'), 200))):
+            report = p.download_tree(self.local_dir)
+
+        self.assertEqual(len(report.failures), 1)
+        self.assertIsInstance(report.failures[0].error, artifactory.ChecksumMismatchError)
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'g.txt')))
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'g.txt.part')))
+
+    def test_download_tree_without_listing(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        # files found by walking the tree are verified against their stat
+        with patch.object(_ArtifactoryAccessor, 'get_deep_listing', MM(return_value=None)), \
+             patch('artifactory.paths.walk', MM(return_value=[(p, [], ['h.txt'])])), \
+             patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(b'good'), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(b'evil'), 200))):
+            report = p.download_tree(self.local_dir)
+
+        self.assertEqual(len(report.failures), 1)
+        self.assertIsInstance(report.failures[0].error, artifactory.ChecksumMismatchError)
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'h.txt')))
+
+
+    def _file_stat(self, data):
+        return json.dumps({
+            "repo": "c", "path": "/d/f.bin",
+            "created": "2014-02-24T21:20:59.999+04:00",
+            "lastModified": "2014-02-24T21:20:36.000+04:00",
+            "size": str(len(data)),
+            "checksums": {"sha1": hashlib.sha1(data).hexdigest(),
+                          "sha256": hashlib.sha256(data).hexdigest()}
+        })
+
+    def test_replicate(self):
+        src = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        dst = ArtifactoryPath("http://x/artifactory/y/f.bin")
+        data = os.urandom(1000)
+        stored = {}
+
+        def rest_get(url, **kwargs):
+            if url.startswith('http://b/'):
+                return self._file_stat(data), 200
+            return self._file_stat(stored.get('data', b'')), 200
+
+        def rest_put_stream(url, stream, headers=None, **kwargs):
+            stored['headers'] = headers
+            stored['data'] = b''.join(stream)
+            return 'Created', 201
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get', MM(side_effect=rest_get)), \
+             patch.object(_ArtifactoryAccessor, 'rest_put',
+                          MM(return_value=('Not found', 404))) as rest_put, \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(data), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_put_stream',
+                          MM(side_effect=rest_put_stream)):
+            src.copy(dst, chunk_size=64)
+
+            self.assertEqual(stored['data'], data)
+            self.assertEqual(stored['headers']['X-Checksum-Sha1'], hashlib.sha1(data).hexdigest())
+            self.assertEqual(rest_put.call_args[1]['headers']['X-Checksum-Deploy'], 'true')
+
+            # the destination ends up with different contents
+            def corrupt(url, stream, headers=None, **kwargs):
+                stored['data'] = b''.join(stream)[:-1] + b'x'
+                return 'Created', 201
+
+            with patch.object(_ArtifactoryAccessor, 'rest_put_stream',
+                              MM(side_effect=corrupt)):
+                self.assertRaises(artifactory.ChecksumMismatchError, src.replicate, dst)
+
+            # already stored on the destination
+            rest_put.return_value = ('Created', 201)
+            stored['data'] = data
+            with patch.object(_ArtifactoryAccessor, 'rest_put_stream', MM()) as put_stream:
+                src.replicate(dst)
+                self.assertFalse(put_stream.called)
+
+    def test_hashing_reader(self):
+        data = os.urandom(1000)
+        reader = http.HashingReader(io.BytesIO(data), size=len(data), chunk_size=300)
+
+        self.assertEqual(len(reader), 1000)
+        self.assertEqual([len(chunk) for chunk in reader], [300, 300, 300, 100])
+        self.assertEqual(reader.bytes_read, 1000)
+        self.assertEqual(reader.hexdigests()['sha256'], hashlib.sha256(data).hexdigest())
+
+        # small reads, like those of http.client, are served from whole chunks
+        fobj = io.BytesIO(data)
+        fobj.read = MM(side_effect=fobj.read)
+        reader = http.HashingReader(fobj, size=len(data), chunk_size=300)
+
+        self.assertEqual(b''.join(iter(lambda: reader.read(128), b'')), data)
+        self.assertEqual(fobj.read.call_args_list, [call(300)] * 5)
+        self.assertEqual(reader.hexdigests()['sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_download_to_resume(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        data = b'0123456789' * 100
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        with open(local_path + '.part', 'wb') as f:
+            f.write(data[:300])
+        with open(local_path + '.part.meta', 'w') as f:
+            json.dump({'sha1': hashlib.sha1(data).hexdigest(), 'if_range': '"v1"'}, f)
+
+        class FlakyStream(io.BytesIO):
+            # drops the connection after 200 bytes
+            headers = {'ETag': '"v1"'}
+
+            def read(self, size=-1):
+                if self.tell() >= 200:
+                    raise urllib3.exceptions.ProtocolError("Connection reset")
+                return io.BytesIO.read(self, min(size, 100))
+
+        ranges = []
+
+        def rest_get_stream(url, headers=None, **kwargs):
+            if not headers:
+                ranges.append(0)
+                return FlakyStream(data), 200
+            self.assertEqual(headers['If-Range'], '"v1"')
+            start = int(headers['Range'][len('bytes='):-1])
+            ranges.append(start)
+            return FlakyStream(data[start:]), 206
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(data), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)):
+            p.download_to(local_path, retries=5)
+
+            self.assertEqual(ranges, [300, 500, 700, 900])
+            with open(local_path, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            self.assertFalse(os.path.exists(local_path + '.part'))
+            self.assertFalse(os.path.exists(local_path + '.part.meta'))
+
+            # complete and valid, nothing to do
+            p.download_to(local_path)
+            self.assertEqual(len(ranges), 4)
+
+            # out of retries
+            os.remove(local_path)
+            self.assertRaises(urllib3.exceptions.ProtocolError,
+                              p.download_to, local_path, retries=1)
+
+    def test_download_to_resume_changed(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        old, new = b'a' * 1000, b'b' * 1000
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        def rest_get_stream(url, headers=None, **kwargs):
+            fobj = io.BytesIO(new)
+            fobj.headers = {'ETag': '"v2"'}
+            if headers and headers.get('If-Range') == '"v2"':
+                fobj.seek(int(headers['Range'][len('bytes='):-1]))
+                return fobj, 206
+            return fobj, 200
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(new), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)) as get:
+            # started before the file changed, with the same stat
+            with open(local_path + '.part', 'wb') as f:
+                f.write(old[:300])
+            with open(local_path + '.part.meta', 'w') as f:
+                json.dump({'sha1': hashlib.sha1(new).hexdigest(), 'if_range': '"v1"'}, f)
+            p.download_to(local_path)
+            self.assertEqual(get.call_args[1]['headers']['If-Range'], '"v1"')
+            with open(local_path, 'rb') as f:
+                self.assertEqual(f.read(), new)
+
+            # started from another version of the file, or without metadata
+            for meta in ({'sha1': hashlib.sha1(old).hexdigest(), 'if_range': '"v2"'}, None):
+                os.remove(local_path)
+                with open(local_path + '.part', 'wb') as f:
+                    f.write(old[:300])
+                if meta is not None:
+                    with open(local_path + '.part.meta', 'w') as f:
+                        json.dump(meta, f)
+                get.reset_mock()
+                p.download_to(local_path)
+                self.assertIsNone(get.call_args[1].get('headers'))
+                with open(local_path, 'rb') as f:
+                    self.assertEqual(f.read(), new)
+
+    def test_download_to_segmented(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        data = os.urandom(1000)
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        ranges = []
+
+        def rest_get_stream(url, headers=None, **kwargs):
+            start, end = [int(x) for x in headers['Range'][len('bytes='):].split('-')]
+            ranges.append((start, end))
+            return io.BytesIO(data[start:end + 1]), 206
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(data), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)):
+            p.download_to(local_path, segments=4, segment_size=300)
+
+        self.assertEqual(sorted(ranges), [(0, 299), (300, 599), (600, 899), (900, 999)])
+        with open(local_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_to_segmented_failure(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        data = os.urandom(1000)
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        def rest_get_stream(url, headers=None, **kwargs):
+            if headers is None:
+                return io.BytesIO(data), 200
+            start, end = [int(x) for x in headers['Range'][len('bytes='):].split('-')]
+            if start == 300:
+                raise requests.exceptions.ConnectionError('reset')
+            return io.BytesIO(data[start:end + 1]), 206
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(data), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)):
+            self.assertRaises(requests.exceptions.ConnectionError, p.download_to,
+                              local_path, segments=4, segment_size=300, retries=1)
+            self.assertFalse([name for name in os.listdir(self.local_dir)
+                              if name.startswith('f.bin')])
+
+            # nothing is mistaken for a complete partial download
+            p.download_to(local_path, verify_checksum=False)
+
+        with open(local_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_to_segmented_unsupported(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        data = os.urandom(1000)
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(data), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(data), 200))):
+            Config.load({'http://b/artifactory': {'download_segments': 4,
+                                                  'segment_size': 300}})
+            try:
+                p.download_to(local_path)
+            finally:
+                Config.clear()
+
+        with open(local_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_to_checksum_mismatch(self):
+        p = ArtifactoryPath("http://b/artifactory/c/d/f.bin")
+        local_path = os.path.join(self.local_dir, 'f.bin')
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(self._file_stat(b'good'), 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(b'evil'), 200))):
+            self.assertRaises(artifactory.ChecksumMismatchError, p.download_to, local_path)
+
+        self.assertFalse(os.path.exists(local_path))
+        self.assertFalse(os.path.exists(local_path + '.part'))
+
+
+class RangeFileTest(unittest.TestCase):
+    """ Test random access to remote files """
+
+    def setUp(self):
+        self.data = os.urandom(1000)
+        self.requests = []
+
+    def _fetch(self, start, end):
+        self.requests.append((start, end))
+        return self.data[start:end + 1]
+
+    def test_seek_read(self):
+        f = http.RangeFile(self._fetch, len(self.data), block_size=100,
+                           cache_blocks=4, readahead=2)
+
+        self.assertTrue(f.seekable())
+        f.seek(-10, io.SEEK_END)
+        self.assertEqual(f.read(), self.data[-10:])
+        self.assertEqual(f.read(), b'')
+
+        f.seek(150)
+        self.assertEqual(f.read(20), self.data[150:170])
+        self.assertEqual(f.tell(), 170)
+        self.assertEqual(self.requests, [(900, 999), (100, 199)])
+
+        # sequential access reads ahead
+        self.assertEqual(f.read(30), self.data[170:200])
+        self.assertEqual(f.read(100), self.data[200:300])
+        self.assertEqual(self.requests[-1], (200, 499))
+        f.read(200)
+        self.assertEqual(len(self.requests), 3)
+
+        f.seek(0)
+        self.assertEqual(io.BufferedReader(f).read(), self.data)
+        self.assertRaises(ValueError, f.seek, -1)
+
+    def test_read_across_blocks(self):
+        f = http.RangeFile(self._fetch, len(self.data), block_size=100)
+        f.seek(90)
+        buf = bytearray(320)
+        self.assertEqual(f.readinto(buf), 320)
+        self.assertEqual(bytes(buf), self.data[90:410])
+
+        f.seek(950)
+        self.assertEqual(f.readinto(buf), 50)
+        self.assertEqual(bytes(buf[:50]), self.data[950:])
+
+    def test_short_read(self):
+        f = http.RangeFile(self._fetch, len(self.data), block_size=100)
+        self.assertEqual(f.read(50), self.data[:50])
+
+        # the remote file got shorter
+        self.data = self.data[:850]
+        f.seek(800)
+        self.assertRaises(IOError, f.read, 100)
+        f.seek(10)
+        self.assertEqual(f.read(10), self.data[10:20])
+
+        # cached blocks shorter than expected aren't read past their end
+        f._blocks[9] = b'x' * 10
+        f.seek(950)
+        self.assertRaises(IOError, f.readinto, bytearray(10))
+        self.assertEqual(f.tell(), 950)
+
+    def test_open_seekable(self):
+        import zipfile
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as z:
+            z.writestr('big.bin', os.urandom(200000))
+            z.writestr('small.txt', b'hello')
+        data = buf.getvalue()
+
+        stat = json.dumps({
+            "created": "2014-02-24T21:20:59.999+04:00",
+            "lastModified": "2014-02-24T21:20:36.000+04:00",
+            "size": str(len(data)),
+        })
+        fetched = []
+
+        def rest_get_stream(url, headers=None, **kwargs):
+            start, end = [int(x) for x in headers['Range'][len('bytes='):].split('-')]
+            fetched.append(end + 1 - start)
+            return io.BytesIO(data[start:end + 1]), 206
+
+        p = ArtifactoryPath("http://b/artifactory/c/d.zip")
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(stat, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)):
+            with p.open('rb', seekable=True, block_size=4096) as f:
+                with zipfile.ZipFile(f) as z:
+                    self.assertEqual(z.read('small.txt'), b'hello')
+
+        self.assertTrue(sum(fetched) < len(data) / 4)
+
+        # a central directory across several blocks
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as z:
+            for i in range(300):
+                z.writestr('file-%03d.txt' % i, b'x' * i)
+        data = buf.getvalue()
+        stat = json.dumps(dict(json.loads(stat), size=str(len(data))))
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(stat, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)):
+            with p.open('rb', seekable=True, block_size=4096) as f:
+                with zipfile.ZipFile(f) as z:
+                    self.assertEqual(len(z.namelist()), 300)
+                    self.assertEqual(z.read('file-299.txt'), b'x' * 299)
+
+
+class ArtifactoryStatManyTest(unittest.TestCase):
+    """ Test batch stat """
+
+    stat_json = json.dumps({
+        "repo": "c", "path": "/x/single.txt",
+        "created": "2014-02-24T21:20:59.999+04:00",
+        "lastModified": "2014-02-24T21:20:36.000+04:00",
+        "size": "7",
+        "checksums": {"sha1": "aaa", "md5": "bbb"}})
+
+    listing_json = json.dumps({"files": [
+        {"uri": "/a.jar", "size": 10, "lastModified": "2014-02-24T21:20:36.000+04:00",
+         "folder": False, "sha1": "111", "sha2": "222"},
+        {"uri": "/sub", "size": -1, "lastModified": "2014-02-24T21:20:36.000+04:00",
+         "folder": True, "sha1": None}]})
+
+    def rest_get(self, url, params=None, **kwargs):
+        self.requests.append((url, params))
+        if url == "http://b/artifactory/api/storage/c/d" and params:
+            return self.listing_json, 200
+        if url == "http://b/artifactory/api/storage/c/x/single.txt":
+            return self.stat_json, 200
+        return '{"errors": [{"status": 404, "message": "Unable to find item"}]}', 404
+
+    def setUp(self):
+        self.requests = []
+
+    def test_stat_many(self):
+        from artifactory.paths import stat_many, NOT_FOUND
+
+        paths = ["http://b/artifactory/c/d/a.jar",
+                 "http://b/artifactory/c/d/sub",
+                 "http://b/artifactory/c/d/missing.jar",
+                 "http://b/artifactory/c/x/single.txt",
+                 "http://b/artifactory/c/y/missing.txt"]
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get', MM(side_effect=self.rest_get)):
+            results = stat_many(paths, workers=4)
+
+        self.assertEqual([str(p) for p in results], paths)
+        stats = list(results.values())
+
+        self.assertEqual(stats[0].size, 10)
+        self.assertEqual(stats[0].sha1, '111')
+        self.assertEqual(stats[0].sha256, '222')
+        self.assertFalse(stats[0].is_dir)
+        self.assertIsNone(stats[0].md5)
+        self.assertTrue(stats[1].is_dir)
+        self.assertEqual(stats[1].size, 0)
+        self.assertIs(stats[2], NOT_FOUND)
+        self.assertFalse(stats[2])
+        self.assertEqual(stats[3].md5, 'bbb')
+        self.assertIs(stats[4], NOT_FOUND)
+
+        # one listing for c/d, one request for each of the others
+        self.assertEqual(len(self.requests), 3)
+
+    def test_stat_many_repository_root(self):
+        from artifactory.paths import stat_many
+
+        paths = ["http://b/artifactory/c/a.jar",
+                 "http://b/artifactory/c/sub"]
+
+        def rest_get(url, params=None, **kwargs):
+            self.requests.append((url, params))
+            return self.listing_json, 200
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get', MM(side_effect=rest_get)):
+            stats = list(stat_many(paths).values())
+
+        self.assertEqual(stats[0].size, 10)
+        self.assertTrue(stats[1].is_dir)
+        self.assertEqual(self.requests, [("http://b/artifactory/api/storage/c",
+                                          "list&deep=0&listFolders=1")])
+
+    def test_stat_many_no_listing(self):
+        paths = [ArtifactoryPath("http://b/artifactory/c/x/single.txt"),
+                 ArtifactoryPath("http://b/artifactory/c/x/other.txt")]
+
+        def rest_get(url, params=None, **kwargs):
+            self.requests.append((url, params))
+            if params:
+                return 'Bad request', 400
+            return self.rest_get(url, **kwargs)
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get', MM(side_effect=rest_get)):
+            results = ArtifactoryPath.stat_many(paths)
+
+        self.assertEqual(results[paths[0]].md5, 'bbb')
+        self.assertFalse(results[paths[1]])
+        self.assertEqual(len([r for r in self.requests if r[1]]), 1)
+
+
+class ArtifactCacheTest(unittest.TestCase):
+    """ Test the local content-addressed artifact cache """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp, 'cache')
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmp)
+        Config.clear()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_put_get(self):
+        c = cache.ArtifactCache(self.cache_dir)
+        sha1 = hashlib.sha1(b'data').hexdigest()
+        key = c.key(sha1=sha1.upper(), sha256='123')
+        self.assertEqual(key, ('sha1', sha1))
+        self.assertIsNone(c.get(key))
+
+        self.assertTrue(c.put(key, self._write('a', b'data')))
+        self.assertEqual(c.get(key), os.path.join(self.cache_dir, 'sha1', sha1[:2], sha1))
+        self.assertIsNone(c.get(key, size=5))
+
+        dst = os.path.join(self.tmp, 'b')
+        self.assertTrue(c.link_to(key, dst))
+        self.assertTrue(c.link_to(key, dst))
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), b'data')
+        self.assertFalse(c.link_to(c.key(sha256='00'), dst))
+
+        # neither the source nor the destination share the cached file
+        self.assertEqual(os.stat(c.get(key)).st_nlink, 1)
+        with open(dst, 'wb') as f:
+            f.write(b'edit')
+        with open(c.get(key), 'rb') as f:
+            self.assertEqual(f.read(), b'data')
+
+    def test_put_mismatch(self):
+        c = cache.ArtifactCache(self.cache_dir)
+        key = c.key(sha1=hashlib.sha1(b'data').hexdigest())
+        self.assertFalse(c.put(key, self._write('a', b'corrupt')))
+        self.assertIsNone(c.get(key))
+        self.assertEqual(os.listdir(os.path.dirname(c.path(key))), [])
+
+    def test_evict(self):
+        c = cache.ArtifactCache(self.cache_dir, max_size=10)
+
+        keys = []
+        for i, data in enumerate([b'aaaaa', b'bbbbb', b'ccccc']):
+            key = c.key(sha1=hashlib.sha1(data).hexdigest())
+            keys.append(key)
+            c.put(key, self._write(str(i), data))
+            os.utime(c.path(key), (1000 + i, 1000 + i))
+
+        self.assertIsNone(c.get(keys[0]))
+        self.assertIsNotNone(c.get(keys[1]))
+        self.assertIsNotNone(c.get(keys[2]))
+
+        # used files are evicted last
+        with patch('os.walk', side_effect=AssertionError('rescanned')):
+            data = b'ddddd'
+            c.put(c.key(sha1=hashlib.sha1(data).hexdigest()), self._write('3', data))
+        self.assertIsNotNone(c.get(keys[2]))
+        self.assertIsNone(c.get(keys[1]))
+
+    def test_download_to(self):
+        import hashlib
+        data = b'cached contents'
+        stat = json.dumps({
+            "created": "2014-02-24T21:20:59.999+04:00",
+            "lastModified": "2014-02-24T21:20:36.000+04:00",
+            "size": str(len(data)),
+            "checksums": {"sha1": hashlib.sha1(data).hexdigest()}
+        })
+        Config.load({'http://b/artifactory': {'cache_dir': self.cache_dir}})
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(stat, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(data), 200))) as get:
+            ArtifactoryPath("http://b/artifactory/c/one.bin").download_to(
+                os.path.join(self.tmp, 'one.bin'))
+            ArtifactoryPath("http://b/artifactory/other/two.bin").download_to(
+                os.path.join(self.tmp, 'two.bin'))
+
+            with ArtifactoryPath("http://b/artifactory/c/three.bin").open() as f:
+                self.assertEqual(f.read(), data)
+
+        self.assertEqual(get.call_count, 1)
+        with open(os.path.join(self.tmp, 'two.bin'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_download_tree(self):
+        remote = {'a.txt': b'a', 'sub/b.jar': b'bb', 'sub/e/f.txt': b'fff'}
+        listing = json.dumps({"files": [
+            {"uri": "/" + name, "folder": False, "size": len(data),
+             "sha1": hashlib.sha1(data).hexdigest()}
+            for name, data in remote.items()]})
+        Config.load({'http://b/artifactory': {'cache_dir': self.cache_dir}})
+        p = ArtifactoryPath("http://b/artifactory/c/d")
+
+        def rest_get_stream(url, **kwargs):
+            return io.BytesIO(remote[url[len(str(p)) + 1:]]), 200
+
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(listing, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=rest_get_stream)) as get:
+            p.download_tree(os.path.join(self.tmp, 'one'))
+            # a warm cache fills a new tree, including its subdirectories
+            report = p.download_tree(os.path.join(self.tmp, 'two'))
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(report.failures, [])
+        self.assertEqual(len(report.skipped), 3)
+        for name, data in remote.items():
+            with open(os.path.join(self.tmp, 'two', *name.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_download_unverified(self):
+        data = b'cached contents'
+        stat = json.dumps({
+            "created": "2014-02-24T21:20:59.999+04:00",
+            "lastModified": "2014-02-24T21:20:36.000+04:00",
+            "size": str(len(data)),
+            "checksums": {"sha1": hashlib.sha1(data).hexdigest()}
+        })
+        Config.load({'http://b/artifactory': {'cache_dir': self.cache_dir}})
+
+        responses = [b'corrupt content', data]
+        with patch.object(_ArtifactoryAccessor, 'rest_get',
+                          MM(return_value=(stat, 200))), \
+             patch.object(_ArtifactoryAccessor, 'rest_get_stream',
+                          MM(side_effect=lambda *a, **kw: (io.BytesIO(responses.pop(0)), 200))) as get:
+            path = ArtifactoryPath("http://b/artifactory/c/one.bin")
+            path.download_to(os.path.join(self.tmp, 'one.bin'), verify_checksum=False)
+            path.download_to(os.path.join(self.tmp, 'two.bin'))
+
+        self.assertEqual(get.call_count, 2)
+        with open(os.path.join(self.tmp, 'two.bin'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+
+class AQLTest(unittest.TestCase):
+    """ Test AQL query composition and result parsing """
+
+    def test_query(self):
+        q = AQLQuery().find({'repo': 'r'}, name={'$match': '*.jar'})
+        self.assertEqual(str(q), 'items.find({"name": {"$match": "*.jar"}, "repo": "r"})')
+
+        q2 = q.include('name', 'size').sort('size', order='$desc').offset(5).limit(10)
+        self.assertEqual(str(q2),
+                         'items.find({"name": {"$match": "*.jar"}, "repo": "r"})'
+                         '.include("name","size").sort({"$desc": ["size"]})'
+                         '.offset(5).limit(10)')
+        self.assertEqual(str(q), 'items.find({"name": {"$match": "*.jar"}, "repo": "r"})')
+
+        self.assertRaises(ValueError, q.sort, 'size', order='desc')
+        self.assertRaises(RuntimeError, list, q)
+
+    def test_iter_results(self):
+        items = [{"repo": "r", "name": "f%d" % i, "path": u"\u00e9]" * i}
+                 for i in range(50)]
+        data = json.dumps({"results": items, "range": {"total": 50}},
+                          indent=2, ensure_ascii=False).encode('utf-8')
+
+        for chunk_size in (1, 7, 4096):
+            parsed = list(aql.iter_results(io.BytesIO(data), chunk_size=chunk_size))
+            self.assertEqual(parsed, items)
+
+        self.assertEqual(list(aql.iter_results(io.BytesIO(b'{"results" : [ ]}'))), [])
+        self.assertRaises(ValueError, list,
+                          aql.iter_results(io.BytesIO(b'{"results": [{"a": 1}')))
+
+    def test_pagination(self):
+        items = [{"name": str(i)} for i in range(25)]
+        queries = []
+
+        def run(pathobj, query):
+            queries.append(query)
+            offset = int(query.split('.offset(')[1].split(')')[0])
+            limit = int(query.split('.limit(')[1].split(')')[0])
+            return iter(items[offset:offset + limit])
+
+        p = ArtifactoryPath("http://b/artifactory/c")
+        with patch.object(_ArtifactoryAccessor, 'aql', MM(side_effect=run)):
+            self.assertEqual(list(p.aql(page_size=10).sort('name')), items)
+            self.assertEqual(len(queries), 3)
+
+            del queries[:]
+            result = list(p.aql(page_size=10).sort('name').offset(3).limit(12))
+            self.assertEqual(result, items[3:15])
+            self.assertEqual(queries,
+                             ['items.find({}).sort({"$asc": ["name"]}).offset(3).limit(10)',
+                              'items.find({}).sort({"$asc": ["name"]}).offset(13).limit(2)'])
+
+            # unsorted queries have no stable order to page through
+            del queries[:]
+            run_all = lambda pathobj, query: queries.append(query) or iter(items)
+            with patch.object(_ArtifactoryAccessor, 'aql', MM(side_effect=run_all)):
+                self.assertEqual(list(p.aql(page_size=10).limit(30)), items)
+            self.assertEqual(queries, ['items.find({}).limit(30)'])
+
 
 class TestArtifactoryConfig(unittest.TestCase):
     def test_artifactory_config(self):
@@ -377,5 +1616,347 @@ class TestArtifactoryConfig(unittest.TestCase):
         c = Config['foobarbaz']
         self.assertIsNone(c)
 
+    def test_search_longest_prefix(self):
+        Config.clear()
+        try:
+            Config.load({'http://b/artifactory': {'username': 'short'}})
+            self.assertEqual(Config.search('https://b/artifactory/repo/x'),
+                             'http://b/artifactory')
+            self.assertEqual(ArtifactoryPath('http://b/artifactory/repo/x').drive,
+                             'http://b/artifactory')
+
+            generation = Config.generation
+            Config.load({'b/artifactory/repo': {'username': 'long'}})
+            self.assertGreater(Config.generation, generation)
+            self.assertEqual(Config.search('https://b/artifactory/repo/x'),
+                             'b/artifactory/repo')
+            self.assertEqual(Config['http://b/artifactory/other']['username'], 'short')
+            self.assertEqual(ArtifactoryPath('http://b/artifactory/repo/x').drive,
+                             'http://b/artifactory/repo')
+            self.assertIsNone(Config.search('http://c/artifactory'))
+        finally:
+            Config.clear()
+        self.assertIsNone(Config.search('https://b/artifactory/repo/x'))
+
+class MetricsTest(unittest.TestCase):
+    """ Test request metrics of the accessor """
+
+    def setUp(self):
+        self.metrics = metrics.RequestMetrics(buckets=(0.1, 1.0))
+        patcher = patch('artifactory.paths.Metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _response(self, status, content=b'', sent=None):
+        res = MM(status_code=status, content=content, text=content.decode('utf-8'),
+                 headers={'Content-Length': str(len(content))})
+        res.request.headers = {} if sent is None else {'Content-Length': str(sent)}
+        return res
+
+    def test_classify(self):
+        c = metrics.classify
+        self.assertEqual(c('GET', '/api/storage/repo/a'), 'stat')
+        self.assertEqual(c('GET', '/api/storage/repo/a', 'list&deep=1'), 'list')
+        self.assertEqual(c('PUT', '/api/storage/repo/a', {'properties': 'a=b'}), 'properties')
+        self.assertEqual(c('POST', '/api/copy/repo/a', {'to': '/repo/b'}), 'copy')
+        self.assertEqual(c('POST', '/api/search/aql'), 'aql')
+        self.assertEqual(c('GET', '/repo/a'), 'download')
+        self.assertEqual(c('PUT', '/repo/a/'), 'mkdir')
+        self.assertEqual(c('PUT', '/repo/a'), 'deploy')
+        self.assertEqual(c('PUT', '/repo/a', None, {'X-Checksum-Deploy': 'true'}),
+                         'deploy_by_checksum')
+        self.assertEqual(c('DELETE', '/repo/a'), 'delete')
+
+    def test_requests(self):
+        Config.load({'http://x/artifactory': {'retries': 0}})
+        self.addCleanup(Config.clear)
+        a = _ArtifactoryAccessor()
+        before, after = [], []
+        self.metrics.add_hook(before=before.append, after=after.append)
+
+        with patch('requests.Session.request',
+                   MM(side_effect=[self._response(200, b'{}'),
+                                   self._response(404, b'nope'),
+                                   self._response(201, sent=10),
+                                   requests.exceptions.ConnectionError('reset')])):
+            a.rest_get("http://b/artifactory/api/storage/c/d")
+            a.rest_get("http://b/artifactory/api/storage/c/e")
+            a.rest_put_stream("http://b/artifactory/c/d", io.BytesIO(b'x' * 10))
+            self.assertRaises(requests.exceptions.ConnectionError,
+                              a.rest_get, "http://x/artifactory/c/d")
+
+        self.assertEqual(len(before), 4)
+        self.assertEqual([info.status for info in after], [200, 404, 201, None])
+
+        stat, = self.metrics.snapshot(operation='stat')
+        self.assertEqual(stat['drive'], 'http://b/artifactory')
+        self.assertEqual(stat['count'], 2)
+        self.assertEqual(stat['status_codes'], {'200': 1, '404': 1})
+        self.assertEqual(stat['bytes_received'], 6)
+        self.assertEqual(stat['latency_buckets'], {'0.1': 2, '1.0': 2, '+Inf': 2})
+
+        deploy, = self.metrics.snapshot(operation='deploy')
+        self.assertEqual(deploy['bytes_sent'], 10)
+
+        download, = self.metrics.snapshot(drive='http://x/artifactory')
+        self.assertEqual((download['count'], download['errors']), (1, 1))
+
+        self.assertEqual(json.loads(self.metrics.to_json())['requests'],
+                         json.loads(json.dumps(self.metrics.snapshot())))
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('artifactory_requests_total{drive="http://b/artifactory",'
+                      'operation="stat",status="404"} 1', text)
+        self.assertIn('artifactory_requests_total{drive="http://x/artifactory",'
+                      'operation="download",status="error"} 1', text)
+        self.assertIn('artifactory_request_duration_seconds_bucket{drive="http://b/artifactory",'
+                      'le="+Inf",operation="stat"} 2', text)
+
+    def test_slow_requests(self):
+        a = _ArtifactoryAccessor()
+        self.metrics.slow_threshold = 0
+
+        with patch('requests.Session.request', MM(return_value=self._response(200))), \
+                self.assertLogs('artifactory', 'WARNING') as logs:
+            a.rest_get("http://b/artifactory/c/d")
+
+        self.assertIn('Slow request: GET http://b/artifactory/c/d (download)', logs.output[0])
+
+
+class RetryTest(unittest.TestCase):
+    """ Test retries and the circuit breaker of the accessor """
+
+    def setUp(self):
+        _ArtifactoryAccessor.reset_breakers()
+        self.addCleanup(_ArtifactoryAccessor.reset_breakers)
+        patcher = patch('time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _response(self, status, headers=None):
+        return MM(status_code=status, content=b'', text='', headers=headers or {})
+
+    def test_policy(self):
+        policy = retry.policy_from_config(artifactory.config.DEFAULTS)
+        self.assertEqual(policy.retries, 3)
+        self.assertIn(503, policy.statuses)
+        for attempt in range(10):
+            self.assertLessEqual(retry.backoff_delay(policy, attempt),
+                                 min(policy.backoff_max, policy.backoff * 2 ** attempt))
+
+        self.assertEqual(retry.retry_after('2'), 2.0)
+        self.assertEqual(retry.retry_after('Wed, 21 Oct 2015 07:28:10 GMT',
+                                           now=1445412480), 10.0)
+        self.assertIsNone(retry.retry_after('soon'))
+        self.assertIsNone(retry.retry_after(None))
+
+    def test_retry(self):
+        a = _ArtifactoryAccessor()
+        request = MM(side_effect=[self._response(503, {'Retry-After': '2'}),
+                                  requests.exceptions.ConnectionError('reset'),
+                                  self._response(200)])
+        with patch('requests.Session.request', request):
+            text, code = a.rest_get("http://b/artifactory/api/storage/c/d")
+
+        self.assertEqual(code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.sleep.call_args_list[0], call(2.0))
+
+    def test_rewind(self):
+        a = _ArtifactoryAccessor()
+        data = io.BytesIO(b'0123456789')
+        data.seek(2)
+        seen = []
+
+        def request(method, url, data=None, **kwargs):
+            seen.append(data.read())
+            return self._response(502 if len(seen) == 1 else 201)
+
+        with patch('requests.Session.request', side_effect=request):
+            a.rest_put_stream("http://b/artifactory/c/d", data,
+                              headers={'X-Checksum-Sha1': 'x'})
+        self.assertEqual(seen, [b'23456789', b'23456789'])
+
+    def test_no_retry(self):
+        a = _ArtifactoryAccessor()
+
+        # POST and PUT without a checksum aren't idempotent
+        request = MM(return_value=self._response(503))
+        with patch('requests.Session.request', request):
+            a.rest_put_stream("http://b/artifactory/c/d", io.BytesIO(b'x'))
+            a.rest_post("http://b/artifactory/api/copy/c/d")
+        self.assertEqual(request.call_count, 2)
+
+        # nor is a body that can't be rewound
+        request = MM(return_value=self._response(503))
+        with patch('requests.Session.request', request):
+            a.rest_put_stream("http://b/artifactory/c/d", iter([b'x']),
+                              headers={'X-Checksum-Sha1': 'x'})
+        self.assertEqual(request.call_count, 1)
+        self.assertFalse(self.sleep.called)
+
+    def test_breaker(self):
+        Config.load({'http://b/artifactory': {'retries': 0, 'breaker_threshold': 2,
+                                              'breaker_timeout': 30}})
+        self.addCleanup(Config.clear)
+        a = _ArtifactoryAccessor()
+        now = [1000.0]
+        breaker = retry.CircuitBreaker(timer=lambda: now[0])
+        _ArtifactoryAccessor._breakers['http://b/artifactory'] = breaker
+
+        request = MM(return_value=self._response(503))
+        with patch('requests.Session.request', request):
+            a.rest_get("http://b/artifactory/c/d")
+            a.rest_get("http://b/artifactory/c/d")
+            self.assertRaises(CircuitOpenError, a.rest_get, "http://b/artifactory/c/d")
+            self.assertEqual(request.call_count, 2)
+
+            # a failed trial request reopens the circuit
+            now[0] += 30
+            a.rest_get("http://b/artifactory/c/d")
+            self.assertRaises(CircuitOpenError, a.rest_get, "http://b/artifactory/c/d")
+
+            # a successful one closes it
+            now[0] += 30
+            request.return_value = self._response(200)
+            a.rest_get("http://b/artifactory/c/d")
+            a.rest_get("http://b/artifactory/c/d")
+        self.assertEqual(request.call_count, 5)
+        self.assertEqual(breaker.failures, 0)
+
+
+class LimiterTest(unittest.TestCase):
+    """ Test the per-drive concurrency and rate limiter """
+
+    def test_rate(self):
+        now, slept = [0.0], []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        limiter = throttle.Limiter(rate=10, burst=2, timer=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            with limiter:
+                pass
+        self.assertEqual(slept, [0.1, 0.1])
+
+        # tokens refill while idle, up to the burst size
+        now[0] += 10
+        for _ in range(3):
+            with limiter:
+                pass
+        self.assertEqual(len(slept), 3)
+
+    def test_in_flight(self):
+        limiter = throttle.Limiter(max_in_flight=2)
+        started, peak = threading.Event(), []
+        gate = threading.Event()
+
+        def request():
+            with limiter:
+                peak.append(limiter.in_flight)
+                started.set()
+                gate.wait(5)
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        time.sleep(0.05)
+        self.assertEqual(limiter.in_flight, 2)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_accessor(self):
+        a = _ArtifactoryAccessor()
+        self.assertEqual(a.limiter('http://b/artifactory').settings, (0, 0.0, 1.0))
+
+        Config.load({'http://b/artifactory': {'max_in_flight': 4, 'rate_limit': 50}})
+        self.addCleanup(Config.clear)
+        limiter = a.limiter('http://b/artifactory')
+        self.assertEqual(limiter.settings, (4, 50.0, 50.0))
+        self.assertIs(a.limiter('http://b/artifactory'), limiter)
+        self.assertIs(_ArtifactoryAccessor().limiter('http://b/artifactory'), limiter)
+
+        # unrelated config changes keep the limiter and its state
+        Config.load({'http://c/artifactory': {}})
+        self.assertIs(a.limiter('http://b/artifactory'), limiter)
+
+        seen = []
+        res = MM(status_code=200, content=b'', text='', headers={})
+        with patch('requests.Session.request',
+                   side_effect=lambda *args, **kwargs: seen.append(limiter.in_flight) or res):
+            a.rest_get("http://b/artifactory/c/d")
+        self.assertEqual(seen, [1])
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class BenchServerTest(unittest.TestCase):
+    """ Test the stand-in server of the benchmarks """
+
+    def setUp(self):
+        import bench
+        import threading
+
+        self.server = bench.FakeArtifactory()
+        self.server.store.mkdir('repo')
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        _ArtifactoryAccessor.close_sessions()
+
+    def test_round_trip(self):
+        repo = ArtifactoryPath(self.server.url + '/repo')
+        data = b'x' * 1000
+
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        try:
+            (repo / 'a' / 'b.bin').deploy_file(f.name)
+            (repo / 'c.bin').deploy_file(f.name)
+        finally:
+            os.unlink(f.name)
+
+        stat = (repo / 'a' / 'b.bin').stat()
+        self.assertEqual(stat.size, len(data))
+        self.assertEqual(stat.sha1, hashlib.sha1(data).hexdigest())
+        self.assertEqual(sorted(str(p) for p in repo.iterdir()),
+                         [str(repo / 'a'), str(repo / 'c.bin')])
+        self.assertEqual([str(p) for p in repo.rglob('*.bin')],
+                         [str(repo / 'a' / 'b.bin'), str(repo / 'c.bin')])
+        self.assertEqual([(d, f) for _, d, f in walk(repo)],
+                         [(['a'], ['c.bin']), ([], ['b.bin'])])
+
+        with (repo / 'c.bin').open() as fobj:
+            self.assertEqual(fobj.read(), data)
+        with (repo / 'c.bin').open(seekable=True) as fobj:
+            fobj.seek(990)
+            self.assertEqual(fobj.read(), data[990:])
+
+        (repo / 'c.bin').copy(repo / 'd.bin')
+        (repo / 'd.bin').move(repo / 'e.bin')
+        self.assertFalse((repo / 'd.bin').exists())
+        self.assertEqual((repo / 'e.bin').stat().sha1, stat.sha1)
+
+        (repo / 'e.bin').set_properties({'k': 'v'})
+        self.assertEqual((repo / 'e.bin').properties, {'k': ['v']})
+        (repo / 'e.bin').unlink()
+        self.assertFalse((repo / 'e.bin').exists())
+
+
+if sys.version_info >= (3, 6):
+    # async/await is a syntax error before Python 3.6
+    from aio_test import AsyncArtifactoryPathTest
+
+
 if __name__ == '__main__':
     unittest.main()